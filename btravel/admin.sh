@@ -25,14 +25,21 @@ case "$1" in
 
     ;;
   "run")
-    podman run --name btravel-admin --replace -d -p 8000:8000 -e DB_PASSWORD=bismillah -e DB_NAME=btravel -e DB_USER=qutb -e DB_HOST=db --network=scenery btravel-admin:latest
+    podman run --name btravel-admin --replace -d -p 8000:8000 -e DB_PASSWORD=bismillah -e DB_NAME=btravel -e DB_USER=qutb -e DB_HOST=db -e REDIS_URL=redis://redis:6379/0 --network=scenery btravel-admin:latest
+    ;;
+  "run-redis")
+    # Shared cache of the web and worker processes
+    podman run --name redis --replace -d --network=scenery docker.io/library/redis:8
+    ;;
+  "run-worker")
+    podman run --name btravel-worker --replace -d -e DB_PASSWORD=bismillah -e DB_NAME=btravel -e DB_USER=qutb -e DB_HOST=db -e REDIS_URL=redis://redis:6379/0 --network=scenery --entrypoint python btravel-admin:latest manage.py run_worker
     ;;
   "run-web")
     echo "Starting BTravel web frontend..."
     cd "$(dirname "$0")/web" && ./run.sh
     ;;
   *)
-    echo "Usage: $0 {build|run|run-web}"
+    echo "Usage: $0 {build|run|run-redis|run-worker|run-web}"
     exit 1
     ;;
 esac
\ No newline at end of file
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
 from dotenv import load_dotenv
 
@@ -49,6 +50,16 @@ INSTALLED_APPS = [
     'utils',
 ]
 
+# orjson for JSON, MessagePack when the optional msgpack package is installed
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'utils.renderers.ORJSONRenderer',
+        *(['utils.renderers.MessagePackRenderer'] if importlib.util.find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -94,6 +105,90 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Redis is shared by all workers, without it each process only has its own memory.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'btravel',
+        },
+        'embeddings': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'btravel:emb',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        # The in-process tier of the embedding cache already covers this case
+        'embeddings': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    }
+
+# Embedding backend
+# 'openai', 'sentence-transformers' (local CPU model, optional dependency) or
+# 'hashing' (deterministic, no network, for tests and benchmarks). MODEL
+# defaults to the backend's default model. VERSION labels the stored vectors
+# and defaults to the model; change it with the embedded text template.
+
+EMBEDDINGS = {
+    'BACKEND': os.environ.get('EMBEDDING_BACKEND', 'openai'),
+    'MODEL': os.environ.get('EMBEDDING_MODEL') or None,
+    'OPTIONS': {},
+    'VERSION': os.environ.get('EMBEDDING_VERSION') or None,
+}
+
+# Next embedding version, same keys as EMBEDDINGS
+# `manage.py reembed` fills shadow columns with it while search keeps using
+# EMBEDDINGS. Then deploy this config as EMBEDDINGS too and run
+# `reembed --activate` right away to swap the vectors in; it refuses while
+# EMBEDDINGS is another version. Unset it afterwards.
+
+EMBEDDINGS_NEXT = {
+    'BACKEND': os.environ['EMBEDDING_NEXT_BACKEND'],
+    'MODEL': os.environ.get('EMBEDDING_NEXT_MODEL') or None,
+    'OPTIONS': {},
+    'VERSION': os.environ.get('EMBEDDING_NEXT_VERSION') or None,
+} if os.environ.get('EMBEDDING_NEXT_BACKEND') else None
+
+# Embedding cache
+# In-process LRU in front of the shared 'embeddings' cache alias.
+
+EMBEDDING_CACHE = {
+    'CACHE_ALIAS': 'embeddings',
+    'LOCAL_MAX_ENTRIES': int(os.environ.get('EMBEDDING_CACHE_LOCAL_MAX_ENTRIES', 2048)),
+    'LOCAL_TTL': int(os.environ.get('EMBEDDING_CACHE_LOCAL_TTL', 60 * 60)),
+    'SHARED_TTL': int(os.environ.get('EMBEDDING_CACHE_SHARED_TTL', 60 * 60 * 24 * 30)),
+}
+
+
+# Embedding generation
+# When async, saves only enqueue a job and `manage.py run_worker` computes the embedding.
+
+EMBEDDING_ASYNC = os.environ.get('EMBEDDING_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+
+# Background jobs
+
+JOB_QUEUE = {
+    'MAX_ATTEMPTS': int(os.environ.get('JOB_MAX_ATTEMPTS', 8)),
+    'BACKOFF_BASE': 5,        # seconds, doubled after every failed attempt
+    'BACKOFF_MAX': 60 * 60,
+    'LEASE_TIMEOUT': 5 * 60,  # running jobs older than this are assumed abandoned
+    'POLL_INTERVAL': 2,
+    'BATCH_SIZE': 20,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -139,3 +234,78 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Vector search
+# hnsw.ef_search / ivfflat.probes trade recall for latency on approximate
+# nearest neighbour queries. Requests may override them within the limits below.
+
+VECTOR_SEARCH = {
+    'HNSW_EF_SEARCH': int(os.environ.get('HNSW_EF_SEARCH', 40)),
+    'MAX_HNSW_EF_SEARCH': 1000,
+    'IVFFLAT_PROBES': int(os.environ.get('IVFFLAT_PROBES', 1)),
+    'MAX_IVFFLAT_PROBES': 1000,
+    # Filtered searches keep scanning the index until the page is full (pgvector 0.8+).
+    # 'strict_order', 'relaxed_order' or 'off'
+    'ITERATIVE_SCAN': os.environ.get('HNSW_ITERATIVE_SCAN', 'strict_order'),
+    # Search the small index over the leading embedding dimensions first and
+    # re-rank its RERANK_DEPTH nearest rows by the full vector.
+    # Check `manage.py vector_recall_report` before enabling it.
+    'COMPACT_SEARCH': os.environ.get('VECTOR_COMPACT_SEARCH', 'false').lower() in ('1', 'true', 'yes'),
+    'RERANK_DEPTH': int(os.environ.get('VECTOR_RERANK_DEPTH', 200)),
+}
+
+# Rendered bookable and review listings, cached until the catalog changes.
+# The catalog versions in the keys live in the default cache, so without a
+# shared one (REDIS_URL) other processes would keep serving stale pages and
+# the cache is off.
+
+RESPONSE_CACHE = {
+    'TTL': int(os.environ.get('RESPONSE_CACHE_TTL', 60 * 10)) if REDIS_URL else 0,
+}
+
+# Pages of search results, cached until the bookable vectors change. Off
+# without a shared default cache, like RESPONSE_CACHE.
+
+SEARCH_RESULT_CACHE = {
+    'TTL': int(os.environ.get('SEARCH_RESULT_CACHE_TTL', 60 * 10)) if REDIS_URL else 0,
+}
+
+# "More like this" results per bookable, cached until the bookable vectors
+# change. Off without a shared default cache, like RESPONSE_CACHE.
+
+SIMILAR_BOOKABLES = {
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    'CACHE_TTL': int(os.environ.get('SIMILAR_BOOKABLES_CACHE_TTL', 60 * 60)) if REDIS_URL else 0,
+}
+
+# Agent routing
+# Conversations go to the generic agent when no agent description reaches
+# this cosine similarity with the first message. Every process reloads the
+# agents at least every RELOAD_INTERVAL seconds, which is how changes made by
+# other processes arrive when the default cache is not shared (no REDIS_URL).
+
+AGENT_ROUTER = {
+    'MIN_SIMILARITY': float(os.environ.get('AGENT_ROUTER_MIN_SIMILARITY', 0.3)),
+    'RELOAD_INTERVAL': float(os.environ.get('AGENT_ROUTER_RELOAD_INTERVAL', 30)),
+}
+
+# Hybrid search
+# Candidates taken from the semantic and lexical legs before reciprocal-rank fusion.
+
+HYBRID_SEARCH = {
+    'RRF_K': 60,
+    'SEMANTIC_DEPTH': 100,
+    'LEXICAL_DEPTH': 100,
+    'MAX_DEPTH': 1000,
+}
+
+# Facet counts
+# The catalog counts come from a materialized view, refreshed by a job queued
+# REFRESH_DELAY seconds after a bookable write, or by `refresh_facets`.
+# Search facets count the top SEARCH_DEPTH candidates of the query.
+
+FACETS = {
+    'REFRESH_DELAY': int(os.environ.get('FACETS_REFRESH_DELAY', 60)),
+    'SEARCH_DEPTH': 200,
+}
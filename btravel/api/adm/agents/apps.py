@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AgentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'agents'
+
+    def ready(self):
+        # Connect the router's signal receivers
+        from . import router  # noqa: F401
@@ -59,7 +59,7 @@ class Command(BaseCommand):
             },
             {
                 'name': 'Tour Booking Agent',
-                'description': 'I specialize in booking guided tours and travel packages. Whether you're looking for a day tour, multi-day excursion, or comprehensive travel package, I can help find options based on your destination, duration, interests, and group size. I understand different tour styles from cultural immersion to adventure expeditions.',
+                'description': 'I specialize in booking guided tours and travel packages. Whether you\'re looking for a day tour, multi-day excursion, or comprehensive travel package, I can help find options based on your destination, duration, interests, and group size. I understand different tour styles from cultural immersion to adventure expeditions.',
                 'required_fields': ['destination', 'start_date', 'end_date', 'travelers'],
                 'optional_fields': ['tour_type', 'budget', 'group_size', 'language', 'transportation'],
                 'prompts': {
@@ -108,14 +108,28 @@ class Command(BaseCommand):
             }
         ]
 
+        existing = {agent.name: agent for agent in Agent.objects.filter(name__in=[a['name'] for a in agents_data])}
+        new_agents = []
+        updated_agents = []
+
         for agent_data in agents_data:
-            Agent.objects.update_or_create(
-                name=agent_data['name'],
-                defaults={
-                    'description': agent_data['description'],
-                    'required_fields': agent_data['required_fields'],
-                    'optional_fields': agent_data['optional_fields'],
-                    'prompts': agent_data['prompts']
-                }
-            )
-            self.stdout.write(self.style.SUCCESS(f'Successfully created/updated {agent_data["name"]}')) 
\ No newline at end of file
+            agent = existing.get(agent_data['name']) or Agent(name=agent_data['name'])
+            agent.description = agent_data['description']
+            agent.required_fields = agent_data['required_fields']
+            agent.optional_fields = agent_data['optional_fields']
+            agent.prompts = agent_data['prompts']
+            if agent.pk:
+                updated_agents.append(agent)
+            else:
+                new_agents.append(agent)
+
+        # Embed all agents with one batched request, unchanged descriptions are not re-embedded
+        Agent.objects.bulk_create_with_embeddings(new_agents)
+        Agent.objects.bulk_update_with_embeddings(
+            updated_agents, ['description', 'required_fields', 'optional_fields', 'prompts']
+        )
+
+        for agent in new_agents:
+            self.stdout.write(self.style.SUCCESS(f'Successfully created {agent.name}'))
+        for agent in updated_agents:
+            self.stdout.write(self.style.SUCCESS(f'Successfully updated {agent.name}'))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:53
+
+import pgvector.django.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # HNSW builds can take a while on a large catalog, build them without
+    # blocking writes to the table.
+    atomic = False
+
+    dependencies = [
+        ('agents', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='agent',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='agent_embedding_hnsw', opclasses=['vector_l2_ops']),
+        ),
+    ]
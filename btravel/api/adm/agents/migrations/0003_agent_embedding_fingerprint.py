@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0002_agent_embedding_hnsw'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agent',
+            name='embedding_fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
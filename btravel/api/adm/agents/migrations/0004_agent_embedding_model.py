@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0003_agent_embedding_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agent',
+            name='embedding_dimension',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='agent',
+            name='embedding_model',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunSQL(
+            # Every vector stored so far came from OpenAI text-embedding-3-small
+            sql="UPDATE agents_agent SET embedding_model = 'text-embedding-3-small', embedding_dimension = 1536 WHERE embedding IS NOT NULL",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:47
+
+import pgvector.django.vector
+from django.db import migrations, models
+
+# Vectors stored so far belong to the version named after their model, the default label
+BACKFILL_VERSION_SQL = """
+UPDATE agents_agent SET embedding_version = embedding_model WHERE embedding_model <> '';
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0004_agent_embedding_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agent',
+            name='embedding_next',
+            field=pgvector.django.vector.VectorField(blank=True, dimensions=1536, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='agent',
+            name='embedding_next_fingerprint',
+            field=models.CharField(blank=True, db_default='', default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='agent',
+            name='embedding_version',
+            field=models.CharField(blank=True, db_default='', default='', editable=False, max_length=100),
+        ),
+        migrations.RunSQL(BACKFILL_VERSION_SQL, migrations.RunSQL.noop),
+    ]
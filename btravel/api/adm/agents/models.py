@@ -1,22 +1,30 @@
 from django.db import models
-from pgvector.django import VectorField
+from pgvector.django import VectorField, HnswIndex
 import uuid
-from utils.embeddings import get_embedding
+from utils.models import EmbeddedModel
 
 # Create your models here.
-class Agent(models.Model):
+class Agent(EmbeddedModel):
     name = models.CharField(max_length=255)
     description = models.TextField()
     required_fields = models.JSONField(default=list, blank=True)
     optional_fields = models.JSONField(default=list, blank=True)
     prompts = models.JSONField(default=dict, blank=True)
     embedding = VectorField(dimensions=1536, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            HnswIndex(
+                name='agent_embedding_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_l2_ops'],
+            ),
+        ]
     
-    def save(self, *args, **kwargs):
-        # Generate embedding before saving
-        embedding_vector = get_embedding(self.description)
-        self.embedding = embedding_vector
-        super().save(*args, **kwargs)
+    def get_embedding_text(self):
+        return self.description
         
     def __str__(self):
         return self.name
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from utils.cache_versions import bump_version, get_version
+from utils.signals import embedding_updated
+
+from .models import Agent
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAME = 'agents'
+
+GENERIC_AGENT = {
+    'name': 'Generic Travel Assistant',
+    'description': 'I am a general travel assistant that can help with various travel needs.',
+    'required_fields': ['travel_type', 'destination', 'dates', 'travelers'],
+    'optional_fields': ['budget', 'preferences', 'special_requirements'],
+    'prompts': {
+        'travel_type': 'What type of travel assistance do you need?',
+        'destination': 'Where are you planning to travel?',
+        'dates': 'When are you planning to travel?',
+        'travelers': 'How many people are traveling?'
+    },
+}
+
+
+@dataclass(frozen=True)
+class AgentMatch:
+    agent_id: int
+    # Cosine similarity between the message and the agent description, -1 to 1
+    similarity: float
+
+
+class AgentRouter:
+    """
+    Picks the agent whose description is closest to a message
+
+    All agent embeddings are held in one normalized float32 matrix, so a
+    route is a single matrix-vector product instead of a database query.
+    The matrix is reloaded when the shared 'agents' version changes, which
+    Agent saves, deletes and background embedding updates bump, or once it
+    is AGENT_ROUTER['RELOAD_INTERVAL'] seconds old. The version only reaches
+    other processes through a shared default cache, the age limit bounds
+    how long they route with stale agents without one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded_at = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+
+    def load(self, version=None):
+        rows = list(
+            Agent.objects.filter(embedding__isnull=False)
+            .order_by('pk').values_list('pk', 'embedding')
+        )
+        ids = np.array([pk for pk, _ in rows], dtype=np.int64)
+        if rows:
+            matrix = np.array([embedding for _, embedding in rows], dtype=np.float32)
+        else:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            self._ids, self._matrix, self._version = ids, matrix, version
+            self._loaded_at = time.monotonic()
+
+    def best_match(self, embedding):
+        """
+        Args:
+            embedding: Embedding of the message to route
+
+        Returns:
+            AgentMatch: The most similar agent, or None if no agent has an embedding yet
+        """
+        version = get_version(VERSION_NAME)
+        # Before the first load the version is None as well
+        if version != self._version or time.monotonic() - self._loaded_at >= settings.AGENT_ROUTER['RELOAD_INTERVAL']:
+            self.load(version)
+
+        with self._lock:
+            ids, matrix = self._ids, self._matrix
+        if not len(ids):
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return None
+        similarities = matrix @ (query / norm)
+        best = int(np.argmax(similarities))
+        return AgentMatch(int(ids[best]), float(similarities[best]))
+
+    def route(self, embedding):
+        """
+        Pick the agent for a message, falling back to the generic agent
+
+        Args:
+            embedding: Embedding of the message to route
+
+        Returns:
+            tuple: (Agent id, AgentMatch or None); the match is kept even when
+            its similarity was below the threshold and the generic agent was used
+        """
+        match = self.best_match(embedding)
+        threshold = settings.AGENT_ROUTER['MIN_SIMILARITY']
+        if match is not None and match.similarity >= threshold:
+            return match.agent_id, match
+
+        generic_agent, _ = Agent.objects.get_or_create(
+            name=GENERIC_AGENT['name'],
+            defaults={key: value for key, value in GENERIC_AGENT.items() if key != 'name'},
+        )
+        logger.info("No agent above similarity %s (best %s), using the generic agent", threshold, match)
+        return generic_agent.pk, match
+
+
+_router = AgentRouter()
+
+
+def get_agent_router():
+    return _router
+
+
+@receiver(post_save, sender=Agent)
+@receiver(post_delete, sender=Agent)
+@receiver(embedding_updated, sender=Agent)
+def invalidate_agent_router(sender, **kwargs):
+    # Other processes must not reload before the change is visible to them
+    transaction.on_commit(lambda: bump_version(VERSION_NAME))
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.urls import reverse
@@ -6,7 +6,14 @@ import uuid
 from unittest.mock import patch, MagicMock
 import json
 
+from utils.embeddings import get_embedding
 from .models import Agent, Conversation, Message
+from .router import GENERIC_AGENT, get_agent_router
+
+
+def reset_agent_router():
+    # Rolled back tests never bump the version, reload so no agent ids of another test are kept
+    get_agent_router().load()
 
 class ConversationAPITests(APITestCase):
     
@@ -16,6 +23,7 @@ class ConversationAPITests(APITestCase):
             name="Test Agent",
             description="I am a test agent for travel assistance."
         )
+        reset_agent_router()
         
         # Setup API client
         self.client = APIClient()
@@ -147,3 +155,60 @@ class ConversationAPITests(APITestCase):
         data = {'message': 'Test', 'conversation_id': 'not-a-uuid'}
         response = self.client.post(self.url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(EMBEDDINGS={'BACKEND': 'hashing'}, EMBEDDING_ASYNC=False, AGENT_ROUTER={'MIN_SIMILARITY': 0.3, 'RELOAD_INTERVAL': 60})
+class AgentRouterTests(APITestCase):
+
+    def setUp(self):
+        self.router = get_agent_router()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hotel = Agent.objects.create(name="Hotels", description="hotel room booking")
+            self.car = Agent.objects.create(name="Cars", description="car rental pickup")
+        reset_agent_router()
+
+    def embed(self, text):
+        return get_embedding(text)
+
+    def test_best_match_without_queries(self):
+        self.router.best_match(self.embed("warm up"))
+        with self.assertNumQueries(0):
+            match = self.router.best_match(self.embed("book a hotel room"))
+        self.assertEqual(match.agent_id, self.hotel.pk)
+        self.assertGreater(match.similarity, 0.3)
+
+    def test_reloads_after_agent_changes(self):
+        self.router.best_match(self.embed("warm up"))
+        with self.captureOnCommitCallbacks(execute=True):
+            tours = Agent.objects.create(name="Tours", description="guided city tours")
+        self.assertEqual(self.router.best_match(self.embed("guided tours")).agent_id, tours.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tours.delete()
+        self.assertNotEqual(self.router.best_match(self.embed("guided tours")).agent_id, tours.pk)
+
+    def test_reloads_changes_of_other_processes_in_time(self):
+        self.router.best_match(self.embed("warm up"))
+        # Without commit callbacks no version is bumped, as for a change made
+        # by a process that does not share this cache
+        tours = Agent.objects.create(name="Tours", description="guided city tours")
+        self.assertNotEqual(self.router.best_match(self.embed("guided tours")).agent_id, tours.pk)
+
+        with self.settings(AGENT_ROUTER={'MIN_SIMILARITY': 0.3, 'RELOAD_INTERVAL': 0}):
+            self.assertEqual(self.router.best_match(self.embed("guided tours")).agent_id, tours.pk)
+
+    def test_low_similarity_falls_back_to_generic_agent(self):
+        agent_id, match = self.router.route(self.embed("zebra xylophone"))
+        self.assertEqual(Agent.objects.get(pk=agent_id).name, GENERIC_AGENT['name'])
+        self.assertLess(match.similarity, 0.3)
+
+        # Reused, not created again
+        agent_id_again, _ = self.router.route(self.embed("quantum origami"))
+        self.assertEqual(agent_id_again, agent_id)
+
+    @patch('agents.views.LangChainHandler')
+    def test_conversation_is_routed(self, mock_langchain):
+        mock_langchain.return_value.process_message.return_value = {'response': 'Hi', 'is_complete': False}
+        response = self.client.post(reverse('conversation'), {'message': 'hotel room for two'}, format='json')
+        conversation = Conversation.objects.get(id=response.data['conversation_id'])
+        self.assertEqual(conversation.agent, self.hotel)
@@ -4,13 +4,12 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
 from datetime import timedelta
-from pgvector.django import L2Distance
-from django.db.models import F
 
-from .models import Agent, Conversation, Message
+from .models import Conversation, Message
 from .serializers import ConversationSerializer
 from utils.embeddings import get_embedding
 from .langchain_handler import LangChainHandler
+from .router import get_agent_router
 
 class ConversationView(APIView):
     """
@@ -23,7 +22,7 @@ class ConversationView(APIView):
         
         - Creates a new conversation if conversation_id is not provided
         - Checks if conversation is still active (within 1 hour)
-        - Finds best matching agent using vector similarity
+        - Routes the first message to the most similar agent, or the generic agent
         - Uses LangChain to process the conversation and extract information
         - Returns agent response and conversation details
         """
@@ -69,31 +68,10 @@ class ConversationView(APIView):
             # Generate embedding for user message
             query_embedding = get_embedding(user_message)
             
-            # Find most similar agent
-            agents = Agent.objects.annotate(
-                distance=L2Distance('embedding', query_embedding)
-            ).order_by('distance')
-            
-            if agents.exists():
-                best_agent = agents.first()
-                conversation.agent = best_agent
-                conversation.save()
-            else:
-                # Fallback to create a generic agent if none exist
-                generic_agent = Agent.objects.create(
-                    name='Generic Travel Assistant',
-                    description='I am a general travel assistant that can help with various travel needs.',
-                    required_fields=['travel_type', 'destination', 'dates', 'travelers'],
-                    optional_fields=['budget', 'preferences', 'special_requirements'],
-                    prompts={
-                        'travel_type': 'What type of travel assistance do you need?',
-                        'destination': 'Where are you planning to travel?',
-                        'dates': 'When are you planning to travel?',
-                        'travelers': 'How many people are traveling?'
-                    }
-                )
-                conversation.agent = generic_agent
-                conversation.save()
+            # Pick the most similar agent in memory, or the generic one when none is close
+            agent_id, _ = get_agent_router().route(query_embedding)
+            conversation.agent_id = agent_id
+            conversation.save()
         
         # Process message with LangChain
         agent = conversation.agent
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Destination, Bookable, BookableImage, Collection, CollectionItem, Review
+from .models import Destination, Bookable, BookableImage, Collection, CollectionItem, Review, RatingSummary
 from django_svelte_jsoneditor.widgets import SvelteJSONEditorWidget
 from django.db.models import JSONField
 
@@ -48,3 +48,9 @@ class ReviewAdmin(admin.ModelAdmin):
     list_filter = ['rating', 'created_at']
     search_fields = ['bookable__title', 'user__username', 'comment']
     readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(RatingSummary)
+class RatingSummaryAdmin(admin.ModelAdmin):
+    list_display = ['bookable', 'rating_avg', 'rating_count']
+    search_fields = ['bookable__title']
+    readonly_fields = ['rating_sum', 'rating_count', 'rating_avg', 'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5']
@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class TravelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'travel'
-    verbose_name = 'Travel Management' 
\ No newline at end of file
+    verbose_name = 'Travel Management' 
+
+    def ready(self):
+        # Connect the cache invalidation receivers and register the job handlers
+        from . import jobs, signals  # noqa: F401
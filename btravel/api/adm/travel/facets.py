@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.utils import timezone
+
+from utils.models import Job
+
+from .models import Bookable, Destination
+
+FACETS_VIEW = 'travel_bookable_facets'
+
+# Upper bounds of the price buckets, the same as in the view (see migration 0015)
+PRICE_BUCKETS = (50, 100, 200, 500)
+
+# Defined in migration 0015, the view holds its rows for the whole catalog
+FACET_ROWS_FUNCTION = 'travel_bookable_facet_rows'
+
+FACET_COLUMNS = {
+    'type': 'type',
+    'destination': 'destination_id',
+    'stars': 'stars',
+    'price': 'price_bucket',
+}
+
+
+def refresh_facets():
+    """
+    Recompute the materialized view without blocking the facet reads meanwhile
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {FACETS_VIEW}")
+
+
+def schedule_facets_refresh():
+    """
+    Queue a refresh FACETS['REFRESH_DELAY'] seconds from now
+
+    Only one refresh is ever pending, so a burst of catalog writes costs a
+    single refresh. The job is not about one row, it is filed under the
+    Bookable content type with object id 0.
+    """
+    Job.objects.bulk_create([Job(
+        kind=Job.Kind.FACETS_REFRESH,
+        content_type=ContentType.objects.get_for_model(Bookable),
+        object_id=0,
+        run_after=timezone.now() + timedelta(seconds=settings.FACETS['REFRESH_DELAY']),
+    )], ignore_conflicts=True)
+
+
+def get_facets(type=None, destination=None, min_stars=None):
+    """
+    Facet counts of the whole catalog, read from the materialized view
+
+    Every facet is counted with the filters on the other facets only, so
+    the counts show what picking another value of that facet would give.
+    The counts are as of the last refresh.
+
+    Args:
+        type (str): Selected bookable type
+        destination (int): Selected destination id
+        min_stars (int): Selected minimum stars
+
+    Returns:
+        dict: See count_facets
+    """
+    filters = {'type': type, 'destination': destination, 'stars': min_stars}
+    return count_facets(f"SELECT type, destination_id, stars, price_bucket, bookables FROM {FACETS_VIEW}", [], filters)
+
+
+def get_candidate_facets(ids):
+    """
+    Facet counts of a set of bookables, e.g. the candidates of a search
+
+    Args:
+        ids (list): Bookable ids
+
+    Returns:
+        dict: See count_facets
+    """
+    return count_facets(f"SELECT * FROM {FACET_ROWS_FUNCTION}(%s::bigint[])", [list(ids)], {})
+
+
+def count_facets(rows_sql, rows_params, filters):
+    """
+    Args:
+        rows_sql (str): Query returning rows shaped like the materialized view
+        rows_params (list): Its parameters
+        filters (dict): Selected value per facet name, None when not selected
+
+    Returns:
+        dict: total, and per facet a list of {'value', 'count'}; destinations
+        also carry their name and price buckets their min and max
+    """
+    selects, params = [], list(rows_params)
+    for facet, column in FACET_COLUMNS.items():
+        conditions = []
+        for name, value in filters.items():
+            if name == facet or value is None:
+                continue
+            conditions.append(f"{FACET_COLUMNS[name]} >= %s" if name == 'stars' else f"{FACET_COLUMNS[name]} = %s")
+            params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        selects.append(
+            f"SELECT '{facet}', {column}::text, sum(bookables)::integer FROM facet_rows {where} GROUP BY {column}"
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"WITH facet_rows AS ({rows_sql}) {' UNION ALL '.join(selects)}", params)
+        rows = cursor.fetchall()
+
+    counts = {facet: {} for facet in FACET_COLUMNS}
+    for facet, value, count in rows:
+        counts[facet][value] = count
+
+    destination_names = dict(
+        Destination.objects.filter(pk__in=[int(pk) for pk in counts['destination']]).values_list('pk', 'name')
+    )
+    by_count = lambda item: (-item['count'], str(item['value']))
+    return {
+        # The price facet is the only one counted under every filter
+        'total': sum(counts['price'].values()),
+        'type': sorted(({'value': value, 'count': count} for value, count in counts['type'].items()), key=by_count),
+        'destination': sorted((
+            {'value': int(pk), 'name': destination_names.get(int(pk), ''), 'count': count}
+            for pk, count in counts['destination'].items()
+        ), key=by_count),
+        'stars': sorted((
+            {'value': int(stars), 'count': count}
+            for stars, count in counts['stars'].items() if int(stars) > 0
+        ), key=lambda item: -item['value']),
+        'price': [
+            {
+                'value': bucket,
+                'min': PRICE_BUCKETS[bucket - 1] if bucket > 0 else 0,
+                'max': PRICE_BUCKETS[bucket] if bucket < len(PRICE_BUCKETS) else None,
+                'count': counts['price'][str(bucket)],
+            }
+            for bucket in sorted(int(value) for value in counts['price'] if int(value) >= 0)
+        ],
+    }
@@ -0,0 +1,266 @@
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+
+from django.db import connection, transaction
+
+from utils.models import Checkpoint
+
+from .models import Bookable, Destination
+
+STAGING_TABLE = 'import_bookable_staging'
+
+STAGING_COLUMNS = ('seq', 'external_id', 'title', 'destination_id', 'type', 'options')
+
+
+class RecordError(ValueError):
+    """A record of the import file that cannot be loaded"""
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    return 'csv' if extension == '.csv' else 'jsonl'
+
+
+def get_file_signature(path):
+    """
+    Returns:
+        str: Hash of the first 64 KiB, a resume must continue the same file
+    """
+    with open(path, 'rb') as handle:
+        return hashlib.sha256(handle.read(65536)).hexdigest()
+
+
+def read_records(path, file_format, position=None):
+    """
+    Stream the records of a JSONL or CSV file, one at a time
+
+    Args:
+        path (str): File to read
+        file_format (str): 'jsonl' or 'csv'
+        position (dict): Position yielded for an earlier record, reading continues after it
+
+    Yields:
+        tuple: (record dict or RecordError, position after this record)
+    """
+    position = position or {'records': 0, 'offset': 0}
+    records = position['records']
+
+    if file_format == 'jsonl':
+        offset = position['offset']
+        with open(path, 'rb') as handle:
+            # Byte offsets let a resumed JSONL import seek instead of re-reading
+            handle.seek(offset)
+            for line in handle:
+                offset += len(line)
+                if not line.strip():
+                    continue
+                records += 1
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise RecordError('not a JSON object')
+                except (ValueError, RecordError) as exc:
+                    record = RecordError(f'record {records}: {exc}')
+                yield record, {'records': records, 'offset': offset}
+        return
+
+    with open(path, newline='', encoding='utf-8') as handle:
+        # Quoted CSV values may span lines, so CSV resumes by skipping records
+        reader = csv.DictReader(handle)
+        for record in itertools.islice(reader, records, None):
+            records += 1
+            yield record, {'records': records, 'offset': 0}
+
+
+def clean_record(record):
+    """
+    Args:
+        record (dict): Raw record with external_id, title, destination, type and options
+
+    Returns:
+        dict: The values to load
+
+    Raises:
+        RecordError: A value is missing or invalid
+    """
+    cleaned = {}
+    for name in ('external_id', 'title', 'destination'):
+        value = str(record.get(name) or '').strip()
+        if not value:
+            raise RecordError(f'{name} is required')
+        if len(value) > 255:
+            raise RecordError(f'{name} is longer than 255 characters')
+        cleaned[name] = value
+
+    bookable_type = str(record.get('type') or '').strip().lower()
+    if bookable_type not in Bookable.BookableType.values:
+        raise RecordError(f'unknown type {bookable_type!r}')
+    cleaned['type'] = bookable_type
+
+    options = record.get('options') or {}
+    if isinstance(options, str):
+        try:
+            options = json.loads(options)
+        except ValueError:
+            raise RecordError('options is not valid JSON')
+    if not isinstance(options, dict):
+        raise RecordError('options must be an object')
+    cleaned['options'] = options
+    return cleaned
+
+
+class BookableImporter:
+    """
+    Load batches of cleaned records into the catalog
+
+    Each batch is written with COPY into a temporary staging table and
+    merged into travel_bookable with one INSERT ... ON CONFLICT on
+    external_id. Rows whose content changed get an empty embedding
+    fingerprint, which marks them for embed_pending() while they keep
+    their previous vector in search.
+    """
+
+    def __init__(self):
+        # Destination name to id, destinations are few compared to bookables
+        self.destinations = {}
+
+    def setup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} (
+                    seq integer,
+                    external_id text,
+                    title text,
+                    destination_id bigint,
+                    type text,
+                    options jsonb
+                )
+            """)
+
+    def teardown(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+
+    def get_destination_ids(self, names):
+        """
+        Look up destinations by name and create the missing ones
+
+        Args:
+            names (set): Destination names
+
+        Returns:
+            dict: Name to destination id
+        """
+        missing = set(names) - self.destinations.keys()
+        if missing:
+            # Names are not unique, the oldest destination of a name wins
+            for name, pk in Destination.objects.filter(name__in=missing).order_by('-pk').values_list('name', 'pk'):
+                self.destinations[name] = pk
+            created = Destination.objects.bulk_create(
+                [Destination(name=name) for name in sorted(missing - self.destinations.keys())]
+            )
+            for destination in created:
+                self.destinations[destination.name] = destination.pk
+        return {name: self.destinations[name] for name in names}
+
+    def load_batch(self, records):
+        """
+        Merge one batch of records into the catalog
+
+        Call inside a transaction, after setup().
+
+        Args:
+            records (list): Cleaned records, a later record wins over an earlier one with the same external_id
+
+        Returns:
+            tuple: (created, updated) row counts
+        """
+        destination_ids = self.get_destination_ids({record['destination'] for record in records})
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for seq, record in enumerate(records):
+            writer.writerow([
+                seq,
+                record['external_id'],
+                record['title'],
+                destination_ids[record['destination']],
+                record['type'],
+                json.dumps(record['options']),
+            ])
+        buffer.seek(0)
+
+        table = Bookable._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+            cursor.copy_expert(
+                f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+            # Unchanged rows are left alone, so re-importing a file rewrites nothing
+            cursor.execute(f"""
+                INSERT INTO {table} AS bookable (
+                    external_id, title, destination_id, type, options, embedding_fingerprint, embedding_model
+                )
+                SELECT DISTINCT ON (external_id) external_id, title, destination_id, type, options, '', ''
+                FROM {STAGING_TABLE}
+                ORDER BY external_id, seq DESC
+                ON CONFLICT (external_id) DO UPDATE SET
+                    title = EXCLUDED.title,
+                    destination_id = EXCLUDED.destination_id,
+                    type = EXCLUDED.type,
+                    options = EXCLUDED.options,
+                    embedding_fingerprint = ''
+                WHERE (bookable.title, bookable.destination_id, bookable.type, bookable.options)
+                    IS DISTINCT FROM (EXCLUDED.title, EXCLUDED.destination_id, EXCLUDED.type, EXCLUDED.options)
+                RETURNING xmax = 0
+            """)
+            inserted = [row[0] for row in cursor.fetchall()]
+
+        created = sum(inserted)
+        return created, len(inserted) - created
+
+
+def embed_pending(batch_size=500):
+    """
+    Embed every bookable left without a current embedding by load_batch()
+
+    Works through the rows in primary key batches, each embedded with
+    batched provider calls and committed on its own, so an interrupted run
+    continues where it stopped.
+
+    Args:
+        batch_size (int): Rows embedded per round
+
+    Yields:
+        int: Number of rows embedded in each round
+    """
+    last_pk = 0
+    while True:
+        batch = list(
+            Bookable.objects.select_related('destination')
+            .filter(pk__gt=last_pk, embedding_fingerprint='')
+            .order_by('pk')[:batch_size]
+        )
+        if not batch:
+            return
+        with transaction.atomic():
+            Bookable.objects.bulk_update_with_embeddings(batch, [], batch_size=batch_size)
+        last_pk = batch[-1].pk
+        yield len(batch)
+
+
+def get_checkpoint_name(path):
+    return f'import_bookables:{os.path.abspath(path)}'
+
+
+def save_checkpoint(path, signature, position, totals):
+    Checkpoint.save_state(get_checkpoint_name(path), {
+        'signature': signature,
+        'position': position,
+        'totals': totals,
+    })
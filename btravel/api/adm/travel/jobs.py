@@ -0,0 +1,30 @@
+from django.db import transaction
+
+from utils.cache_versions import bump_version
+from utils.jobs import register
+from utils.models import Job
+
+from .facets import refresh_facets
+from .models import BookableImage
+from .renditions import generate_renditions
+from .signals import LISTINGS_VERSION
+
+
+@register(Job.Kind.IMAGE_RENDITIONS)
+def process_image_renditions_job(job):
+    image = job.get_object()
+    if image is None or not image.image:
+        return
+
+    renditions = generate_renditions(image)
+
+    # Skip the write if the image was replaced meanwhile, that save queued another job
+    updated = BookableImage.objects.filter(pk=image.pk, image=image.image.name).update(renditions=renditions)
+    if updated:
+        # Queryset updates send no post_save, cached listings still show the originals
+        transaction.on_commit(lambda: bump_version(LISTINGS_VERSION))
+
+
+@register(Job.Kind.FACETS_REFRESH)
+def process_facets_refresh_job(job):
+    refresh_facets()
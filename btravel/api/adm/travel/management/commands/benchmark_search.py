@@ -0,0 +1,224 @@
+import json
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from travel.models import Bookable
+from travel.search import measure_recall
+from utils.embedding_backends import get_backend
+from utils.vector_search import get_vector_extension_version
+
+
+def search_request(mode):
+    def request(client, bookable):
+        message = f"{bookable.title} in {bookable.destination.name}"
+        return client.post(reverse('travel:bookable-search'), {'message': message, 'mode': mode}, format='json')
+    return request
+
+
+SCENARIOS = {
+    'list': lambda client, bookable: client.get(reverse('travel:bookable-list'), {'destination': bookable.destination_id}),
+    'detail': lambda client, bookable: client.get(reverse('travel:bookable-detail', args=[bookable.pk])),
+    'similar': lambda client, bookable: client.get(reverse('travel:bookable-similar', args=[bookable.pk])),
+    'search-semantic': search_request('semantic'),
+    'search-lexical': search_request('lexical'),
+    'search-hybrid': search_request('hybrid'),
+}
+
+
+def summarize_latencies(seconds):
+    """
+    Returns:
+        dict: Mean and p50/p95/p99 of the latencies in milliseconds
+    """
+    milliseconds = np.array(seconds) * 1000
+    p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+    return {
+        'mean_ms': round(float(milliseconds.mean()), 2),
+        'p50_ms': round(float(p50), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the bookable API and the vector index against the current database. '
+        'Requests go through the full Django stack in process; load a catalog first, e.g. with '
+        '`generate_sample_data --bookables 100000`. Prints a JSON report.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f'Comma separated scenarios out of {", ".join(SCENARIOS)}')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario and concurrency')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests before each run')
+        parser.add_argument('--concurrency', default='1',
+                            help='Comma separated numbers of client threads, e.g. 1,4,16')
+        parser.add_argument('--sample', type=int, default=50,
+                            help='Bookables used as request targets and as recall queries')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for picking the sample')
+        parser.add_argument('--cache', action='store_true',
+                            help='Keep the response and search result caches on (off by default)')
+        parser.add_argument('--k', type=int, default=10, help='Results compared per recall query')
+        parser.add_argument('--ef-search', default='40,100,200',
+                            help='Comma separated hnsw.ef_search values to measure recall for')
+        parser.add_argument('--compact-depths', default='100,200',
+                            help='Comma separated re-rank depths to measure compact search recall for')
+        parser.add_argument('--no-recall', action='store_true', help='Skip the recall measurement')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        scenarios = [name for name in options['scenarios'].split(',') if name]
+        unknown = set(scenarios) - SCENARIOS.keys()
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+        concurrencies = [int(value) for value in options['concurrency'].split(',') if value]
+
+        sample = self.sample_bookables(options['sample'], options['seed'])
+        if not sample:
+            raise CommandError('No bookables to benchmark, generate a catalog first')
+
+        report = {
+            'meta': {
+                'commit': get_commit(),
+                'timestamp': timezone.now().isoformat(),
+                'bookables': Bookable.objects.count(),
+                'pgvector': '.'.join(map(str, get_vector_extension_version())),
+                'embedding_model': get_backend().model,
+                'vector_search': settings.VECTOR_SEARCH,
+                'cache': options['cache'],
+            },
+            'latency': [],
+            'recall': [],
+        }
+
+        overrides = {}
+        if not options['cache']:
+            overrides = {
+                'RESPONSE_CACHE': {**settings.RESPONSE_CACHE, 'TTL': 0},
+                'SEARCH_RESULT_CACHE': {**settings.SEARCH_RESULT_CACHE, 'TTL': 0},
+                'SIMILAR_BOOKABLES': {**settings.SIMILAR_BOOKABLES, 'CACHE_TTL': 0},
+            }
+        with override_settings(**overrides):
+            for name in scenarios:
+                for concurrency in concurrencies:
+                    self.stderr.write(f'Running {name} with {concurrency} clients...')
+                    report['latency'].append(self.run_scenario(name, sample, options, concurrency))
+
+        if not options['no_recall']:
+            report['recall'] = self.measure_recall(sample, options)
+
+        output = json.dumps(report, indent=2, default=str)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def sample_bookables(self, count, seed):
+        """
+        Returns:
+            list: Up to count bookables with embeddings, the same ones for the same seed and catalog
+        """
+        queryset = Bookable.objects.select_related('destination').filter(embedding__isnull=False).order_by('pk')
+        bounds = queryset.values_list('pk', flat=True)
+        if not bounds.exists():
+            return []
+        low, high = bounds.first(), bounds.last()
+        rng = random.Random(seed)
+        sample = {}
+        for _ in range(count):
+            bookable = queryset.filter(pk__gte=rng.randint(low, high)).first()
+            sample[bookable.pk] = bookable
+        return list(sample.values())
+
+    def run_scenario(self, name, sample, options, concurrency):
+        request = SCENARIOS[name]
+
+        def run(indexes, measure=True):
+            client = APIClient()
+            results = []
+            for index in indexes:
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = request(client, sample[index % len(sample)])
+                    elapsed = time.perf_counter() - started
+                if measure:
+                    results.append((elapsed, len(queries), response.status_code))
+            return results
+
+        def run_in_thread(indexes):
+            # Every thread gets its own database connection
+            try:
+                return run(indexes)
+            finally:
+                connection.close()
+
+        run(range(options['warmup']), measure=False)
+
+        total = options['requests']
+        started = time.perf_counter()
+        if concurrency == 1:
+            results = run(range(total))
+        else:
+            with ThreadPoolExecutor(concurrency) as pool:
+                chunks = pool.map(run_in_thread, [range(start, total, concurrency) for start in range(concurrency)])
+                results = [result for chunk in chunks for result in chunk]
+        wall = time.perf_counter() - started
+
+        query_counts = [queries for _, queries, _ in results]
+        return {
+            'scenario': name,
+            'concurrency': concurrency,
+            'requests': len(results),
+            'errors': sum(1 for _, _, status in results if status >= 400),
+            **summarize_latencies([elapsed for elapsed, _, _ in results]),
+            'throughput_rps': round(len(results) / wall, 2),
+            'queries_per_request': round(sum(query_counts) / len(query_counts), 2),
+            'max_queries': max(query_counts),
+        }
+
+    def measure_recall(self, sample, options):
+        """
+        recall@k of every ANN configuration against exact search, using stored embeddings as queries
+        """
+        k = options['k']
+        strategies = [
+            {'strategy': 'hnsw', 'ef_search': int(value), 'compact': False, 'depth': k}
+            for value in options['ef_search'].split(',') if value
+        ] + [
+            {'strategy': 'compact', 'ef_search': None, 'compact': True, 'depth': int(value)}
+            for value in options['compact_depths'].split(',') if value
+        ]
+        results = measure_recall(Bookable.objects.all(), [bookable.embedding for bookable in sample], strategies, k)
+
+        return [
+            {
+                **strategy,
+                'k': k,
+                'queries': len(sample),
+                'recall': round(recall, 4),
+                **summarize_latencies(seconds),
+            }
+            for strategy, (recall, seconds) in zip(strategies, results)
+        ]
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from travel.models import BookableImage
+from utils.models import Job
+
+class Command(BaseCommand):
+    help = 'Queue rendition jobs for bookable images that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate renditions of every image')
+
+    def handle(self, *args, **options):
+        images = BookableImage.objects.exclude(image='')
+        if not options['force']:
+            images = images.filter(renditions={})
+
+        count = 0
+        for image in images.only('pk').iterator(chunk_size=1000):
+            Job.enqueue(Job.Kind.IMAGE_RENDITIONS, image)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Queued renditions for {count} images, run `manage.py run_worker` to generate them'))
@@ -1,14 +1,46 @@
 import random
-from django.core.management.base import BaseCommand
-from travel.models import Destination, Bookable, BookableImage
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from pgvector.django import HnswIndex
+from travel.facets import refresh_facets
+from travel.importer import BookableImporter
+from travel.models import Destination, Bookable, RatingSummary
+from travel.signals import CATALOG_VERSION, LISTINGS_VERSION
+from travel.synthetic import SyntheticCatalog, get_synthetic_users
+from utils.cache_versions import bump_version
+from utils.embedding_backends import BACKENDS, load_backend
 from faker import Faker
 
 fake = Faker()
 
 class Command(BaseCommand):
-    help = 'Generate sample data for destinations and bookables'
+    help = (
+        'Generate sample data for destinations and bookables. '
+        'With --bookables, generate a deterministic catalog of that size with COPY instead.'
+    )
+
+    def add_arguments(self, parser):
+        scale = parser.add_argument_group('scale mode')
+        scale.add_argument('--bookables', type=int, default=None,
+                           help='Number of bookables to generate, enables scale mode')
+        scale.add_argument('--destinations', type=int, default=200, help='Number of destinations')
+        scale.add_argument('--reviews-per-bookable', type=int, default=5, help='Reviews written for every bookable')
+        scale.add_argument('--images-per-bookable', type=int, default=2,
+                           help='Image rows per bookable, the first is the thumbnail (no files are written)')
+        scale.add_argument('--users', type=int, default=1000, help='Reviewer accounts shared by all reviews')
+        scale.add_argument('--embedding-backend', default='synthetic', choices=['synthetic'] + sorted(BACKENDS),
+                           help='synthetic stores clustered random vectors, other backends embed the generated text')
+        scale.add_argument('--clusters', type=int, default=64, help='Number of clusters of synthetic vectors')
+        scale.add_argument('--seed', type=int, default=0, help='Seed, the same seed generates the same catalog')
+        scale.add_argument('--batch-size', type=int, default=10000, help='Bookables generated per transaction')
+        scale.add_argument('--defer-indexes', action='store_true',
+                           help='Drop the HNSW indexes during the load and build them once at the end')
 
     def handle(self, *args, **kwargs):
+        if kwargs.get('bookables') is not None:
+            return self.generate_at_scale(kwargs)
+
         self.stdout.write('Generating sample data...')
         
         # Create 10 destinations
@@ -59,7 +91,8 @@ class Command(BaseCommand):
         car_prefixes = ["Luxury", "Economy", "Compact", "SUV", "Sports", "Convertible", "Electric", "Premium", "Classic", "Family"]
         car_suffixes = ["Car", "Vehicle", "Rental", "Auto", "Sedan", "Convertible", "Van", "SUV", "4x4", "Transport"]
         
-        created_count = 0
+        existing = set(Bookable.objects.values_list('title', 'destination_id', 'type'))
+        new_bookables = []
         
         for i in range(100):
             # Select a random destination and bookable type
@@ -160,17 +193,83 @@ class Command(BaseCommand):
                     "features": [fake.word() for _ in range(random.randint(3, 8))]
                 }
             
-            # Create bookable
-            bookable, created = Bookable.objects.get_or_create(
+            # Skip bookables that already exist
+            if (title, destination.id, bookable_type) in existing:
+                continue
+            
+            new_bookables.append(Bookable(
                 title=title,
                 destination=destination,
                 type=bookable_type,
-                defaults={'options': options}
-            )
-            
-            if created:
-                created_count += 1
-                if created_count % 10 == 0:
-                    self.stdout.write(f'Created {created_count} bookables...')
+                options=options
+            ))
+        
+        # Insert all bookables with batched embedding requests instead of one per row
+        created_count = len(Bookable.objects.bulk_create_with_embeddings(new_bookables))
         
         self.stdout.write(self.style.SUCCESS(f'Successfully created {created_count} new bookables for 10 destinations'))
+
+    def generate_at_scale(self, options):
+        total = options['bookables']
+        if options['reviews_per_bookable'] > options['users']:
+            raise CommandError('--users must be at least --reviews-per-bookable, a user reviews a bookable once')
+
+        backend = None
+        if options['embedding_backend'] != 'synthetic':
+            backend = load_backend({'BACKEND': options['embedding_backend']})
+
+        fake.seed_instance(options['seed'])
+        names = []
+        for _ in range(options['destinations']):
+            name = f"{fake.city()}, {fake.country()}"
+            names.append(name if name not in names else f"{name} {len(names)}")
+        catalog = SyntheticCatalog(
+            BookableImporter().get_destination_ids(set(names)),
+            get_synthetic_users(options['users']),
+            seed=options['seed'],
+            clusters=options['clusters'],
+            backend=backend,
+            reviews_per_bookable=options['reviews_per_bookable'],
+            images_per_bookable=options['images_per_bookable'],
+        )
+
+        deferred = []
+        if options['defer_indexes']:
+            deferred = [index for index in Bookable._meta.indexes if isinstance(index, HnswIndex)]
+            with connection.schema_editor() as editor:
+                for index in deferred:
+                    editor.remove_index(Bookable, index)
+
+        started = time.monotonic()
+        counts = [0, 0, 0]
+        try:
+            while counts[0] < total:
+                with transaction.atomic():
+                    batch = catalog.load_batch(min(options['batch_size'], total - counts[0]))
+                counts = [count + added for count, added in zip(counts, batch)]
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{counts[0]}/{total} bookables, {counts[1]} reviews, {counts[2]} images, '
+                    f'{counts[0] / elapsed:.0f} bookables/s'
+                )
+        finally:
+            if deferred:
+                # A single build is much faster than inserting row by row into the graph
+                self.stdout.write(f'Building {len(deferred)} vector indexes...')
+                with connection.schema_editor() as editor:
+                    for index in deferred:
+                        editor.add_index(Bookable, index)
+
+        self.stdout.write('Rebuilding rating summaries and facet counts...')
+        RatingSummary.rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE travel_bookable, travel_review, travel_bookableimage, travel_ratingsummary')
+        # Rows written with COPY send no signals
+        refresh_facets()
+        bump_version(LISTINGS_VERSION)
+        bump_version(CATALOG_VERSION)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully generated {counts[0]} bookables, {counts[1]} reviews and {counts[2]} images '
+            f'in {time.monotonic() - started:.0f}s'
+        ))
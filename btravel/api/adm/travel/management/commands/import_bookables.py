@@ -0,0 +1,120 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from travel.facets import refresh_facets
+from travel.importer import (
+    BookableImporter, RecordError, clean_record, detect_format, embed_pending, get_checkpoint_name,
+    get_file_signature, read_records, save_checkpoint,
+)
+from travel.signals import CATALOG_VERSION, LISTINGS_VERSION
+from utils.cache_versions import bump_version
+from utils.models import Checkpoint
+
+class Command(BaseCommand):
+    help = (
+        'Import bookables from a JSONL or CSV file of any size, merging on external_id. '
+        'Records need external_id, title, destination, type and options (a JSON object). '
+        'An interrupted import resumes from its last committed batch when run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL or CSV file')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], default=None,
+                            help='File format (default from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Records merged per transaction')
+        parser.add_argument('--embedding-batch-size', type=int, default=500,
+                            help='Rows embedded per round after the load')
+        parser.add_argument('--no-embeddings', action='store_true',
+                            help='Only load rows; a later run embeds the rows still missing one')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore a saved checkpoint and read the file from the start')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'{path} does not exist')
+        file_format = options['format'] or detect_format(path)
+        batch_size = options['batch_size']
+
+        checkpoint_name = get_checkpoint_name(path)
+        signature = get_file_signature(path)
+        if options['restart']:
+            Checkpoint.clear(checkpoint_name)
+        state = Checkpoint.load(checkpoint_name)
+        if state and state['signature'] != signature:
+            raise CommandError(f'{path} changed since the interrupted import, run with --restart')
+
+        position = state.get('position')
+        totals = state.get('totals') or {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+        if position:
+            self.stdout.write(f"Resuming after record {position['records']}")
+
+        importer = BookableImporter()
+        importer.setup()
+        started = time.monotonic()
+        read = 0
+        try:
+            batch = []
+            for record, record_position in read_records(path, file_format, position):
+                read += 1
+                try:
+                    if isinstance(record, RecordError):
+                        raise record
+                    batch.append(clean_record(record))
+                except RecordError as exc:
+                    totals['skipped'] += 1
+                    self.stderr.write(f"Skipping record {record_position['records']}: {exc}")
+                position = record_position
+                if len(batch) >= batch_size:
+                    self.load(importer, batch, path, signature, position, totals)
+                    self.report(totals, read, started)
+                    batch = []
+            if batch:
+                self.load(importer, batch, path, signature, position, totals)
+                self.report(totals, read, started)
+        finally:
+            importer.teardown()
+
+        # Rows written with SQL send no signals
+        if totals['created'] or totals['updated']:
+            bump_version(LISTINGS_VERSION)
+            bump_version(CATALOG_VERSION)
+            refresh_facets()
+        Checkpoint.clear(checkpoint_name)
+
+        if not options['no_embeddings']:
+            self.embed(options['embedding_batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['created']} new and {totals['updated']} changed bookables, "
+            f"{totals['unchanged']} unchanged, {totals['skipped']} skipped"
+        ))
+
+    def load(self, importer, batch, path, signature, position, totals):
+        # The checkpoint commits with its batch, a resumed run starts right after it
+        with transaction.atomic():
+            created, updated = importer.load_batch(batch)
+            totals['created'] += created
+            totals['updated'] += updated
+            totals['unchanged'] += len({record['external_id'] for record in batch}) - created - updated
+            save_checkpoint(path, signature, position, totals)
+
+    def report(self, totals, read, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"{totals['created'] + totals['updated'] + totals['unchanged']} records merged "
+            f"({totals['created']} new, {totals['updated']} changed), {totals['skipped']} skipped, "
+            f"{read / elapsed if elapsed else 0:.0f} records/s"
+        )
+
+    def embed(self, batch_size):
+        started = time.monotonic()
+        embedded = 0
+        for count in embed_pending(batch_size):
+            embedded += count
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{embedded} bookables embedded, {embedded / elapsed if elapsed else 0:.0f} rows/s")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from travel.models import RatingSummary
+from travel.signals import LISTINGS_VERSION
+from utils.cache_versions import bump_version
+
+class Command(BaseCommand):
+    help = 'Recompute the rating summary of every bookable from its reviews'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Rebuilding rating summaries...')
+        count = RatingSummary.rebuild()
+        # Cached listings carry the old ratings
+        bump_version(LISTINGS_VERSION)
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt rating summaries for {count} bookables'))
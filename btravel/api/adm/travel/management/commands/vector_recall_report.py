@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from travel.models import Bookable
+from travel.search import measure_recall
+
+class Command(BaseCommand):
+    help = 'Measure recall@k of the HNSW and compact re-rank searches against exact search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=50,
+                            help='Number of stored bookable embeddings used as queries')
+        parser.add_argument('--k', type=int, default=10, help='Results compared per query')
+        parser.add_argument('--depths', default='50,100,200,400',
+                            help='Comma separated re-rank depths to try for compact search')
+        parser.add_argument('--ef-search', type=int, default=None,
+                            help='hnsw.ef_search for the approximate searches (default from settings)')
+
+    def handle(self, *args, **options):
+        k = options['k']
+        depths = [int(depth) for depth in options['depths'].split(',') if depth]
+
+        queries = list(
+            Bookable.objects.filter(embedding__isnull=False)
+            .order_by('?').values_list('embedding', flat=True)[:options['queries']]
+        )
+        if not queries:
+            raise CommandError('No bookables with embeddings to query')
+        if not Bookable.objects.filter(embedding_compact__isnull=False).exists():
+            self.stdout.write(self.style.WARNING('No compact embeddings stored, compact recall will be 0'))
+
+        names = ['hnsw full'] + [f'compact depth={depth}' for depth in depths]
+        strategies = [{'ef_search': options['ef_search'], 'compact': False, 'depth': k}] + [
+            {'ef_search': options['ef_search'], 'compact': True, 'depth': depth} for depth in depths
+        ]
+        results = measure_recall(Bookable.objects.all(), queries, strategies, k)
+
+        self.stdout.write(f'{len(queries)} queries, recall@{k} against exact search')
+        for name, (recall, seconds) in zip(names, results):
+            self.stdout.write(f'{name:<24} recall {recall:.3f}   mean {sum(seconds) / len(seconds) * 1000:.1f} ms')
+
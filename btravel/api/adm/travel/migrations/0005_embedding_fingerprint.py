@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0004_embedding_hnsw_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookable',
+            name='embedding_fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='collection',
+            name='embedding_fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0005_embedding_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('bookable', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to='travel.bookable')),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_avg', models.FloatField(db_index=True, default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        # Backfill from existing reviews
+        migrations.RunSQL(
+            sql="""
+            INSERT INTO travel_ratingsummary (
+                bookable_id, rating_sum, rating_count, rating_avg,
+                stars_1, stars_2, stars_3, stars_4, stars_5
+            )
+            SELECT
+                bookable_id, SUM(rating), COUNT(*), AVG(rating),
+                COUNT(*) FILTER (WHERE rating = 1),
+                COUNT(*) FILTER (WHERE rating = 2),
+                COUNT(*) FILTER (WHERE rating = 3),
+                COUNT(*) FILTER (WHERE rating = 4),
+                COUNT(*) FILTER (WHERE rating = 5)
+            FROM travel_review
+            GROUP BY bookable_id
+            ON CONFLICT (bookable_id) DO UPDATE SET
+                rating_sum = EXCLUDED.rating_sum,
+                rating_count = EXCLUDED.rating_count,
+                rating_avg = EXCLUDED.rating_avg,
+                stars_1 = EXCLUDED.stars_1,
+                stars_2 = EXCLUDED.stars_2,
+                stars_3 = EXCLUDED.stars_3,
+                stars_4 = EXCLUDED.stars_4,
+                stars_5 = EXCLUDED.stars_5""",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
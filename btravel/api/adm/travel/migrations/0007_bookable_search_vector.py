@@ -0,0 +1,76 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:01
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Title weighs most, then destination name, then the string values of options.
+# The vector is kept current by triggers so every writer (save, bulk_create, COPY)
+# stays searchable without extra application code.
+SEARCH_VECTOR_SQL = """
+CREATE OR REPLACE FUNCTION travel_bookable_search_vector(text, bigint, jsonb)
+RETURNS tsvector LANGUAGE sql STABLE AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce($1, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce((SELECT name FROM travel_destination WHERE id = $2), '')), 'B') ||
+        setweight(jsonb_to_tsvector('english', coalesce($3, '{}'::jsonb), '["string"]'), 'C')
+$$;
+
+CREATE OR REPLACE FUNCTION travel_bookable_search_vector_trigger()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := travel_bookable_search_vector(NEW.title, NEW.destination_id, NEW.options);
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER travel_bookable_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, destination_id, options ON travel_bookable
+    FOR EACH ROW EXECUTE FUNCTION travel_bookable_search_vector_trigger();
+
+CREATE OR REPLACE FUNCTION travel_destination_search_vector_trigger()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE travel_bookable
+    SET search_vector = travel_bookable_search_vector(title, destination_id, options)
+    WHERE destination_id = NEW.id;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER travel_destination_search_vector_update
+    AFTER UPDATE OF name ON travel_destination
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION travel_destination_search_vector_trigger();
+
+UPDATE travel_bookable SET search_vector = travel_bookable_search_vector(title, destination_id, options);
+"""
+
+DROP_SEARCH_VECTOR_SQL = """
+DROP TRIGGER IF EXISTS travel_destination_search_vector_update ON travel_destination;
+DROP TRIGGER IF EXISTS travel_bookable_search_vector_update ON travel_bookable;
+DROP FUNCTION IF EXISTS travel_destination_search_vector_trigger();
+DROP FUNCTION IF EXISTS travel_bookable_search_vector_trigger();
+DROP FUNCTION IF EXISTS travel_bookable_search_vector(text, bigint, jsonb);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0006_ratingsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookable',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_SQL, DROP_SEARCH_VECTOR_SQL),
+        migrations.AddIndex(
+            model_name='bookable',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='bookable_search_vector_gin'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:03
+
+import pgvector.django.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # HNSW builds can take a while on a large catalog, build them without
+    # blocking writes to the table.
+    atomic = False
+
+    dependencies = [
+        ('travel', '0007_bookable_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=pgvector.django.indexes.HnswIndex(condition=models.Q(('type', 'hotel')), ef_construction=64, fields=['embedding'], m=16, name='bookable_hotel_hnsw', opclasses=['vector_l2_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=pgvector.django.indexes.HnswIndex(condition=models.Q(('type', 'apartment')), ef_construction=64, fields=['embedding'], m=16, name='bookable_apartment_hnsw', opclasses=['vector_l2_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=pgvector.django.indexes.HnswIndex(condition=models.Q(('type', 'activity')), ef_construction=64, fields=['embedding'], m=16, name='bookable_activity_hnsw', opclasses=['vector_l2_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=pgvector.django.indexes.HnswIndex(condition=models.Q(('type', 'tour')), ef_construction=64, fields=['embedding'], m=16, name='bookable_tour_hnsw', opclasses=['vector_l2_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=pgvector.django.indexes.HnswIndex(condition=models.Q(('type', 'car')), ef_construction=64, fields=['embedding'], m=16, name='bookable_car_hnsw', opclasses=['vector_l2_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=pgvector.django.indexes.HnswIndex(condition=models.Q(('type', 'other')), ef_construction=64, fields=['embedding'], m=16, name='bookable_other_hnsw', opclasses=['vector_l2_ops']),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:08
+
+import numpy as np
+import pgvector.django.indexes
+import pgvector.django.vector
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+BACKFILL_BATCH_SIZE = 1000
+COMPACT_DIMENSION = 256
+
+
+def compact_embedding(vector):
+    # Frozen copy of utils.embeddings.compact_embedding as of this migration
+    compact = np.array(vector[:COMPACT_DIMENSION], dtype=np.float32)
+    norm = np.linalg.norm(compact)
+    return compact / norm if norm else compact
+
+
+def backfill_compact_embeddings(apps, schema_editor):
+    # Batches by primary key, each batch commits on its own
+    Bookable = apps.get_model('travel', 'Bookable')
+    last_pk = 0
+    while True:
+        batch = list(
+            Bookable.objects.filter(pk__gt=last_pk, embedding__isnull=False)
+            .order_by('pk').only('pk', 'embedding')[:BACKFILL_BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for bookable in batch:
+            bookable.embedding_compact = compact_embedding(bookable.embedding)
+        Bookable.objects.bulk_update(batch, ['embedding_compact'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # The backfill and the HNSW build can take a while on a large catalog,
+    # run them without holding one long transaction or blocking writes.
+    atomic = False
+
+    dependencies = [
+        ('travel', '0009_embedding_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookable',
+            name='embedding_compact',
+            field=pgvector.django.vector.VectorField(blank=True, dimensions=256, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_compact_embeddings, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding_compact'], m=16, name='bookable_embedding_compact_hnsw', opclasses=['vector_l2_ops']),
+        ),
+    ]
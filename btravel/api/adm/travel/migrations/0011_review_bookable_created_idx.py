@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:14
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the index without blocking review writes
+    atomic = False
+
+    dependencies = [
+        ('travel', '0010_bookable_embedding_compact'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='review',
+            index=models.Index(fields=['bookable', '-created_at'], name='review_bookable_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0011_review_bookable_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookableimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The partial index is built without blocking writes to the catalog
+    atomic = False
+
+
+    dependencies = [
+        ('travel', '0012_bookableimage_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookable',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=models.Index(condition=models.Q(('embedding_fingerprint', '')), fields=['id'], name='bookable_unembedded_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:39
+
+import django.contrib.postgres.indexes
+import travel.models
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# Immutable so expression indexes can be built over them. Values that are not
+# JSON numbers read as NULL instead of failing the query or the index build.
+OPTION_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION travel_bookable_option_number(options jsonb, key text)
+RETURNS double precision LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE WHEN jsonb_typeof(options -> key) = 'number' THEN (options ->> key)::double precision END
+$$;
+
+CREATE OR REPLACE FUNCTION travel_bookable_option_price(options jsonb)
+RETURNS double precision LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT COALESCE(
+        travel_bookable_option_number(options, 'price_per_night'),
+        travel_bookable_option_number(options, 'price_per_day'),
+        travel_bookable_option_number(options, 'price_per_person'),
+        travel_bookable_option_number(options, 'price')
+    )
+$$;
+"""
+
+DROP_OPTION_FUNCTIONS_SQL = """
+DROP FUNCTION IF EXISTS travel_bookable_option_price(jsonb);
+DROP FUNCTION IF EXISTS travel_bookable_option_number(jsonb, text);
+"""
+
+
+class Migration(migrations.Migration):
+    # The indexes are built without blocking writes to the catalog
+    atomic = False
+
+    dependencies = [
+        ('travel', '0013_bookable_external_id'),
+    ]
+
+    operations = [
+        migrations.RunSQL(OPTION_FUNCTIONS_SQL, DROP_OPTION_FUNCTIONS_SQL),
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['options'], name='bookable_options_gin', opclasses=['jsonb_path_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=models.Index(travel.models.OptionPrice(), name='bookable_option_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=models.Index(travel.models.OptionNumber('stars'), name='bookable_option_stars_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=models.Index(travel.models.OptionNumber('seats'), name='bookable_option_seats_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='bookable',
+            index=models.Index(travel.models.OptionNumber('max_guests'), name='bookable_option_guests_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:02
+
+from django.db import migrations
+
+# Facet counts per combination of type, destination, whole stars and price
+# bucket. travel.facets reads the view and calls the function with the ids of
+# search results, so both count rows the same way. Rows without stars get 0,
+# rows without a price get bucket -1.
+# The unique index lets REFRESH MATERIALIZED VIEW CONCURRENTLY keep it readable.
+CREATE_FACETS_VIEW_SQL = """
+CREATE OR REPLACE FUNCTION travel_bookable_facet_rows(ids bigint[] DEFAULT NULL)
+RETURNS TABLE (type varchar, destination_id bigint, stars integer, price_bucket integer, bookables bigint)
+LANGUAGE sql STABLE PARALLEL SAFE AS $$
+    SELECT
+        type,
+        destination_id,
+        COALESCE(floor(travel_bookable_option_number(options, 'stars'))::integer, 0),
+        COALESCE(
+            width_bucket(travel_bookable_option_price(options), ARRAY[50, 100, 200, 500]::double precision[]), -1
+        ),
+        count(*)
+    FROM travel_bookable
+    WHERE ids IS NULL OR id = ANY(ids)
+    GROUP BY 1, 2, 3, 4
+$$;
+
+CREATE MATERIALIZED VIEW travel_bookable_facets AS
+    SELECT * FROM travel_bookable_facet_rows();
+
+CREATE UNIQUE INDEX travel_bookable_facets_key
+    ON travel_bookable_facets (type, destination_id, stars, price_bucket);
+"""
+
+DROP_FACETS_VIEW_SQL = """
+DROP MATERIALIZED VIEW IF EXISTS travel_bookable_facets;
+DROP FUNCTION IF EXISTS travel_bookable_facet_rows(bigint[]);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0014_bookable_option_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_FACETS_VIEW_SQL, DROP_FACETS_VIEW_SQL),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:47
+
+import pgvector.django.vector
+from django.db import migrations, models
+
+# Vectors stored so far belong to the version named after their model, the default label
+BACKFILL_VERSION_SQL = """
+UPDATE travel_bookable SET embedding_version = embedding_model WHERE embedding_model <> '';
+UPDATE travel_collection SET embedding_version = embedding_model WHERE embedding_model <> '';
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0015_bookable_facets_view'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookable',
+            name='embedding_compact_next',
+            field=pgvector.django.vector.VectorField(blank=True, dimensions=256, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='bookable',
+            name='embedding_next',
+            field=pgvector.django.vector.VectorField(blank=True, dimensions=1536, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='bookable',
+            name='embedding_next_fingerprint',
+            field=models.CharField(blank=True, db_default='', default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='bookable',
+            name='embedding_version',
+            field=models.CharField(blank=True, db_default='', default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='collection',
+            name='embedding_next',
+            field=pgvector.django.vector.VectorField(blank=True, dimensions=1536, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='collection',
+            name='embedding_next_fingerprint',
+            field=models.CharField(blank=True, db_default='', default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='collection',
+            name='embedding_version',
+            field=models.CharField(blank=True, db_default='', default='', editable=False, max_length=100),
+        ),
+        migrations.RunSQL(BACKFILL_VERSION_SQL, migrations.RunSQL.noop),
+    ]
@@ -1,6 +1,13 @@
 from django.db import models
-from pgvector.django import VectorField
-from .utils import generate_bookable_embedding, generate_collection_embedding
+from pgvector.django import VectorField, HnswIndex
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from .utils import build_bookable_embedding_text
+from utils.embedding_backends import COMPACT_DIMENSION
+from utils.models import EmbeddedModel, EmbeddedManager, Job
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Func, Prefetch, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
 import numpy as np
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
@@ -13,7 +20,113 @@ class Destination(models.Model):
 
 
 
-class Bookable(models.Model):
+class OptionNumber(Func):
+    """
+    Numeric value of a key of Bookable.options, NULL when missing or not a number
+
+    Backed by an immutable SQL function (see migration 0014), so expression
+    indexes over it serve filters on the key.
+    """
+    function = 'travel_bookable_option_number'
+    output_field = FloatField()
+
+    def __init__(self, key, **extra):
+        super().__init__(F('options'), Value(key), **extra)
+
+
+class OptionPrice(Func):
+    """
+    Price of a bookable, whichever of the per night, per day, per person or flat price keys it has
+    """
+    function = 'travel_bookable_option_price'
+    output_field = FloatField()
+
+    def __init__(self, **extra):
+        super().__init__(F('options'), **extra)
+
+
+class BookableQuerySet(models.QuerySet):
+    def for_listing(self, columns=None, images=True, thumbnail=True):
+        """
+        Attach rating aggregates and images so serializing a page costs a fixed number of queries.
+
+        Ratings come from the one-to-one RatingSummary row, a join that still lets
+        ordering by vector distance be served by the HNSW index.
+
+        Args:
+            columns (list): Only load these model fields, None loads all
+            images (bool): Prefetch all images
+            thumbnail (bool): Prefetch the is_thumbnail images into thumbnails
+        """
+        queryset = self.annotate(
+            rating_avg=Coalesce(F('rating_summary__rating_avg'), Value(0.0)),
+            rating_count=Coalesce(F('rating_summary__rating_count'), Value(0)),
+        )
+        if columns is not None:
+            queryset = queryset.only(*columns)
+        if images:
+            queryset = queryset.prefetch_related('bookableimage_set')
+        if thumbnail:
+            queryset = queryset.prefetch_related(Prefetch(
+                'bookableimage_set', queryset=BookableImage.objects.filter(is_thumbnail=True), to_attr='thumbnails'
+            ))
+        return queryset
+
+    def with_latest_reviews(self, limit):
+        """
+        Prefetch the newest reviews of each bookable, with their users, into latest_reviews
+
+        The slice is applied per bookable, so a popular bookable costs no more than any other.
+        """
+        reviews = Review.objects.select_related('user').order_by('-created_at', '-id')[:limit]
+        return self.prefetch_related(Prefetch('reviews', queryset=reviews, to_attr='latest_reviews'))
+
+    def apply_filters(self, type=None, destination=None, options=None, min_rating=None, min_price=None,
+                      max_price=None, min_stars=None, amenities=None, min_seats=None, min_guests=None):
+        """
+        Filters shared by listing and every search mode
+
+        Search applies them in the same query as the vector ordering, so the
+        index scan keeps looking until a full page of matching rows is found.
+        Containment is served by the jsonb_path_ops GIN index on options, the
+        numeric filters by expression indexes on the option values.
+
+        Args:
+            type (str): Bookable type
+            destination (int): Destination id
+            options (dict): Subset the options JSON must contain
+            min_rating (float): Minimum average rating
+            min_price (float): Minimum price, see OptionPrice
+            max_price (float): Maximum price, see OptionPrice
+            min_stars (int): Minimum hotel stars
+            amenities (list): Amenities that must all be offered
+            min_seats (int): Minimum car seats
+            min_guests (int): Minimum number of guests an apartment takes
+        """
+        queryset = self
+        if type:
+            queryset = queryset.filter(type=type)
+        if destination:
+            queryset = queryset.filter(destination_id=destination)
+        if options:
+            queryset = queryset.filter(options__contains=options)
+        if amenities:
+            queryset = queryset.filter(options__contains={'amenities': amenities})
+        if min_rating:
+            queryset = queryset.filter(rating_summary__rating_avg__gte=min_rating)
+        if min_price is not None or max_price is not None:
+            queryset = queryset.alias(option_price=OptionPrice())
+            if min_price is not None:
+                queryset = queryset.filter(option_price__gte=min_price)
+            if max_price is not None:
+                queryset = queryset.filter(option_price__lte=max_price)
+        for key, minimum in (('stars', min_stars), ('seats', min_seats), ('max_guests', min_guests)):
+            if minimum is not None:
+                queryset = queryset.alias(**{f'option_{key}': OptionNumber(key)}).filter(**{f'option_{key}__gte': minimum})
+        return queryset
+
+
+class Bookable(EmbeddedModel):
     class BookableType(models.TextChoices):
         HOTEL = 'hotel'
         APARTMENT = 'apartment'
@@ -22,23 +135,78 @@ class Bookable(models.Model):
         CAR = 'car'
         OTHER = 'other'
 
+    # Identifier in the supplier catalog, the key import_bookables merges on
+    external_id = models.CharField(max_length=255, unique=True, blank=True, null=True)
     title = models.CharField(max_length=255)
     destination = models.ForeignKey('Destination', on_delete=models.PROTECT)
     type = models.CharField(max_length=255, choices=BookableType.choices)
     options = models.JSONField(blank=True, null=True, default=dict)
     embedding = VectorField(dimensions=1536, blank=True, null=True)
+    # Leading dimensions of the embedding, a small index searched before an exact re-rank
+    embedding_compact = VectorField(dimensions=COMPACT_DIMENSION, blank=True, null=True, editable=False)
+    embedding_compact_next = VectorField(dimensions=COMPACT_DIMENSION, blank=True, null=True, editable=False)
+    # Weighted title/destination/options text, maintained by a database trigger (see migration 0007)
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
+
+    objects = EmbeddedManager.from_queryset(BookableQuerySet)()
+
+    EMBEDDING_FIELDS = EmbeddedModel.EMBEDDING_FIELDS + ['embedding_compact']
+    SHADOW_FIELDS = {**EmbeddedModel.SHADOW_FIELDS, 'embedding_compact': 'embedding_compact_next'}
+
+    class Meta:
+        indexes = [
+            GinIndex(name='bookable_search_vector_gin', fields=['search_vector']),
+            # Containment filters on options, e.g. all of a list of amenities
+            GinIndex(name='bookable_options_gin', fields=['options'], opclasses=['jsonb_path_ops']),
+            models.Index(OptionPrice(), name='bookable_option_price_idx'),
+            models.Index(OptionNumber('stars'), name='bookable_option_stars_idx'),
+            models.Index(OptionNumber('seats'), name='bookable_option_seats_idx'),
+            models.Index(OptionNumber('max_guests'), name='bookable_option_guests_idx'),
+            # Rows written with SQL that still wait for an embedding, see travel.importer
+            models.Index(
+                name='bookable_unembedded_idx',
+                fields=['id'],
+                condition=models.Q(embedding_fingerprint=''),
+            ),
+            HnswIndex(
+                name='bookable_embedding_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_l2_ops'],
+            ),
+            HnswIndex(
+                name='bookable_embedding_compact_hnsw',
+                fields=['embedding_compact'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_l2_ops'],
+            ),
+        ] + [
+            # Type filtered searches scan a graph that only holds rows of that type
+            HnswIndex(
+                name=f'bookable_{bookable_type}_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_l2_ops'],
+                condition=models.Q(type=bookable_type),
+            )
+            for bookable_type in ['hotel', 'apartment', 'activity', 'tour', 'car', 'other']
+        ]
     
-    def save(self, *args, **kwargs):
-        # Generate embedding before saving
+    @classmethod
+    def get_embedding_queryset(cls):
+        return cls._default_manager.select_related('destination')
+
+    def get_embedding_text(self):
         destination_name = self.destination.name if self.destination_id else ""
-        embedding_vector = generate_bookable_embedding(
+        return build_bookable_embedding_text(
             self.title,
             self.type,
             destination_name,
             self.options
         )
-        self.embedding = embedding_vector
-        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -48,21 +216,50 @@ class BookableImage(models.Model):
     bookable = models.ForeignKey('Bookable', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='img/')
     is_thumbnail = models.BooleanField(default=False)
+    # Resized copies written by the background worker, see travel.renditions
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.image.url
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_image = instance.__dict__.get('image')
+        return instance
+
+    def save(self, *args, **kwargs):
+        image_changed = self.image.name != getattr(self, '_stored_image', None)
+        if image_changed:
+            # The old renditions show another picture
+            self.renditions = {}
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'renditions'}
+        super().save(*args, **kwargs)
+        self._stored_image = self.image.name
+        if image_changed and self.image:
+            Job.enqueue(Job.Kind.IMAGE_RENDITIONS, self)
     
 
-class Collection(models.Model):
+class Collection(EmbeddedModel):
     name = models.CharField(max_length=255)
     description = models.TextField()
     embedding = VectorField(dimensions=1536, blank=True, null=True)
 
-    def save(self, *args, **kwargs):
-        # Generate embedding from description
-        embedding_vector = generate_collection_embedding(self.description)
-        self.embedding = embedding_vector
-        super().save(*args, **kwargs)
+    class Meta:
+        indexes = [
+            HnswIndex(
+                name='collection_embedding_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_l2_ops'],
+            ),
+        ]
+
+    def get_embedding_text(self):
+        return self.description
 
     def __str__(self):
         return self.name
@@ -84,7 +281,117 @@ class Review(models.Model):
     class Meta:
         unique_together = ('bookable', 'user')
         ordering = ['-created_at']
+        indexes = [
+            # Newest reviews of a bookable, for the detail page and the reviews sub-resource
+            models.Index(fields=['bookable', '-created_at'], name='review_bookable_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s review for {self.bookable.title}"
 
+
+class RatingSummary(models.Model):
+    """
+    Review aggregates per Bookable, kept up to date as reviews are written.
+
+    Reading or sorting by the average rating is then a single row lookup instead
+    of an aggregate over travel_review.
+    """
+    bookable = models.OneToOneField('Bookable', on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(default=0, db_index=True)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.rating_avg:.1f} from {self.rating_count} reviews for {self.bookable_id}"
+
+    @property
+    def histogram(self):
+        return {star: getattr(self, f'stars_{star}') for star in range(1, 6)}
+
+    @classmethod
+    def apply(cls, bookable_id, added=None, removed=None):
+        """
+        Adjust the summary for one review being added, removed or re-rated
+
+        Must be called in the transaction that writes the review.
+
+        Args:
+            bookable_id (int): Bookable the review belongs to
+            added (int): Rating that now counts, if any
+            removed (int): Rating that no longer counts, if any
+        """
+        cls.objects.get_or_create(bookable_id=bookable_id)
+
+        sum_delta = (added or 0) - (removed or 0)
+        count_delta = (added is not None) - (removed is not None)
+        star_deltas = {}
+        if added is not None:
+            star_deltas[added] = star_deltas.get(added, 0) + 1
+        if removed is not None:
+            star_deltas[removed] = star_deltas.get(removed, 0) - 1
+
+        # A single UPDATE, so concurrent reviews on the same bookable never lose an increment
+        updates = {
+            'rating_sum': F('rating_sum') + sum_delta,
+            'rating_count': F('rating_count') + count_delta,
+            'rating_avg': Coalesce(
+                Cast(F('rating_sum') + sum_delta, FloatField()) / NullIf(F('rating_count') + count_delta, 0),
+                Value(0.0),
+            ),
+        }
+        for star, delta in star_deltas.items():
+            if delta:
+                updates[f'stars_{star}'] = F(f'stars_{star}') + delta
+
+        cls.objects.filter(bookable_id=bookable_id).update(**updates)
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Recompute every summary from travel_review
+
+        Returns:
+            int: Number of bookables that have reviews
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(REBUILD_RATING_SUMMARIES_SQL)
+            cursor.execute(DELETE_EMPTY_RATING_SUMMARIES_SQL)
+            cursor.execute("SELECT COUNT(*) FROM travel_ratingsummary")
+            return cursor.fetchone()[0]
+
+
+REBUILD_RATING_SUMMARIES_SQL = """
+INSERT INTO travel_ratingsummary (
+    bookable_id, rating_sum, rating_count, rating_avg,
+    stars_1, stars_2, stars_3, stars_4, stars_5
+)
+SELECT
+    bookable_id, SUM(rating), COUNT(*), AVG(rating),
+    COUNT(*) FILTER (WHERE rating = 1),
+    COUNT(*) FILTER (WHERE rating = 2),
+    COUNT(*) FILTER (WHERE rating = 3),
+    COUNT(*) FILTER (WHERE rating = 4),
+    COUNT(*) FILTER (WHERE rating = 5)
+FROM travel_review
+GROUP BY bookable_id
+ON CONFLICT (bookable_id) DO UPDATE SET
+    rating_sum = EXCLUDED.rating_sum,
+    rating_count = EXCLUDED.rating_count,
+    rating_avg = EXCLUDED.rating_avg,
+    stars_1 = EXCLUDED.stars_1,
+    stars_2 = EXCLUDED.stars_2,
+    stars_3 = EXCLUDED.stars_3,
+    stars_4 = EXCLUDED.stars_4,
+    stars_5 = EXCLUDED.stars_5
+"""
+
+DELETE_EMPTY_RATING_SUMMARIES_SQL = """
+DELETE FROM travel_ratingsummary s
+WHERE NOT EXISTS (SELECT 1 FROM travel_review r WHERE r.bookable_id = s.bookable_id)
+"""
@@ -0,0 +1,114 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class SearchCursorPagination:
+    """
+    Keyset pagination for search results
+
+    Pages are fetched with a WHERE on the last returned (score, id) instead
+    of OFFSET, and no COUNT query is run; one extra row is fetched to know
+    whether a next page exists. The opaque cursor carries:
+
+    - q: reference of the search it belongs to (message, mode, filters), so the
+      query vector is taken from the embedding cache instead of re-embedded and
+      a cursor cannot be replayed against a different search
+    - o: rows returned before the page, used to size the ANN candidate list
+    - p: (score, id) of the last row returned
+    """
+    page_size = 10
+
+    def __init__(self, query_ref, cursor=None):
+        self.query_ref = query_ref
+        self.offset = 0
+        self.position = None
+        self.next_cursor = None
+        if cursor:
+            self.offset, self.position = self.decode_cursor(cursor)
+
+    @property
+    def limit(self):
+        """
+        Returns:
+            int: Rows an index scan has to produce to reach the end of this page
+        """
+        return self.offset + self.page_size + 1
+
+    def encode_cursor(self, offset, position):
+        payload = json.dumps({'q': self.query_ref, 'o': offset, 'p': position}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            query_ref, offset, (score, pk) = payload['q'], int(payload['o']), payload['p']
+            position = (float(score), int(pk))
+        except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+            raise ValidationError({'cursor': ['Invalid cursor']})
+        if query_ref != self.query_ref:
+            raise ValidationError({'cursor': ['Cursor does not belong to this search']})
+        return offset, position
+
+    def paginate_queryset(self, queryset, key, descending=False):
+        """
+        Args:
+            queryset: Ordered by (key, id), or (-key, id) when descending
+            key (str): Name of the annotated score the results are ordered by
+            descending (bool): Whether higher scores come first
+
+        Returns:
+            list: Model instances of the current page
+        """
+        if self.position is not None:
+            score, pk = self.position
+            past_score = f'{key}__lt' if descending else f'{key}__gt'
+            queryset = queryset.filter(Q(**{past_score: score}) | Q(**{key: score, 'pk__gt': pk}))
+
+        rows = list(queryset[:self.page_size + 1])
+        return self._page(rows, lambda row: (getattr(row, key), row.pk))
+
+    def paginate_ranked(self, ranked):
+        """
+        Args:
+            ranked (list): (id, score) tuples ordered by score descending, then id
+
+        Returns:
+            list: (id, score) tuples of the current page
+        """
+        if self.position is not None:
+            score, pk = self.position
+            ranked = [item for item in ranked if (-item[1], item[0]) > (-score, pk)]
+
+        return self._page(ranked[:self.page_size + 1], lambda item: (item[1], item[0]))
+
+    def _page(self, rows, get_position):
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            self.next_cursor = self.encode_cursor(self.offset + len(rows), get_position(rows[-1]))
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_cursor,
+            'results': data,
+        })
+
+
+class ReviewCursorPagination(CursorPagination):
+    """
+    Reviews of a bookable, newest first
+
+    Served by the (bookable, -created_at) index; id breaks ties between
+    reviews created in the same instant.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
@@ -0,0 +1,85 @@
+import hashlib
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Bounding boxes, images are scaled down to fit and never scaled up
+RENDITIONS = {
+    'thumb': (320, 320),
+    'card': (800, 800),
+    'full': (1920, 1920),
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def get_rendition_path(image, name, extension):
+    # The original's name is part of the path, so a replaced image never reuses cached URLs
+    version = hashlib.sha256(image.image.name.encode('utf-8')).hexdigest()[:12]
+    return f"renditions/{image.pk}/{version}-{name}.{extension}"
+
+
+def generate_renditions(image):
+    """
+    Write resized WebP and JPEG copies of a BookableImage to the default storage
+
+    Args:
+        image: BookableImage with a stored original
+
+    Returns:
+        dict: {rendition: {'width', 'height', 'webp', 'jpeg'}} with storage paths
+    """
+    with image.image.open('rb') as original:
+        source = Image.open(original)
+        # Apply the camera orientation before the EXIF data is dropped
+        source = ImageOps.exif_transpose(source)
+        source.load()
+
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if 'transparency' in source.info else 'RGB')
+
+    renditions = {}
+    for name, size in RENDITIONS.items():
+        resized = source.copy()
+        resized.thumbnail(size, Image.Resampling.LANCZOS)
+        entry = {'width': resized.width, 'height': resized.height}
+
+        for extension, (pil_format, options) in FORMATS.items():
+            frame = resized
+            if pil_format == 'JPEG' and frame.mode != 'RGB':
+                frame = frame.convert('RGB')
+            buffer = io.BytesIO()
+            frame.save(buffer, pil_format, **options)
+
+            path = get_rendition_path(image, name, extension)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            entry[extension] = default_storage.save(path, ContentFile(buffer.getvalue()))
+
+        renditions[name] = entry
+    return renditions
+
+
+def get_rendition_urls(renditions, name, request=None):
+    """
+    Args:
+        renditions (dict): BookableImage.renditions
+        name (str): Rendition name, e.g. 'thumb'
+        request: Used to build absolute URLs like the image field does
+
+    Returns:
+        dict: width, height and a URL per format, or None if not generated yet
+    """
+    entry = renditions.get(name)
+    if not entry:
+        return None
+    result = {'width': entry['width'], 'height': entry['height']}
+    for extension in FORMATS:
+        url = default_storage.url(entry[extension])
+        result[extension] = request.build_absolute_uri(url) if request is not None else url
+    return result
@@ -0,0 +1,293 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+from pgvector.django import L2Distance
+
+from utils.cache_versions import get_version
+from utils.embedding_cache import normalize_text
+from utils.embeddings import compact_embedding
+from utils.vector_search import ann_search, supports_iterative_scan
+
+from .signals import CATALOG_VERSION, LISTINGS_VERSION
+
+SEARCH_CONFIG = 'english'
+
+
+def get_query_reference(params):
+    """
+    Identify a search by everything that determines its results
+
+    Args:
+        params (dict): Validated search parameters or filters, without the cursor
+
+    Returns:
+        str: Short stable hash of the normalized parameters
+    """
+    params = dict(params)
+    if 'message' in params:
+        # Case variants of a phrase share cache entries and cursors
+        params['message'] = normalize_text(params['message']).lower()
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def get_search_depth(limit, compact=None):
+    """
+    Args:
+        limit (int): Rows the caller reads from semantic_search
+        compact (bool): Whether the compact index is searched, defaults to settings
+
+    Returns:
+        int: Rows the vector index has to produce, use it for semantic_search and ann_search
+    """
+    config = settings.VECTOR_SEARCH
+    if config['COMPACT_SEARCH'] if compact is None else compact:
+        return max(limit, config['RERANK_DEPTH'])
+    return limit
+
+
+def index_scans_are_complete():
+    """
+    Whether vector index scans keep going until the query has enough rows
+
+    An HNSW scan hands over at most ef_search rows, and rows hidden by
+    filters or not yet vacuumed count against that. pgvector 0.8+ keeps
+    scanning (iterative scans); before that a short result from the index
+    does not mean that no more rows match.
+    """
+    return settings.VECTOR_SEARCH['ITERATIVE_SCAN'] != 'off' and supports_iterative_scan()
+
+
+def needs_exact_search(filters=None, depth=None):
+    """
+    Whether a vector search has to sort the matching rows exactly
+
+    Without complete index scans a selective filter leaves pages short or
+    empty, so filtered searches are sorted exactly; the filter indexes keep
+    that cheap for selective filters. A type filter alone is the exception,
+    it walks the partial HNSW index holding only rows of that type (there
+    are none over the compact column). The same goes for searches needing
+    more rows than VECTOR_SEARCH['MAX_HNSW_EF_SEARCH'], e.g. pages deeper
+    than that, which the clamped ef_search cannot reach. Other searches
+    read the index and are retried exactly when it comes back short.
+
+    Args:
+        filters (dict): Filters passed to Bookable.objects.apply_filters
+        depth (int): Rows the index scan has to produce, see get_search_depth
+
+    Returns:
+        bool: True to pass depth=None to semantic_search
+    """
+    if index_scans_are_complete():
+        return False
+    config = settings.VECTOR_SEARCH
+    filtered = {name for name, value in (filters or {}).items() if value is not None}
+    if filtered == {'type'} and not config['COMPACT_SEARCH']:
+        filtered = set()
+    return bool(filtered) or (depth is not None and depth > config['MAX_HNSW_EF_SEARCH'])
+
+
+def get_search_cache_key(query_ref, cursor=None, tuning=None):
+    """
+    Cache key of one page of search results
+
+    The catalog and listings versions are part of the key, so pages cached
+    before any bookable vector, option or rating changed are never read
+    again; filters such as min_rating can admit rows a cached page lacks.
+
+    Args:
+        query_ref (str): get_query_reference of the search
+        cursor (str): Cursor of the page, None for the first page
+        tuning (dict): ef_search / probes overrides of the request
+
+    Returns:
+        str: Cache key
+    """
+    payload = json.dumps([query_ref, cursor, tuning or {}], sort_keys=True)
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+    return f"search:{get_version(CATALOG_VERSION)}:{get_version(LISTINGS_VERSION)}:{digest}"
+
+
+def semantic_search(queryset, query_embedding, depth=None, compact=None):
+    """
+    Order bookables by vector distance to the query
+
+    The nearest ``depth`` rows are taken from the vector index, then ordered
+    by (distance, id) so ties page deterministically; the index can only
+    produce rows ordered by distance alone. With compact search the
+    candidates come from the index over the compact column and are ordered
+    by their exact distance on the full embedding. Rows past that depth are
+    not returned. Without a depth the whole queryset is sorted exactly.
+
+    Args:
+        queryset: Bookable queryset to search
+        query_embedding: Query vector
+        depth (int): Candidates taken from the index, see get_search_depth
+        compact (bool): Search the compact index first, defaults to settings
+
+    Returns:
+        QuerySet: Annotated with distance, closest first
+    """
+    config = settings.VECTOR_SEARCH
+    if depth is None:
+        return queryset.annotate(
+            distance=L2Distance('embedding', query_embedding)
+        ).order_by('distance', 'id')
+    if not (config['COMPACT_SEARCH'] if compact is None else compact):
+        # Ordering by (distance, id) directly makes the planner sort the whole table
+        candidates = queryset.order_by().annotate(
+            candidate_distance=L2Distance('embedding', query_embedding)
+        ).order_by('candidate_distance').values('pk')[:depth]
+    else:
+        candidates = queryset.order_by().filter(embedding_compact__isnull=False).annotate(
+            compact_distance=L2Distance('embedding_compact', compact_embedding(query_embedding))
+        ).order_by('compact_distance').values('pk')[:depth]
+
+    # Adding zero keeps the planner from answering the re-rank with the full
+    # HNSW index, which would drop candidates outside its own ef_search window
+    return queryset.filter(pk__in=candidates).annotate(
+        distance=L2Distance('embedding', query_embedding) + Value(0.0)
+    ).order_by('distance', 'id')
+
+
+def exact_search_ids(queryset, query_embedding, k):
+    """
+    The k nearest bookables by their true distance, the reference for recall
+
+    Without index scans the planner sorts every row by its exact distance.
+
+    Returns:
+        list: Bookable ids, closest first
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_indexscan = off")
+        return list(semantic_search(queryset, query_embedding, compact=False).values_list('pk', flat=True)[:k])
+
+
+def measure_recall(queryset, queries, strategies, k):
+    """
+    recall@k of ANN search configurations against exact search
+
+    Args:
+        queryset: Bookable queryset searched
+        queries (list): Query vectors, e.g. stored bookable embeddings
+        strategies (list): Dicts with 'ef_search' (None for the default),
+            'compact' and 'depth' as passed to semantic_search
+        k (int): Results compared per query
+
+    Returns:
+        list: Per strategy a (mean recall, latencies in seconds) tuple
+    """
+    totals = [[0.0, []] for _ in strategies]
+    for query in queries:
+        exact = set(exact_search_ids(queryset, query, k))
+        for strategy, total in zip(strategies, totals):
+            started = time.perf_counter()
+            limit = get_search_depth(strategy['depth'], strategy['compact'])
+            with ann_search(ef_search=strategy['ef_search'], limit=limit):
+                found = list(
+                    semantic_search(queryset, query, strategy['depth'], compact=strategy['compact'])
+                    .values_list('pk', flat=True)[:k]
+                )
+            total[1].append(time.perf_counter() - started)
+            total[0] += len(exact & set(found)) / len(exact)
+    return [(recall / len(queries), seconds) for recall, seconds in totals]
+
+
+def lexical_search(queryset, message):
+    """
+    Full text match against the stored search vector, best match first
+
+    Args:
+        queryset: Bookable queryset to search
+        message (str): Free text, parsed with websearch syntax ("quoted phrases", -exclusions)
+
+    Returns:
+        QuerySet: Matching bookables annotated with rank
+    """
+    query = SearchQuery(message, config=SEARCH_CONFIG, search_type='websearch')
+    # ts_rank_cd returns real, cast so the value survives a round trip through a cursor
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query, cover_density=True), FloatField())
+    ).order_by('-rank', 'id')
+
+
+def hybrid_search(queryset, message, query_embedding, semantic_depth=None, lexical_depth=None, exact=False):
+    """
+    Fuse semantic and lexical rankings with reciprocal-rank fusion
+
+    Each leg returns its top candidates, scored 1 / (k + rank). A bookable found
+    by both legs gets the sum of both scores. Fusion runs in a single SQL query.
+
+    Args:
+        queryset: Plain (unannotated) Bookable queryset both legs search within
+        message (str): Free text query
+        query_embedding: Query vector
+        semantic_depth (int): Candidates taken from the vector leg
+        lexical_depth (int): Candidates taken from the full text leg
+        exact (bool): Sort the vector leg exactly, see needs_exact_search
+
+    Returns:
+        list: (bookable id, score) tuples, best first
+    """
+    config = settings.HYBRID_SEARCH
+    semantic_depth = semantic_depth or config['SEMANTIC_DEPTH']
+    lexical_depth = lexical_depth or config['LEXICAL_DEPTH']
+
+    base = queryset.order_by()
+    semantic_sql, semantic_params = (
+        semantic_search(
+            base.filter(embedding__isnull=False), query_embedding, None if exact else get_search_depth(semantic_depth)
+        )
+        .values('id', 'distance')[:semantic_depth]
+        .query.sql_with_params()
+    )
+    lexical_sql, lexical_params = (
+        lexical_search(base, message)
+        .values('id', 'rank')[:lexical_depth]
+        .query.sql_with_params()
+    )
+
+    sql = f"""
+        WITH semantic AS (
+            SELECT id, row_number() OVER (ORDER BY distance, id) AS position
+            FROM ({semantic_sql}) AS semantic_candidates
+        ),
+        lexical AS (
+            SELECT id, row_number() OVER (ORDER BY rank DESC, id) AS position
+            FROM ({lexical_sql}) AS lexical_candidates
+        )
+        SELECT
+            COALESCE(semantic.id, lexical.id) AS id,
+            COALESCE(1.0 / (%s + semantic.position), 0) + COALESCE(1.0 / (%s + lexical.position), 0) AS score
+        FROM semantic
+        FULL OUTER JOIN lexical ON semantic.id = lexical.id
+        ORDER BY score DESC, id
+    """
+    params = (*semantic_params, *lexical_params, config['RRF_K'], config['RRF_K'])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+def hydrate(queryset, ids):
+    """
+    Load bookables for a list of ids in one query, keeping the order of ids
+
+    Args:
+        queryset: Bookable queryset to load from
+        ids (list): Bookable ids
+
+    Returns:
+        list: Bookable instances in the order of ids, missing ids skipped
+    """
+    bookables = queryset.in_bulk(ids)
+    return [bookables[pk] for pk in ids if pk in bookables]
@@ -1,13 +1,30 @@
+import json
+from django.conf import settings
 from rest_framework import serializers
+from utils.embedding_cache import normalize_text
+from utils.sparse_fields import SparseFieldsetMixin
 from .models import Bookable, BookableImage, Review
+from .renditions import RENDITIONS, get_rendition_urls
 from django.db.models import Avg
 
 class BookableImageSerializer(serializers.ModelSerializer):
+    renditions = serializers.SerializerMethodField()
+    
     class Meta:
         model = BookableImage
-        fields = ['id', 'image', 'is_thumbnail']
+        fields = ['id', 'image', 'is_thumbnail', 'renditions']
+    
+    def get_renditions(self, obj):
+        # Empty until the worker has generated them, clients use image meanwhile
+        request = self.context.get('request')
+        return {
+            name: urls for name in RENDITIONS
+            if (urls := get_rendition_urls(obj.renditions, name, request)) is not None
+        }
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # Set from the request, the default lets the unique (bookable, user) check run
+    user = serializers.PrimaryKeyRelatedField(read_only=True, default=serializers.CurrentUserDefault())
     username = serializers.SerializerMethodField()
     
     class Meta:
@@ -18,27 +35,142 @@ class ReviewSerializer(serializers.ModelSerializer):
     def get_username(self, obj):
         return obj.user.username
 
-class BookableSerializer(serializers.ModelSerializer):
-    images = BookableImageSerializer(source='bookableimage_set', many=True, read_only=True)
+class BookableSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    thumbnail = serializers.SerializerMethodField()
     avg_rating = serializers.SerializerMethodField()
     review_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Bookable
-        fields = ['id', 'title', 'destination', 'type', 'options', 'images', 'avg_rating', 'review_count']
+        fields = ['id', 'title', 'destination', 'type', 'options', 'thumbnail', 'avg_rating', 'review_count']
+    
+    def get_thumbnail(self, obj):
+        """
+        Thumb rendition of the is_thumbnail image, or the original until it is generated
+        """
+        # Prefetched by Bookable.objects.for_listing(), fall back to a query otherwise
+        thumbnails = getattr(obj, 'thumbnails', None)
+        if thumbnails is None:
+            thumbnails = obj.bookableimage_set.filter(is_thumbnail=True)[:1]
+        if not thumbnails:
+            return None
+        image = thumbnails[0]
+        request = self.context.get('request')
+        urls = get_rendition_urls(image.renditions, 'thumb', request)
+        if urls is None:
+            url = image.image.url
+            urls = {'image': request.build_absolute_uri(url) if request is not None else url}
+        return {'id': image.pk, **urls}
     
     def get_avg_rating(self, obj):
-        avg = obj.reviews.aggregate(avg=Avg('rating'))['avg']
+        # Annotated by Bookable.objects.for_listing(), fall back to a query otherwise
+        if hasattr(obj, 'rating_avg'):
+            avg = obj.rating_avg
+        else:
+            avg = obj.reviews.aggregate(avg=Avg('rating'))['avg']
         return round(avg, 1) if avg else 0
     
     def get_review_count(self, obj):
+        if hasattr(obj, 'rating_count'):
+            return obj.rating_count
         return obj.reviews.count()
 
 class BookableDetailSerializer(BookableSerializer):
-    reviews = ReviewSerializer(many=True, read_only=True)
+    # The rest is paginated under /bookables/{id}/reviews/
+    LATEST_REVIEWS = 10
+
+    images = BookableImageSerializer(source='bookableimage_set', many=True, read_only=True)
+    reviews = serializers.SerializerMethodField()
     
     class Meta(BookableSerializer.Meta):
-        fields = BookableSerializer.Meta.fields + ['reviews']
+        fields = BookableSerializer.Meta.fields + ['images', 'reviews']
+    
+    def get_reviews(self, obj):
+        # Prefetched by Bookable.objects.with_latest_reviews(), fall back to a query otherwise
+        reviews = getattr(obj, 'latest_reviews', None)
+        if reviews is None:
+            reviews = obj.reviews.select_related('user').order_by('-created_at', '-id')[:self.LATEST_REVIEWS]
+        # ?fields= and ?omit= name bookable fields, not review fields
+        return ReviewSerializer(reviews, many=True, context={**self.context, 'nested': True}).data
+
+class BookableFilterSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=Bookable.BookableType.choices, required=False)
+    destination = serializers.IntegerField(required=False, min_value=1)
+    options = serializers.JSONField(
+        required=False,
+        help_text='Subset the options must contain, e.g. {"amenities": ["Pool"]}; a JSON string in query params'
+    )
+    min_rating = serializers.FloatField(required=False, min_value=0, max_value=5)
+    min_price = serializers.FloatField(
+        required=False, min_value=0,
+        help_text='Minimum price per night, day, person or flat price, whichever the bookable has'
+    )
+    max_price = serializers.FloatField(required=False, min_value=0, help_text='Maximum price, see min_price')
+    min_stars = serializers.IntegerField(required=False, min_value=1, max_value=5)
+    amenities = serializers.ListField(
+        child=serializers.CharField(), required=False, allow_empty=False,
+        help_text='Amenities that must all be offered; repeat the query parameter for several'
+    )
+    min_seats = serializers.IntegerField(required=False, min_value=1)
+    min_guests = serializers.IntegerField(required=False, min_value=1)
+    
+    def validate(self, attrs):
+        if attrs.get('min_price', 0) > attrs.get('max_price', float('inf')):
+            raise serializers.ValidationError({'max_price': 'Must not be less than min_price'})
+        return attrs
+
+    def validate_options(self, value):
+        """
+        Accept a JSON encoded object, as sent in query parameters.
+        """
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise serializers.ValidationError("Must be a JSON object")
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Must be a JSON object")
+        return value
+
+class SearchSerializer(BookableFilterSerializer):
+    MODE_CHOICES = ['semantic', 'hybrid', 'lexical']
 
-class SearchSerializer(serializers.Serializer):
     message = serializers.CharField(required=True)
+    mode = serializers.ChoiceField(
+        choices=MODE_CHOICES, default='semantic',
+        help_text="semantic (vector), lexical (full text, no embedding call) or hybrid (both, fused)"
+    )
+    semantic_depth = serializers.IntegerField(
+        required=False, min_value=1, max_value=settings.HYBRID_SEARCH['MAX_DEPTH'],
+        help_text="Hybrid mode: candidates taken from the vector search"
+    )
+    lexical_depth = serializers.IntegerField(
+        required=False, min_value=1, max_value=settings.HYBRID_SEARCH['MAX_DEPTH'],
+        help_text="Hybrid mode: candidates taken from the full text search"
+    )
+    cursor = serializers.CharField(required=False, help_text="'next' value of the previous page")
+    facets = serializers.BooleanField(
+        default=False, help_text="Add facet counts of the top candidates to the first page"
+    )
+
+    def validate_message(self, value):
+        """
+        Collapse whitespace. Case is kept for the provider and the full text
+        search, only the query reference folds it.
+        """
+        return normalize_text(value)
+
+class FacetFilterSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=Bookable.BookableType.choices, required=False)
+    destination = serializers.IntegerField(required=False, min_value=1)
+    min_stars = serializers.IntegerField(required=False, min_value=1, max_value=5)
+
+class SimilarSerializer(BookableFilterSerializer):
+    limit = serializers.IntegerField(
+        default=settings.SIMILAR_BOOKABLES['LIMIT'], min_value=1,
+        max_value=settings.SIMILAR_BOOKABLES['MAX_LIMIT']
+    )
+
+class SearchTuningSerializer(serializers.Serializer):
+    ef_search = serializers.IntegerField(required=False, min_value=1, help_text="HNSW candidate list size")
+    probes = serializers.IntegerField(required=False, min_value=1, help_text="IVFFlat lists to probe")
@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from utils.cache_versions import bump_version
+from utils.signals import embedding_updated
+
+from .facets import schedule_facets_refresh
+from .models import Bookable, BookableImage, Destination, Review
+
+# Version of the bookable vectors, part of every cached vector search result
+CATALOG_VERSION = 'catalog'
+# Version of the catalog content, part of every cached listing response
+LISTINGS_VERSION = 'listings'
+
+
+@receiver(embedding_updated, sender=Bookable)
+@receiver(post_delete, sender=Bookable)
+def invalidate_vector_results(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(CATALOG_VERSION))
+
+
+@receiver(post_save, sender=Bookable)
+@receiver(post_delete, sender=Bookable)
+@receiver(post_save, sender=BookableImage)
+@receiver(post_delete, sender=BookableImage)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=Destination)
+@receiver(post_delete, sender=Destination)
+# Bulk creates only send this one
+@receiver(embedding_updated, sender=Bookable)
+def invalidate_listings(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(LISTINGS_VERSION))
+
+
+@receiver(post_save, sender=Bookable)
+@receiver(post_delete, sender=Bookable)
+def schedule_facets(sender, **kwargs):
+    transaction.on_commit(schedule_facets_refresh)
@@ -0,0 +1,239 @@
+import csv
+import io
+import json
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from utils.embedding_backends import STORED_DIMENSION
+from utils.embedding_cache import text_fingerprint
+from utils.embeddings import compact_embedding, get_embeddings
+
+from .models import Bookable, BookableImage, Review
+from .utils import build_bookable_embedding_text
+
+# Stored in place of a content fingerprint, a later save of the row embeds it for real
+SYNTHETIC_MODEL = 'synthetic-clustered'
+
+TITLE_WORDS = {
+    'hotel': (["Grand", "Royal", "Sunset", "Ocean", "Majestic", "Riverside"], ["Hotel", "Resort", "Suites", "Inn", "Lodge"]),
+    'apartment': (["Modern", "Urban", "Cozy", "Skyline", "Central"], ["Apartments", "Lofts", "Residences", "Flats", "Studios"]),
+    'activity': (["Guided", "Historic", "Adventure", "Cultural", "Local"], ["Workshop", "Class", "Experience", "Session"]),
+    'tour': (["Day", "Private", "Group", "Sunset", "Discovery"], ["Tour", "Excursion", "Trip", "Expedition"]),
+    'car': (["Economy", "Compact", "Luxury", "Electric", "Family"], ["Car", "Sedan", "SUV", "Van", "Convertible"]),
+    'other': (["Local", "Special", "Seasonal", "Unique"], ["Pass", "Ticket", "Package", "Voucher"]),
+}
+
+AMENITIES = ["Wi-Fi", "Pool", "Gym", "Restaurant", "Bar", "Spa", "Parking", "Air Conditioning", "Breakfast Included", "Kitchen"]
+
+REVIEW_COMMENTS = [
+    "Great location and friendly staff.",
+    "Would book again.",
+    "Not quite as described.",
+    "Excellent value for the price.",
+    "Clean, quiet and comfortable.",
+    "A bit disappointing overall.",
+    None,
+]
+
+
+def format_vectors(matrix):
+    """
+    Returns:
+        list: pgvector text literals, one per row of matrix
+    """
+    buffer = io.StringIO()
+    np.savetxt(buffer, matrix, fmt='%.6g', delimiter=',')
+    return [f'[{line}]' for line in buffer.getvalue().splitlines()]
+
+
+def clustered_vectors(rng, centers, clusters, spread):
+    """
+    Unit vectors scattered around cluster centers, like embeddings of similar listings
+
+    Args:
+        rng (numpy.random.Generator): Source of the noise
+        centers (numpy.ndarray): Unit vector per cluster
+        clusters (numpy.ndarray): Cluster index per vector
+        spread (float): Typical length of the noise added to a center
+
+    Returns:
+        numpy.ndarray: float32 matrix with one normalized row per cluster index
+    """
+    dimension = centers.shape[1]
+    vectors = centers[clusters] + rng.standard_normal((len(clusters), dimension), dtype=np.float32) * (spread / np.sqrt(dimension))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def copy_rows(table, columns, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+class SyntheticCatalog:
+    """
+    Deterministic catalog of any size, bulk loaded with COPY
+
+    Every value comes from one seeded random generator, so the same seed and
+    sizes always produce the same catalog. Embeddings are either clustered
+    random vectors (backend None), which need no model, or real embeddings
+    of the generated text from the given backend.
+
+    Rows are written with SQL, so no signals run: callers rebuild rating
+    summaries and bump cache versions once the load is done.
+    """
+
+    def __init__(self, destination_ids, user_ids, seed=0, clusters=64, spread=0.8, backend=None,
+                 reviews_per_bookable=0, images_per_bookable=0):
+        self.destinations = sorted(destination_ids.items(), key=lambda item: item[1])
+        self.user_ids = np.array(sorted(user_ids), dtype=np.int64)
+        self.rng = np.random.default_rng(seed)
+        self.backend = backend
+        self.spread = spread
+        self.reviews_per_bookable = reviews_per_bookable
+        self.images_per_bookable = images_per_bookable
+        self.types = list(Bookable.BookableType.values)
+        # Numbers the titles, ids depend on what the table held before
+        self.generated = 0
+
+        centers = self.rng.standard_normal((clusters, STORED_DIMENSION), dtype=np.float32)
+        self.centers = centers / np.linalg.norm(centers, axis=1, keepdims=True)
+
+    def allocate_ids(self, count):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                [Bookable._meta.db_table, count],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def make_options(self, bookable_type):
+        rng = self.rng
+        amenities = [AMENITIES[i] for i in sorted(rng.choice(len(AMENITIES), size=int(rng.integers(2, 7)), replace=False))]
+        if bookable_type == 'hotel':
+            return {'stars': int(rng.integers(1, 6)), 'price_per_night': round(float(rng.uniform(50, 500)), 2), 'amenities': amenities}
+        if bookable_type == 'apartment':
+            return {
+                'bedrooms': int(rng.integers(1, 5)), 'max_guests': int(rng.integers(2, 9)),
+                'price_per_night': round(float(rng.uniform(40, 400)), 2), 'amenities': amenities,
+            }
+        if bookable_type in ('activity', 'tour'):
+            return {'duration_hours': int(rng.integers(1, 10)), 'price_per_person': round(float(rng.uniform(20, 200)), 2)}
+        if bookable_type == 'car':
+            return {'seats': int(rng.integers(2, 8)), 'price_per_day': round(float(rng.uniform(25, 300)), 2)}
+        return {'price': round(float(rng.uniform(20, 500)), 2)}
+
+    def load_batch(self, count):
+        """
+        Generate and COPY count bookables with their reviews and images
+
+        Returns:
+            tuple: (bookables, reviews, images) row counts
+        """
+        rng = self.rng
+        ids = self.allocate_ids(count)
+        type_indexes = rng.integers(len(self.types), size=count)
+        destination_indexes = rng.integers(len(self.destinations), size=count)
+
+        rows = []
+        for i, pk in enumerate(ids):
+            self.generated += 1
+            bookable_type = self.types[type_indexes[i]]
+            prefixes, suffixes = TITLE_WORDS[bookable_type]
+            title = f"{prefixes[rng.integers(len(prefixes))]} {suffixes[rng.integers(len(suffixes))]} {self.generated}"
+            rows.append((pk, title, self.destinations[destination_indexes[i]], bookable_type,
+                         self.make_options(bookable_type)))
+
+        if self.backend is None:
+            # Listings of one type and region read alike, so both pick the cluster
+            clusters = (type_indexes * 7919 + destination_indexes * 104729 + rng.integers(4, size=count)) % len(self.centers)
+            vectors = clustered_vectors(rng, self.centers, clusters, self.spread)
+            fingerprints = [SYNTHETIC_MODEL] * count
+            model, dimension, version = SYNTHETIC_MODEL, STORED_DIMENSION, SYNTHETIC_MODEL
+        else:
+            texts = [
+                build_bookable_embedding_text(title, bookable_type, destination[0], options)
+                for _, title, destination, bookable_type, options in rows
+            ]
+            vectors = np.array(get_embeddings(texts, backend=self.backend), dtype=np.float32)
+            fingerprints = [text_fingerprint(text, self.backend.model) for text in texts]
+            model, dimension, version = self.backend.model, self.backend.dimension, self.backend.version
+
+        compact = np.array([compact_embedding(vector) for vector in vectors], dtype=np.float32)
+        copy_rows(
+            Bookable._meta.db_table,
+            ['id', 'title', 'destination_id', 'type', 'options', 'embedding', 'embedding_compact',
+             'embedding_fingerprint', 'embedding_model', 'embedding_dimension', 'embedding_version'],
+            (
+                (pk, title, destination[1], bookable_type, json.dumps(options), vector, compact_vector,
+                 fingerprint, model, dimension, version)
+                for (pk, title, destination, bookable_type, options), vector, compact_vector, fingerprint
+                in zip(rows, format_vectors(vectors), format_vectors(compact), fingerprints)
+            ),
+        )
+        return count, self.load_reviews(ids), self.load_images(ids)
+
+    def load_reviews(self, ids):
+        per_bookable = self.reviews_per_bookable
+        if not per_bookable:
+            return 0
+        rng = self.rng
+        count = len(ids) * per_bookable
+        # Consecutive users from a random start, distinct for each bookable
+        starts = rng.integers(len(self.user_ids), size=len(ids))
+        users = self.user_ids[(starts[:, None] + np.arange(per_bookable)) % len(self.user_ids)].ravel()
+        quality = np.repeat(rng.normal(3.8, 0.6, size=len(ids)), per_bookable)
+        ratings = np.clip(np.rint(quality + rng.normal(0, 1, size=count)), 1, 5).astype(int)
+        ages = rng.integers(0, 3 * 365 * 86400, size=count).astype('timedelta64[s]')
+        created = np.datetime_as_string(np.datetime64('now', 's') - ages, unit='s', timezone='UTC')
+        comments = rng.integers(len(REVIEW_COMMENTS), size=count)
+        bookable_ids = np.repeat(ids, per_bookable)
+
+        copy_rows(
+            Review._meta.db_table,
+            ['bookable_id', 'user_id', 'rating', 'comment', 'created_at', 'updated_at'],
+            (
+                (bookable_ids[i], users[i], ratings[i], REVIEW_COMMENTS[comments[i]], created[i], created[i])
+                for i in range(count)
+            ),
+        )
+        return count
+
+    def load_images(self, ids):
+        per_bookable = self.images_per_bookable
+        if not per_bookable:
+            return 0
+        # Paths only, no files are written and no rendition jobs are queued
+        copy_rows(
+            BookableImage._meta.db_table,
+            ['bookable_id', 'image', 'is_thumbnail', 'renditions'],
+            (
+                (pk, f'img/synthetic/{pk}-{position}.jpg', position == 0, '{}')
+                for pk in ids
+                for position in range(per_bookable)
+            ),
+        )
+        return len(ids) * per_bookable
+
+
+def get_synthetic_users(count):
+    """
+    Returns:
+        list: Ids of count reviewer accounts, created on first use
+    """
+    usernames = {f'synthetic_user_{i}' for i in range(count)}
+    users = dict(User.objects.filter(username__startswith='synthetic_user_').values_list('username', 'pk'))
+    password = make_password(None)
+    with transaction.atomic():
+        created = User.objects.bulk_create(
+            [User(username=username, password=password) for username in sorted(usernames - users.keys())],
+            batch_size=5000,
+        )
+    users.update((user.username, user.pk) for user in created)
+    return [users[username] for username in usernames]
@@ -0,0 +1,1000 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, transaction
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest.mock import patch
+from PIL import Image as PILImage
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from .models import Destination, Bookable, BookableImage, Review, RatingSummary
+from .serializers import BookableDetailSerializer
+from .search import needs_exact_search, semantic_search
+from utils.jobs import claim_jobs, run_job
+from utils.models import Checkpoint, Job
+
+
+@override_settings(EMBEDDING_ASYNC=False)
+class EmbeddingFingerprintTests(TestCase):
+
+    def setUp(self):
+        self.destination = Destination.objects.create(name="Bali, Indonesia")
+
+    @patch('utils.models.get_embedding', return_value=np.ones(1536))
+    def test_unchanged_content_is_not_reembedded(self, mock_get_embedding):
+        """Saving without touching embedded fields makes no provider call"""
+        bookable = Bookable.objects.create(
+            title="Ocean Resort 1",
+            destination=self.destination,
+            type=Bookable.BookableType.HOTEL,
+            options={"stars": 4, "amenities": ["Pool"]}
+        )
+        self.assertEqual(mock_get_embedding.call_count, 1)
+        self.assertTrue(bookable.embedding_fingerprint)
+
+        # Reloaded row, jsonb may return keys in a different order
+        bookable = Bookable.objects.get(pk=bookable.pk)
+        bookable.save()
+        self.assertEqual(mock_get_embedding.call_count, 1)
+
+    @patch('utils.models.get_embedding', return_value=np.ones(1536))
+    def test_changed_content_is_reembedded(self, mock_get_embedding):
+        """Changing embedded content regenerates the embedding"""
+        bookable = Bookable.objects.create(
+            title="Ocean Resort 1",
+            destination=self.destination,
+            type=Bookable.BookableType.HOTEL,
+            options={"stars": 4}
+        )
+        fingerprint = bookable.embedding_fingerprint
+
+        bookable.options = {"stars": 5}
+        bookable.save(update_fields=['options'])
+
+        self.assertEqual(mock_get_embedding.call_count, 2)
+        bookable.refresh_from_db()
+        self.assertNotEqual(bookable.embedding_fingerprint, fingerprint)
+
+
+# Measures the uncached path
+@override_settings(RESPONSE_CACHE={'TTL': 0})
+class BookableQueryCountTests(APITestCase):
+
+    def setUp(self):
+        self.destination = Destination.objects.create(name="Tokyo, Japan")
+        self.users = [User.objects.create(username=f"user{i}") for i in range(3)]
+
+    def add_bookables(self, count):
+        bookables = Bookable.objects.bulk_create([
+            Bookable(
+                title=f"Urban Lofts {Bookable.objects.count() + i}",
+                destination=self.destination,
+                type=Bookable.BookableType.APARTMENT,
+                embedding=np.random.rand(1536),
+            )
+            for i in range(count)
+        ])
+        for bookable in bookables:
+            BookableImage.objects.create(bookable=bookable, image='img/a.jpg', is_thumbnail=True)
+            BookableImage.objects.create(bookable=bookable, image='img/b.jpg')
+            for user in self.users:
+                Review.objects.create(bookable=bookable, user=user, rating=4)
+        RatingSummary.rebuild()
+
+    def count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_list_query_count_is_constant(self):
+        url = reverse('travel:bookable-list')
+        self.add_bookables(2)
+        small, response = self.count_queries('get', url)
+        self.assertEqual(response.data[0]['review_count'], 3)
+        self.assertEqual(response.data[0]['avg_rating'], 4.0)
+
+        self.add_bookables(8)
+        large, response = self.count_queries('get', url)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(small, large)
+
+    @override_settings(SEARCH_RESULT_CACHE={'TTL': 0})
+    @patch('travel.views.get_embedding', side_effect=lambda text: np.random.rand(1536))
+    def test_search_query_count_is_constant(self, mock_get_embedding):
+        url = reverse('travel:bookable-search')
+        self.add_bookables(2)
+        # Warm up per-process lookups such as the pgvector version
+        self.client.post(url, {'message': 'loft in tokyo'}, format='json')
+        small, response = self.count_queries('post', url, {'message': 'loft in tokyo'})
+        self.assertEqual(len(response.data['results']), 2)
+
+        self.add_bookables(8)
+        large, response = self.count_queries('post', url, {'message': 'loft in tokyo'})
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['results'][0]['review_count'], 3)
+        self.assertEqual(small, large)
+
+
+class RatingSummaryTests(APITestCase):
+
+    def setUp(self):
+        destination = Destination.objects.create(name="Paris, France")
+        self.bookable, self.other = Bookable.objects.bulk_create([
+            Bookable(title="Grand Hotel 1", destination=destination, type=Bookable.BookableType.HOTEL),
+            Bookable(title="Grand Hotel 2", destination=destination, type=Bookable.BookableType.HOTEL),
+        ])
+        self.user = User.objects.create(username="traveler")
+        self.client.force_authenticate(self.user)
+
+    def summary(self, bookable):
+        return RatingSummary.objects.get(bookable=bookable)
+
+    def test_summary_follows_review_writes(self):
+        response = self.client.post(reverse('travel:review-list'), {'bookable': self.bookable.pk, 'rating': 5}, format='json')
+        self.assertEqual(response.status_code, 201)
+        review_url = reverse('travel:review-detail', args=[response.data['id']])
+        summary = self.summary(self.bookable)
+        self.assertEqual((summary.rating_count, summary.rating_avg, summary.stars_5), (1, 5.0, 1))
+
+        self.client.patch(review_url, {'rating': 2}, format='json')
+        summary = self.summary(self.bookable)
+        self.assertEqual((summary.rating_count, summary.rating_sum, summary.stars_5, summary.stars_2), (1, 2, 0, 1))
+
+        self.client.patch(review_url, {'bookable': self.other.pk}, format='json')
+        self.assertEqual(self.summary(self.bookable).rating_count, 0)
+        self.assertEqual(self.summary(self.other).rating_avg, 2.0)
+
+        self.client.delete(review_url)
+        summary = self.summary(self.other)
+        self.assertEqual((summary.rating_count, summary.rating_sum, summary.rating_avg, summary.stars_2), (0, 0, 0.0, 0))
+
+    def test_rebuild_matches_reviews(self):
+        Review.objects.create(bookable=self.bookable, user=self.user, rating=3)
+        Review.objects.create(bookable=self.bookable, user=User.objects.create(username="second"), rating=4)
+
+        RatingSummary.rebuild()
+
+        summary = self.summary(self.bookable)
+        self.assertEqual(summary.rating_avg, 3.5)
+        self.assertEqual(summary.histogram, {1: 0, 2: 0, 3: 1, 4: 1, 5: 0})
+        self.assertFalse(RatingSummary.objects.filter(bookable=self.other).exists())
+
+
+class HybridSearchTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        destination = Destination.objects.create(name="Dubai, UAE")
+        rng = np.random.default_rng(0)
+        self.bookables = Bookable.objects.bulk_create([
+            Bookable(
+                title=title,
+                destination=destination,
+                type=Bookable.BookableType.HOTEL,
+                options={"address": address},
+                embedding=rng.random(1536),
+            )
+            for title, address in [
+                ("Grand Plaza 12", "1 Marina Walk"),
+                ("Royal Suites 7", "22 Palm Road"),
+                ("Ocean Lodge 3", "5 Creek Street"),
+            ]
+        ])
+        self.url = reverse('travel:bookable-search')
+
+    @patch('travel.views.get_embedding')
+    def test_lexical_mode_skips_embedding(self, mock_get_embedding):
+        response = self.client.post(self.url, {'message': 'grand plaza', 'mode': 'lexical'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['title'] for r in response.data['results']], ["Grand Plaza 12"])
+        mock_get_embedding.assert_not_called()
+
+    @patch('travel.views.get_embedding')
+    def test_hybrid_mode_fuses_both_legs(self, mock_get_embedding):
+        # The vector closest to the query is "Ocean Lodge 3", the text matches the address of "Royal Suites 7"
+        mock_get_embedding.return_value = np.array(self.bookables[2].embedding)
+        response = self.client.post(self.url, {'message': 'palm road', 'mode': 'hybrid'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        titles = [r['title'] for r in response.data['results']]
+        self.assertEqual(len(titles), 3)
+        self.assertEqual(set(titles[:2]), {"Ocean Lodge 3", "Royal Suites 7"})
+        self.assertEqual(titles[2], "Grand Plaza 12")
+
+
+class SearchCatalogMixin:
+    """60 hotels and cars in Rome and London with random embeddings"""
+
+    def setUp(self):
+        cache.clear()
+        self.rome = Destination.objects.create(name="Rome, Italy")
+        self.london = Destination.objects.create(name="London, UK")
+        rng = np.random.default_rng(1)
+        Bookable.objects.bulk_create([
+            Bookable(
+                title=f"Bookable {i}",
+                destination=self.rome if i % 2 else self.london,
+                type=Bookable.BookableType.HOTEL if i % 3 == 0 else Bookable.BookableType.CAR,
+                options={"amenities": ["Pool", "Gym"] if i % 4 == 0 else ["Gym"]},
+                embedding=rng.random(1536),
+            )
+            for i in range(60)
+        ])
+        self.url = reverse('travel:bookable-search')
+
+    def search_all(self, data):
+        """Follow the cursor through every page and return all results"""
+        results, cursor = [], None
+        while True:
+            response = self.client.post(self.url, {**data, **({'cursor': cursor} if cursor else {})}, format='json')
+            self.assertEqual(response.status_code, 200)
+            results += response.data['results']
+            cursor = response.data['next']
+            if not cursor:
+                return results
+
+
+class FilteredSearchTests(SearchCatalogMixin, APITestCase):
+
+    @patch('travel.views.get_embedding', return_value=np.full(1536, 0.5))
+    def test_filters_are_applied_before_pagination(self, mock_get_embedding):
+        for mode in ['semantic', 'hybrid']:
+            results = self.search_all({
+                'message': 'bookable', 'mode': mode, 'type': 'hotel', 'destination': self.rome.pk,
+            })
+            # Odd multiples of 3 below 60
+            self.assertEqual(len(results), 10)
+            for result in results:
+                self.assertEqual((result['type'], result['destination']), ('hotel', self.rome.pk))
+
+    @patch('travel.views.get_embedding', return_value=np.full(1536, 0.5))
+    def test_options_filter(self, mock_get_embedding):
+        results = self.search_all({'message': 'bookable', 'options': {'amenities': ['Pool']}})
+        self.assertEqual(len(results), 15)
+
+        response = self.client.get(reverse('travel:bookable-list'), {'options': '{"amenities": ["Pool"]}', 'type': 'hotel'})
+        self.assertEqual(len(response.data), 5)
+
+    def test_invalid_filter(self):
+        response = self.client.get(reverse('travel:bookable-list'), {'type': 'spaceship'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchCursorPaginationTests(SearchCatalogMixin, APITestCase):
+
+    @patch('travel.views.get_embedding', return_value=np.full(1536, 0.5))
+    def test_pages_follow_each_other(self, mock_get_embedding):
+        for mode in ['semantic', 'lexical', 'hybrid']:
+            results = self.search_all({'message': 'bookable', 'mode': mode})
+            ids = [result['id'] for result in results]
+            self.assertEqual(len(ids), 60)
+            self.assertEqual(len(set(ids)), 60)
+
+    @patch('travel.views.get_embedding', return_value=np.full(1536, 0.5))
+    @patch('travel.search.supports_iterative_scan', return_value=False)
+    def test_pages_past_the_ef_search_limit(self, mock_iterative_scan, mock_get_embedding):
+        # From the third page on the index would have to produce more rows than ef_search may be set to.
+        # The planner is kept on the HNSW index as on a large table.
+        with connection.cursor() as cursor:
+            for setting in ('enable_seqscan', 'enable_bitmapscan', 'enable_sort'):
+                cursor.execute(f"SET LOCAL {setting} = off")
+        with self.settings(VECTOR_SEARCH={**settings.VECTOR_SEARCH, 'MAX_HNSW_EF_SEARCH': 25}):
+            first = self.client.post(self.url, {'message': 'bookable'}, format='json')
+            second = self.client.post(self.url, {'message': 'bookable', 'cursor': first.data['next']}, format='json')
+            with CaptureQueriesContext(connection) as queries:
+                third = self.client.post(self.url, {'message': 'bookable', 'cursor': second.data['next']}, format='json')
+            # Sorted exactly in one query, not scanned short and retried
+            self.assertEqual(len([q for q in queries.captured_queries if '<->' in q['sql']]), 1)
+            self.assertEqual(len(third.data['results']), 10)
+            self.assertIsNotNone(third.data['next'])
+
+            results = self.search_all({'message': 'bookable'})
+        self.assertEqual(len({result['id'] for result in results}), 60)
+
+    @patch('travel.views.get_embedding', return_value=np.full(1536, 0.5))
+    def test_no_count_query(self, mock_get_embedding):
+        first = self.client.post(self.url, {'message': 'bookable'}, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, {'message': 'bookable', 'cursor': first.data['next']}, format='json')
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT(' in q['sql']])
+        self.assertFalse([q for q in queries.captured_queries if 'OFFSET' in q['sql']])
+
+    @patch('travel.views.get_embedding', return_value=np.full(1536, 0.5))
+    def test_cursor_is_bound_to_its_search(self, mock_get_embedding):
+        first = self.client.post(self.url, {'message': 'bookable'}, format='json')
+        response = self.client.post(self.url, {'message': 'car', 'cursor': first.data['next']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(self.url, {'message': 'bookable', 'cursor': 'garbage'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchTuningTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('travel:bookable-search')
+
+    @patch('travel.views.get_embedding', return_value=np.full(1536, 0.5))
+    def test_tuning_is_clamped(self, mock_get_embedding):
+        with self.settings(VECTOR_SEARCH={**settings.VECTOR_SEARCH, 'MAX_HNSW_EF_SEARCH': 500, 'MAX_IVFFLAT_PROBES': 20}):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(f'{self.url}?ef_search=5000&probes=5000', {'message': 'beach'}, format='json')
+            self.assertEqual(response.status_code, 200)
+            query = next(q['sql'] for q in queries.captured_queries if 'hnsw.ef_search' in q['sql'])
+        self.assertIn("set_config('hnsw.ef_search', '500', true)", query)
+        self.assertIn("set_config('ivfflat.probes', '20', true)", query)
+
+    def test_invalid_tuning(self):
+        for query_string in ('ef_search=0', 'ef_search=many', 'probes=-1'):
+            response = self.client.post(f'{self.url}?{query_string}', {'message': 'beach'}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+
+class OptionFilterTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        destination = Destination.objects.create(name="Vienna, Austria")
+        catalog = [
+            (Bookable.BookableType.HOTEL, {"stars": 5, "price_per_night": 320.0, "amenities": ["Pool", "Spa", "Gym"]}),
+            (Bookable.BookableType.HOTEL, {"stars": 3, "price_per_night": 90.0, "amenities": ["Gym"]}),
+            (Bookable.BookableType.HOTEL, {"stars": "five", "price_per_night": "cheap"}),
+            (Bookable.BookableType.APARTMENT, {"max_guests": 6, "price_per_night": 150.0, "amenities": ["Pool", "Spa"]}),
+            (Bookable.BookableType.CAR, {"seats": 7, "price_per_day": 80.0}),
+            (Bookable.BookableType.CAR, {"seats": 2, "price_per_day": 200.0}),
+            (Bookable.BookableType.TOUR, {"price_per_person": 40.0}),
+        ]
+        self.bookables = Bookable.objects.bulk_create([
+            Bookable(title=f"Bookable {i}", destination=destination, type=bookable_type, options=options,
+                     embedding=np.full(1536, i + 1.0))
+            for i, (bookable_type, options) in enumerate(catalog)
+        ])
+
+    def list_titles(self, params):
+        response = self.client.get(reverse('travel:bookable-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(bookable['title'] for bookable in response.data)
+
+    def test_list_filters(self):
+        self.assertEqual(self.list_titles({'min_stars': 4}), ["Bookable 0"])
+        self.assertEqual(self.list_titles({'min_price': 80, 'max_price': 150}), ["Bookable 1", "Bookable 3", "Bookable 4"])
+        self.assertEqual(self.list_titles({'amenities': ['Pool', 'Spa']}), ["Bookable 0", "Bookable 3"])
+        self.assertEqual(self.list_titles({'min_seats': 5}), ["Bookable 4"])
+        self.assertEqual(self.list_titles({'min_guests': 4, 'amenities': 'Pool'}), ["Bookable 3"])
+
+    def test_invalid_filters(self):
+        for params in ({'min_stars': 6}, {'min_price': 100, 'max_price': 50}, {'min_seats': 'many'}):
+            response = self.client.get(reverse('travel:bookable-list'), params)
+            self.assertEqual(response.status_code, 400)
+
+    @patch('travel.views.get_embedding', return_value=np.full(1536, 0.5))
+    def test_search_filters(self, mock_get_embedding):
+        for mode in ['semantic', 'lexical', 'hybrid']:
+            response = self.client.post(
+                reverse('travel:bookable-search'),
+                {'message': 'bookable', 'mode': mode, 'max_price': 100, 'amenities': ['Gym']},
+                format='json',
+            )
+            self.assertEqual([bookable['title'] for bookable in response.data['results']], ["Bookable 1"])
+
+    @patch('travel.views.get_embedding', return_value=np.full(1536, 0.5))
+    def test_selective_filter_past_the_index_window(self, mock_get_embedding):
+        # More cheap rows closer to the query than the default ef_search of 40
+        Bookable.objects.bulk_create([
+            Bookable(title=f"Hostel {i}", destination=self.bookables[0].destination, type=Bookable.BookableType.HOTEL,
+                     options={"stars": 1, "price_per_night": 10.0}, embedding=np.full(1536, 0.5 + i / 1000))
+            for i in range(60)
+        ])
+        # Steer the planner onto the HNSW index as on a large table, the filter then only sees its window
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for setting in ('enable_seqscan', 'enable_bitmapscan', 'enable_sort'):
+                    cursor.execute(f"SET LOCAL {setting} = off")
+            response = self.client.post(
+                reverse('travel:bookable-search'),
+                {'message': 'luxury', 'mode': 'semantic', 'min_price': 300},
+                format='json',
+            )
+        self.assertEqual([bookable['title'] for bookable in response.data['results']], ["Bookable 0"])
+
+    def test_filters_are_served_by_indexes(self):
+        queries = {
+            'bookable_option_stars_idx': Bookable.objects.apply_filters(min_stars=4),
+            'bookable_option_price_idx': Bookable.objects.apply_filters(min_price=10, max_price=20),
+            'bookable_option_seats_idx': Bookable.objects.apply_filters(min_seats=4),
+            'bookable_option_guests_idx': Bookable.objects.apply_filters(min_guests=4),
+            'bookable_options_gin': Bookable.objects.apply_filters(amenities=['Pool']),
+        }
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            for index, queryset in queries.items():
+                self.assertIn(index, queryset.values('pk').explain())
+
+    @patch('travel.search.supports_iterative_scan', return_value=False)
+    def test_type_filter_is_served_by_its_hnsw_index(self, mock_iterative_scan):
+        # Without iterative scans only a type filter keeps to the index
+        self.assertFalse(needs_exact_search({'type': 'hotel', 'destination': None}))
+        self.assertTrue(needs_exact_search({'type': 'hotel', 'min_stars': 4}))
+
+        queryset = semantic_search(Bookable.objects.apply_filters(type='hotel').for_listing(), np.full(1536, 0.5), 11)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            self.assertIn('bookable_hotel_hnsw', queryset.explain())
+
+
+class FacetTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.vienna = Destination.objects.create(name="Vienna, Austria")
+        self.prague = Destination.objects.create(name="Prague, Czech Republic")
+        catalog = [
+            (self.vienna, Bookable.BookableType.HOTEL, {"stars": 5, "price_per_night": 320.0}),
+            (self.vienna, Bookable.BookableType.HOTEL, {"stars": 3, "price_per_night": 90.0}),
+            (self.vienna, Bookable.BookableType.HOTEL, {"stars": "five", "price_per_night": "cheap"}),
+            (self.vienna, Bookable.BookableType.CAR, {"seats": 4, "price_per_day": 80.0}),
+            (self.prague, Bookable.BookableType.HOTEL, {"stars": 4, "price_per_night": 40.0}),
+            (self.prague, Bookable.BookableType.TOUR, {"price_per_person": 600.0}),
+        ]
+        Bookable.objects.bulk_create([
+            Bookable(title=f"Bookable {i}", destination=destination, type=bookable_type, options=options,
+                     embedding=np.full(1536, i + 1.0))
+            for i, (destination, bookable_type, options) in enumerate(catalog)
+        ])
+        call_command('refresh_facets', stdout=io.StringIO())
+
+    def get_facets(self, params=None):
+        response = self.client.get(reverse('travel:bookable-facets'), params or {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def counts(self, facets, name):
+        return {item['value']: item['count'] for item in facets[name]}
+
+    def test_catalog_facets(self):
+        facets = self.get_facets()
+        self.assertEqual(facets['total'], 6)
+        self.assertEqual(self.counts(facets, 'type'), {'hotel': 4, 'car': 1, 'tour': 1})
+        self.assertEqual(facets['destination'][0], {'value': self.vienna.pk, 'name': "Vienna, Austria", 'count': 4})
+        self.assertEqual(self.counts(facets, 'destination'), {self.vienna.pk: 4, self.prague.pk: 2})
+        # Values that are not numbers count towards the total only
+        self.assertEqual(self.counts(facets, 'stars'), {5: 1, 4: 1, 3: 1})
+        self.assertEqual(
+            [(item['min'], item['max'], item['count']) for item in facets['price']],
+            [(0, 50, 1), (50, 100, 2), (200, 500, 1), (500, None, 1)],
+        )
+
+    def test_facets_exclude_their_own_filter(self):
+        facets = self.get_facets({'type': 'hotel', 'min_stars': 4})
+        self.assertEqual(facets['total'], 2)
+        # Only hotels have stars, so the other types drop out of the type facet
+        self.assertEqual(self.counts(facets, 'type'), {'hotel': 2})
+        self.assertEqual(self.counts(facets, 'destination'), {self.vienna.pk: 1, self.prague.pk: 1})
+        self.assertEqual(self.counts(facets, 'stars'), {5: 1, 4: 1, 3: 1})
+
+        response = self.client.get(reverse('travel:bookable-facets'), {'min_stars': 6})
+        self.assertEqual(response.status_code, 400)
+
+    def test_counts_follow_refreshes(self):
+        Bookable.objects.create(title="Late Hotel", destination=self.prague, type=Bookable.BookableType.HOTEL,
+                                options={"stars": 4})
+        self.assertEqual(self.get_facets()['total'], 6)
+        call_command('refresh_facets', stdout=io.StringIO())
+        self.assertEqual(self.get_facets()['total'], 7)
+
+    def test_writes_queue_one_refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                Bookable.objects.create(title=f"New Hotel {i}", destination=self.vienna,
+                                        type=Bookable.BookableType.HOTEL, options={"stars": 2})
+        jobs = Job.objects.filter(kind=Job.Kind.FACETS_REFRESH)
+        self.assertEqual(jobs.count(), 1)
+        # Not due yet, later writes share it
+        self.assertNotIn(Job.Kind.FACETS_REFRESH, [job.kind for job in claim_jobs(10)])
+
+        jobs.update(run_after=jobs[0].created_at)
+        job = claim_jobs(10)[0]
+        self.assertEqual(job.kind, Job.Kind.FACETS_REFRESH)
+        self.assertTrue(run_job(job))
+        self.assertEqual(self.counts(self.get_facets(), 'stars')[2], 3)
+
+    @patch('travel.views.get_embedding', return_value=np.full(1536, 0.5))
+    def test_search_facets(self, mock_get_embedding):
+        for mode in ['semantic', 'lexical', 'hybrid']:
+            data = {'message': 'bookable', 'mode': mode, 'type': 'hotel', 'facets': True}
+            response = self.client.post(reverse('travel:bookable-search'), data, format='json')
+            self.assertEqual(response.status_code, 200)
+            facets = response.data['facets']
+            self.assertEqual(facets['total'], 4)
+            self.assertEqual(self.counts(facets, 'type'), {'hotel': 4})
+            self.assertEqual(self.counts(facets, 'destination'), {self.vienna.pk: 3, self.prague.pk: 1})
+
+            # Served from the search cache
+            cached = self.client.post(reverse('travel:bookable-search'), data, format='json')
+            self.assertEqual(cached.data['facets'], facets)
+
+            without = self.client.post(reverse('travel:bookable-search'), {**data, 'facets': False}, format='json')
+            self.assertNotIn('facets', without.data)
+
+
+@override_settings(EMBEDDINGS={'BACKEND': 'hashing'}, EMBEDDING_ASYNC=False, SEARCH_RESULT_CACHE={'TTL': 0})
+class CompactSearchTests(APITestCase):
+
+    def setUp(self):
+        destination = Destination.objects.create(name="Lisbon, Portugal")
+        words = ["beach", "castle", "museum", "surf", "wine", "tram", "river", "harbour"]
+        Bookable.objects.bulk_create_with_embeddings([
+            Bookable(
+                title=f"{words[i % 8]} {words[(i * 3) % 8]} {i}",
+                destination=destination,
+                type=Bookable.BookableType.TOUR,
+                options={},
+            )
+            for i in range(40)
+        ])
+
+    def test_compact_embedding_is_stored(self):
+        bookable = Bookable.objects.first()
+        self.assertEqual(len(bookable.embedding_compact), 256)
+        self.assertAlmostEqual(float(np.linalg.norm(bookable.embedding_compact)), 1.0, places=5)
+        self.assertEqual(bookable.embedding.dtype, np.float32)
+
+    def test_rerank_orders_by_full_distance(self):
+        url = reverse('travel:bookable-search')
+        exact = self.client.post(url, {'message': 'surf beach'}, format='json').data['results']
+        with self.settings(VECTOR_SEARCH={**settings.VECTOR_SEARCH, 'COMPACT_SEARCH': True, 'RERANK_DEPTH': 40}):
+            compact = self.client.post(url, {'message': 'surf beach'}, format='json').data['results']
+        # Every row is a candidate, so the re-rank has to reproduce the exact order
+        self.assertEqual([r['id'] for r in compact], [r['id'] for r in exact])
+
+
+# The similar cache is off without a shared cache, the test client runs in a single process
+@override_settings(EMBEDDINGS={'BACKEND': 'hashing'}, EMBEDDING_ASYNC=False,
+                   SIMILAR_BOOKABLES={'LIMIT': 10, 'MAX_LIMIT': 50, 'CACHE_TTL': 3600})
+class SimilarBookablesTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.rome = Destination.objects.create(name="Rome, Italy")
+        self.paris = Destination.objects.create(name="Paris, France")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bookables = Bookable.objects.bulk_create_with_embeddings([
+                Bookable(title=title, destination=destination, type=bookable_type, options={})
+                for title, destination, bookable_type in [
+                    ("Colosseum night tour", self.rome, Bookable.BookableType.TOUR),
+                    ("Colosseum day tour", self.rome, Bookable.BookableType.TOUR),
+                    ("Colosseum view hotel", self.rome, Bookable.BookableType.HOTEL),
+                    ("Louvre museum tour", self.paris, Bookable.BookableType.TOUR),
+                    ("Airport car rental", self.paris, Bookable.BookableType.CAR),
+                ]
+            ])
+        self.source = self.bookables[0]
+        self.url = reverse('travel:bookable-similar', args=[self.source.pk])
+
+    @patch('utils.embeddings.get_backend')
+    def test_similar_without_provider_call(self, mock_get_backend):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        ids = [r['id'] for r in response.data]
+        self.assertNotIn(self.source.pk, ids)
+        self.assertEqual(ids[0], self.bookables[1].pk)
+        self.assertEqual(len(ids), 4)
+        mock_get_backend.assert_not_called()
+
+        response = self.client.get(self.url, {'type': 'hotel'})
+        self.assertEqual([r['id'] for r in response.data], [self.bookables[2].pk])
+
+    def test_cached_until_embeddings_change(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertFalse([q for q in queries.captured_queries if '<->' in q['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            closer = Bookable.objects.create(
+                title="Colosseum night tour", destination=self.paris,
+                type=Bookable.BookableType.TOUR, options={},
+            )
+        response = self.client.get(self.url)
+        self.assertIn(closer.pk, [r['id'] for r in response.data])
+
+
+# Off without a shared cache, the test client runs in a single process
+@override_settings(EMBEDDINGS={'BACKEND': 'hashing'}, EMBEDDING_ASYNC=False, SEARCH_RESULT_CACHE={'TTL': 600})
+class SearchResultCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.destination = Destination.objects.create(name="Bali, Indonesia")
+        with self.captureOnCommitCallbacks(execute=True):
+            # Every extra word moves a row further from the query, the index
+            # cannot order rows at equal distance by id
+            Bookable.objects.bulk_create_with_embeddings([
+                Bookable(title="Beach hotel" + " by the sea" * i, destination=self.destination,
+                         type=Bookable.BookableType.HOTEL, options={})
+                for i in range(15)
+            ])
+        self.url = reverse('travel:bookable-search')
+
+    def test_repeated_search_is_served_from_cache(self):
+        first = self.client.post(self.url, {'message': 'beach hotel bali'}, format='json')
+        with patch('travel.views.get_embedding') as mock_get_embedding:
+            with CaptureQueriesContext(connection) as queries:
+                again = self.client.post(self.url, {'message': '  Beach Hotel   BALI '}, format='json')
+        mock_get_embedding.assert_not_called()
+        self.assertFalse([q for q in queries.captured_queries if '<->' in q['sql']])
+        self.assertEqual(again.data, first.data)
+
+        # A miss embeds the message with its case, only the whitespace collapsed
+        with patch('travel.views.get_embedding', return_value=np.full(1536, 0.5)) as mock_get_embedding:
+            self.client.post(self.url, {'message': '  Surf  Camp BALI '}, format='json')
+        mock_get_embedding.assert_called_once_with('Surf Camp BALI')
+
+        # The next page is cached separately, under its cursor
+        second = self.client.post(self.url, {'message': 'beach hotel bali', 'cursor': first.data['next']}, format='json')
+        self.assertEqual(len(second.data['results']), 5)
+
+    def test_embedding_change_invalidates(self):
+        self.client.post(self.url, {'message': 'surf camp'}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            camp = Bookable.objects.create(title="Surf camp", destination=self.destination,
+                                           type=Bookable.BookableType.OTHER, options={})
+        response = self.client.post(self.url, {'message': 'surf camp'}, format='json')
+        self.assertEqual(response.data['results'][0]['id'], camp.pk)
+
+    def test_rating_change_invalidates(self):
+        data = {'message': 'beach hotel bali', 'min_rating': 4}
+        self.assertEqual(self.client.post(self.url, data, format='json').data['results'], [])
+
+        # Reviews leave the vectors alone but change what min_rating admits
+        hotel = Bookable.objects.first()
+        self.client.force_authenticate(User.objects.create(username="surfer"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('travel:review-list'), {'bookable': hotel.pk, 'rating': 5}, format='json')
+        self.client.force_authenticate(None)
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual([r['id'] for r in response.data['results']], [hotel.pk])
+
+
+# Off without a shared cache, the test client runs in a single process
+@override_settings(RESPONSE_CACHE={'TTL': 600})
+class ResponseCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.destination = Destination.objects.create(name="Cairo, Egypt")
+        self.bookable = Bookable.objects.bulk_create([
+            Bookable(title="Nile Cruise", destination=self.destination, type=Bookable.BookableType.TOUR),
+        ])[0]
+        self.user = User.objects.create(username="traveler")
+        self.url = reverse('travel:bookable-list')
+
+    def test_list_is_cached_with_etag(self):
+        first = self.client.get(self.url, {'type': 'tour', 'destination': self.destination.pk})
+        etag = first['ETag']
+
+        with self.assertNumQueries(0):
+            # Same parameters in another order
+            cached = self.client.get(f"{self.url}?destination={self.destination.pk}&type=tour")
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(cached['ETag'], etag)
+        # The key includes the negotiated media type
+        self.assertIn('Accept', first['Vary'])
+        self.assertIn('Accept', cached['Vary'])
+
+        not_modified = self.client.get(self.url, {'type': 'tour', 'destination': self.destination.pk},
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertIn('Accept', not_modified['Vary'])
+
+    @override_settings(RESPONSE_CACHE={'TTL': 0})
+    def test_without_the_cache_etags_still_apply(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertTrue(queries.captured_queries)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('Accept', not_modified['Vary'])
+
+    def test_writes_invalidate(self):
+        reviews_url = reverse('travel:review-list')
+        etag = self.client.get(self.url)['ETag']
+        self.client.get(reviews_url, {'bookable': self.bookable.pk})
+
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reviews_url, {'bookable': self.bookable.pk, 'rating': 5}, format='json')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['review_count'], 1)
+        self.assertEqual(len(self.client.get(reviews_url, {'bookable': self.bookable.pk}).json()), 1)
+
+
+# Off without a shared cache, the test client runs in a single process
+@override_settings(RESPONSE_CACHE={'TTL': 600})
+class BookableReviewsTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        destination = Destination.objects.create(name="Kyoto, Japan")
+        self.bookable = Bookable.objects.bulk_create([
+            Bookable(title="Temple Stay", destination=destination, type=Bookable.BookableType.OTHER),
+        ])[0]
+        users = User.objects.bulk_create([User(username=f"guest{i}") for i in range(25)])
+        Review.objects.bulk_create([
+            Review(bookable=self.bookable, user=user, rating=1 + i % 5) for i, user in enumerate(users)
+        ])
+
+    def test_detail_embeds_latest_reviews_only(self):
+        url = reverse('travel:bookable-detail', args=[self.bookable.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        reviews = response.data['reviews']
+        self.assertEqual(len(reviews), BookableDetailSerializer.LATEST_REVIEWS)
+        self.assertEqual(reviews[0]['id'], Review.objects.order_by('-created_at', '-id').first().pk)
+        # Bookable, images, reviews with users; no query per review
+        self.assertLessEqual(len(queries), 4)
+
+    def test_reviews_sub_resource_is_cursor_paginated(self):
+        url = reverse('travel:bookable-reviews', args=[self.bookable.pk])
+        first = self.client.get(url)
+        self.assertEqual(len(first.data['results']), 20)
+        self.assertNotIn('count', first.data)
+
+        second = self.client.get(first.data['next'])
+        ids = [r['id'] for r in first.data['results'] + second.data['results']]
+        self.assertEqual(len(set(ids)), 25)
+        self.assertIsNone(second.data['next'])
+
+        self.assertEqual(self.client.get(reverse('travel:bookable-reviews', args=[0])).status_code, 404)
+
+    def test_reviews_pages_are_served_from_cache(self):
+        url = reverse('travel:bookable-reviews', args=[self.bookable.pk])
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(cached['ETag'], first['ETag'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+
+class SparseFieldsetTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        destination = Destination.objects.create(name="Oslo, Norway")
+        self.bookable = Bookable.objects.bulk_create([
+            Bookable(title="Fjord Cabin", destination=destination, type=Bookable.BookableType.APARTMENT,
+                     options={"rooms": 2}),
+        ])[0]
+        BookableImage.objects.create(bookable=self.bookable, image='img/a.jpg', is_thumbnail=True)
+        self.url = reverse('travel:bookable-list')
+
+    def test_fields_trim_response_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'id,title'})
+        self.assertEqual(response.json(), [{'id': self.bookable.pk, 'title': "Fjord Cabin"}])
+        # One query, without the options column and without the image prefetch
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"options"', queries[0]['sql'])
+
+    def test_omit(self):
+        response = self.client.get(reverse('travel:bookable-detail', args=[self.bookable.pk]),
+                                   {'omit': 'options,reviews'})
+        self.assertNotIn('options', response.json())
+        self.assertNotIn('reviews', response.json())
+        self.assertEqual(len(response.json()['images']), 1)
+
+    def test_unknown_field(self):
+        response = self.client.get(self.url, {'fields': 'id,embedding'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_orjson_renderer(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()[0]['options'], {"rooms": 2})
+
+
+class ImageRenditionTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        destination = Destination.objects.create(name="Reykjavik, Iceland")
+        self.bookable = Bookable.objects.bulk_create([
+            Bookable(title="Aurora Lodge", destination=destination, type=Bookable.BookableType.HOTEL),
+        ])[0]
+
+    def upload(self, size):
+        buffer = io.BytesIO()
+        PILImage.new('RGB', size, (30, 90, 160)).save(buffer, 'JPEG')
+        return SimpleUploadedFile('aurora.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_worker_generates_renditions(self):
+        image = BookableImage.objects.create(bookable=self.bookable, image=self.upload((1000, 600)), is_thumbnail=True)
+        self.assertEqual(image.renditions, {})
+        # Served as the original until the worker has run
+        response = self.client.get(reverse('travel:bookable-list'))
+        self.assertTrue(response.json()[0]['thumbnail']['image'].endswith('.jpg'))
+
+        job = claim_jobs(10)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(run_job(job))
+        image.refresh_from_db()
+        self.assertEqual((image.renditions['thumb']['width'], image.renditions['thumb']['height']), (320, 192))
+        # Never scaled up
+        self.assertEqual(image.renditions['full']['width'], 1000)
+        with PILImage.open(os.path.join(self.media_root, image.renditions['card']['webp'])) as card:
+            self.assertEqual((card.format, card.size), ('WEBP', (800, 480)))
+
+        thumbnail = self.client.get(reverse('travel:bookable-list')).json()[0]['thumbnail']
+        self.assertEqual(thumbnail['width'], 320)
+        self.assertTrue(thumbnail['webp'].startswith('http://testserver/media/renditions/'))
+        self.assertNotIn('images', self.client.get(reverse('travel:bookable-list')).json()[0])
+
+        detail = self.client.get(reverse('travel:bookable-detail', args=[self.bookable.pk])).json()
+        self.assertEqual(set(detail['images'][0]['renditions']), {'thumb', 'card', 'full'})
+
+    def test_replacing_the_image_requeues(self):
+        image = BookableImage.objects.create(bookable=self.bookable, image=self.upload((500, 500)))
+        run_job(claim_jobs(10)[0])
+        image.refresh_from_db()
+        self.assertTrue(image.renditions)
+
+        image.is_thumbnail = True
+        image.save()
+        self.assertFalse(Job.objects.exists())
+
+        image.image = self.upload((400, 300))
+        image.save()
+        self.assertEqual(image.renditions, {})
+        self.assertEqual(Job.objects.filter(kind=Job.Kind.IMAGE_RENDITIONS).count(), 1)
+
+
+@override_settings(EMBEDDINGS={'BACKEND': 'hashing'}, EMBEDDING_ASYNC=False)
+class ImportBookablesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'catalog.jsonl')
+        Destination.objects.create(name="Lisbon, Portugal")
+
+    def write(self, records):
+        with open(self.path, 'w') as handle:
+            for record in records:
+                handle.write((record if isinstance(record, str) else json.dumps(record)) + '\n')
+
+    def run_import(self, *args):
+        call_command('import_bookables', self.path, '--batch-size', '2', *args, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def record(self, external_id, title, destination="Lisbon, Portugal", **options):
+        return {'external_id': external_id, 'title': title, 'destination': destination, 'type': 'hotel', 'options': options}
+
+    def test_import_merges_on_external_id(self):
+        self.write([
+            self.record('h-1', "Alfama House", stars=4),
+            self.record('h-2', "Belem Suites"),
+            '{not json',
+            self.record('h-3', "Porto Lodge", destination="Porto, Portugal"),
+            self.record('h-2', "Belem Grand Suites"),
+        ])
+        self.run_import()
+
+        self.assertEqual(Bookable.objects.count(), 3)
+        self.assertEqual(Destination.objects.filter(name="Lisbon, Portugal").count(), 1)
+        self.assertEqual(Bookable.objects.get(external_id='h-3').destination.name, "Porto, Portugal")
+        self.assertEqual(Bookable.objects.get(external_id='h-2').title, "Belem Grand Suites")
+        self.assertFalse(Bookable.objects.filter(embedding__isnull=True).exists())
+        self.assertTrue(Bookable.objects.filter(search_vector__isnull=False).exists())
+        self.assertFalse(Checkpoint.objects.exists())
+
+        unchanged = Bookable.objects.get(external_id='h-1')
+        self.write([self.record('h-1', "Alfama House", stars=4), self.record('h-3', "Porto Riverside Lodge")])
+        self.run_import()
+        self.assertEqual(Bookable.objects.get(external_id='h-1').embedding_fingerprint, unchanged.embedding_fingerprint)
+        changed = Bookable.objects.get(external_id='h-3')
+        self.assertEqual(changed.title, "Porto Riverside Lodge")
+        self.assertEqual(changed.embedding_fingerprint, changed.get_embedding_fingerprint())
+
+    def test_import_resumes_after_the_checkpoint(self):
+        self.write([self.record('h-1', "Alfama House"), self.record('h-2', "Belem Suites"), self.record('h-3', "Baixa Inn")])
+        with open(self.path, 'rb') as handle:
+            offset = len(handle.readline())
+        Checkpoint.save_state(f'import_bookables:{os.path.abspath(self.path)}', {
+            'signature': hashlib.sha256(open(self.path, 'rb').read(65536)).hexdigest(),
+            'position': {'records': 1, 'offset': offset},
+            'totals': {'created': 1, 'updated': 0, 'unchanged': 0, 'skipped': 0},
+        })
+        self.run_import('--no-embeddings')
+        self.assertEqual(set(Bookable.objects.values_list('external_id', flat=True)), {'h-2', 'h-3'})
+        self.assertFalse(Bookable.objects.exclude(embedding_fingerprint='').exists())
+
+    def test_csv_import(self):
+        self.path = self.path.replace('.jsonl', '.csv')
+        with open(self.path, 'w', newline='') as handle:
+            handle.write('external_id,title,destination,type,options\n')
+            handle.write('c-1,"Tram 28, Guided",Lisbon,tour,"{""duration_hours"": 2}"\n')
+        self.run_import()
+        bookable = Bookable.objects.get(external_id='c-1')
+        self.assertEqual((bookable.title, bookable.type, bookable.options), ("Tram 28, Guided", 'tour', {'duration_hours': 2}))
+
+
+class ScaleSampleDataTests(TestCase):
+
+    def generate(self, **options):
+        call_command(
+            'generate_sample_data', bookables=30, destinations=4, reviews_per_bookable=2, images_per_bookable=2,
+            users=3, batch_size=20, stdout=io.StringIO(), **options
+        )
+
+    def test_generates_a_deterministic_catalog(self):
+        self.generate()
+        self.assertEqual(Bookable.objects.count(), 30)
+        self.assertEqual(Review.objects.count(), 60)
+        self.assertEqual(BookableImage.objects.filter(is_thumbnail=True).count(), 30)
+        self.assertEqual(RatingSummary.objects.count(), 30)
+        self.assertFalse(Bookable.objects.filter(embedding_compact__isnull=True).exists())
+        first = list(Bookable.objects.order_by('pk').values_list('title', 'type', 'options', 'embedding'))
+
+        Bookable.objects.all().delete()
+        self.generate()
+        self.assertEqual(Destination.objects.count(), 4)
+        second = list(Bookable.objects.order_by('pk').values_list('title', 'type', 'options', 'embedding'))
+        self.assertEqual([row[:3] for row in first], [row[:3] for row in second])
+        np.testing.assert_allclose(first[0][3], second[0][3])
+
+    def test_backend_embeds_the_generated_text(self):
+        self.generate(embedding_backend='hashing')
+        bookable = Bookable.objects.select_related('destination').first()
+        with override_settings(EMBEDDINGS={'BACKEND': 'hashing'}):
+            self.assertFalse(bookable.embedding_is_stale())
+
+
+@override_settings(EMBEDDINGS={'BACKEND': 'hashing'}, EMBEDDING_ASYNC=False)
+class BenchmarkSearchTests(TestCase):
+
+    def test_reports_latency_and_recall_as_json(self):
+        call_command(
+            'generate_sample_data', bookables=40, destinations=3, reviews_per_bookable=1, images_per_bookable=1,
+            users=2, stdout=io.StringIO()
+        )
+        out = io.StringIO()
+        call_command(
+            'benchmark_search', scenarios='detail,search-semantic', requests=4, warmup=1, sample=3,
+            ef_search='40', compact_depths='20', stdout=out, stderr=io.StringIO()
+        )
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['meta']['bookables'], 40)
+        self.assertEqual([run['scenario'] for run in report['latency']], ['detail', 'search-semantic'])
+        for run in report['latency']:
+            self.assertEqual((run['requests'], run['errors']), (4, 0))
+            self.assertGreater(run['queries_per_request'], 0)
+            self.assertLessEqual(run['p50_ms'], run['p99_ms'])
+        self.assertEqual([(row['strategy'], row['k']) for row in report['recall']], [('hnsw', 10), ('compact', 10)])
+        self.assertEqual(report['recall'][0]['recall'], 1.0)
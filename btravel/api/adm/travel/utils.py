@@ -1,43 +1,23 @@
-import os
 import json
-import numpy as np
-from openai import OpenAI
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from utils.embeddings import get_embedding
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-
-def get_embedding(text, model="text-embedding-3-small"):
+def build_bookable_embedding_text(title, type_value, destination_name, options):
     """
-    Get OpenAI embedding for the provided text
+    Build the text that is embedded for a Bookable item
     
     Args:
-        text (str): The text to embed
-        model (str): The embedding model to use
+        title (str): Bookable title
+        type_value (str): Bookable type
+        destination_name (str): Name of the destination
+        options (dict): Options dictionary
         
     Returns:
-        numpy.ndarray: The embedding vector
+        str: The combined text
     """
-    if not text:
-        # Return zero vector if text is empty
-        return np.zeros(1536)
-        
-    # Clean and prepare text
-    text = text.replace("\n", " ")
-    
-    # Get embeddings from OpenAI
-    response = client.embeddings.create(
-        input=text,
-        model=model
-    )
-    
-    # Extract embedding and convert to numpy array
-    embedding_vector = response.data[0].embedding
-    
-    return np.array(embedding_vector)
+    # Keys are sorted because jsonb does not preserve the order they were written in
+    options_text = json.dumps(options, sort_keys=True) if options else "{}"
+    return f"Title: {title}. Type: {type_value}. Destination: {destination_name}. Options: {options_text}"
 
 def generate_bookable_embedding(title, type_value, destination_name, options):
     """
@@ -52,9 +32,7 @@ def generate_bookable_embedding(title, type_value, destination_name, options):
     Returns:
         numpy.ndarray: The embedding vector
     """
-    # Combine the text
-    options_text = json.dumps(options) if options else "{}"
-    combined_text = f"Title: {title}. Type: {type_value}. Destination: {destination_name}. Options: {options_text}"
+    combined_text = build_bookable_embedding_text(title, type_value, destination_name, options)
     
     return get_embedding(combined_text)
 
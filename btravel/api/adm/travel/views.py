@@ -2,22 +2,46 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
-from .models import Bookable, Review
+from .models import Bookable, Review, RatingSummary
 from .serializers import (
     BookableSerializer, 
     BookableDetailSerializer, 
     ReviewSerializer,
-    SearchSerializer
+    SearchSerializer,
+    SearchTuningSerializer,
+    BookableFilterSerializer,
+    FacetFilterSerializer,
+    SimilarSerializer
 )
+from .facets import get_candidate_facets, get_facets
+from .pagination import SearchCursorPagination, ReviewCursorPagination
+from .search import (
+    semantic_search,
+    lexical_search,
+    hybrid_search,
+    hydrate,
+    get_query_reference,
+    get_search_cache_key,
+    get_search_depth,
+    index_scans_are_complete,
+    needs_exact_search
+)
+from .signals import CATALOG_VERSION, LISTINGS_VERSION
 from .utils import get_embedding
-from django.contrib.postgres.search import SearchVector, SearchQuery
-from pgvector.django import L2Distance
-import numpy as np
+from utils.cache_versions import get_version
+from utils.response_cache import CachedResponseMixin
+from utils.vector_search import ann_search
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import F
 
-class BookableViewSet(viewsets.ReadOnlyModelViewSet):
+class BookableViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Bookable.objects.all()
     serializer_class = BookableSerializer
+    cached_actions = ('list', 'retrieve', 'reviews')
+    cache_version = LISTINGS_VERSION
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -25,30 +49,60 @@ class BookableViewSet(viewsets.ReadOnlyModelViewSet):
         return BookableSerializer
     
     def get_queryset(self):
-        queryset = Bookable.objects.all()
+        # Filter by type, destination, options or minimum rating if provided
+        filter_serializer = BookableFilterSerializer(data=self.request.query_params)
+        filter_serializer.is_valid(raise_exception=True)
+        queryset = self.get_listing_queryset(Bookable.objects.all()).apply_filters(
+            **filter_serializer.validated_data
+        )
         
-        # Filter by type if provided
-        bookable_type = self.request.query_params.get('type', None)
-        if bookable_type:
-            queryset = queryset.filter(type=bookable_type)
-            
-        # Filter by destination if provided
-        destination = self.request.query_params.get('destination', None)
-        if destination:
-            queryset = queryset.filter(destination_id=destination)
+        # Sort by average rating if requested
+        ordering = self.request.query_params.get('ordering', None)
+        if ordering == 'rating':
+            queryset = queryset.order_by(F('rating_summary__rating_avg').asc(nulls_first=True), 'id')
+        elif ordering == '-rating':
+            queryset = queryset.order_by(F('rating_summary__rating_avg').desc(nulls_last=True), 'id')
+        
+        if self.action == 'retrieve' and 'reviews' in self.get_serializer().fields:
+            queryset = queryset.with_latest_reviews(BookableDetailSerializer.LATEST_REVIEWS)
             
         return queryset
     
+    def get_listing_queryset(self, queryset):
+        """
+        for_listing() loading only the columns and prefetches the fields requested
+        with ?fields= / ?omit= need
+        """
+        serializer = self.get_serializer()
+        return queryset.for_listing(
+            columns=serializer.get_model_columns(serializer),
+            images='images' in serializer.fields,
+            thumbnail='thumbnail' in serializer.fields,
+        )
+    
     @action(detail=False, methods=['post'])
     def search(self, request):
         """
-        Search bookables using semantic search with vector embeddings.
+        Search bookables using semantic, lexical or hybrid search.
         
         Args:
-            message (str): The text query to find semantically similar bookables
+            message (str): The text query to find matching bookables
+            type, destination, options, min_rating: Optional filters, applied
+                inside the vector and full text queries rather than afterwards
+            mode (str): 'semantic' orders by vector similarity (default),
+                'lexical' runs full text search only and skips the embedding call,
+                'hybrid' fuses both rankings with reciprocal-rank fusion
+            semantic_depth (int): Hybrid mode candidates from the vector search
+            lexical_depth (int): Hybrid mode candidates from the full text search
+            cursor (str): 'next' from the previous page, sent with the same search
+            facets (bool): Add 'facets', counts over the top FACETS['SEARCH_DEPTH']
+                candidates, to the first page
+            ef_search (int, query param): Optional HNSW candidate list size,
+                higher values improve recall at the cost of latency
+            probes (int, query param): Optional number of IVFFlat lists to probe
             
         Returns:
-            Paginated list of bookables ordered by semantic similarity
+            Cursor paginated list of bookables, best match first
         """
         # Validate input using dedicated SearchSerializer
         search_serializer = SearchSerializer(data=request.data)
@@ -56,34 +110,244 @@ class BookableViewSet(viewsets.ReadOnlyModelViewSet):
             return Response(search_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         # Get validated message
-        message = search_serializer.validated_data['message']
+        params = dict(search_serializer.validated_data)
+        cursor = params.pop('cursor', None)
+        # Not part of the query reference, pages with and without facets share cursors
+        with_facets = params.pop('facets') and cursor is None
+        filters = {name: params[name] for name in BookableFilterSerializer().fields if name in params}
+        bookables = Bookable.objects.apply_filters(**filters)
+        exact = needs_exact_search(filters)
         
-        # Generate embedding for the search query
-        query_embedding = get_embedding(message)
+        # Optional per-request recall tuning for the vector index
+        tuning_serializer = SearchTuningSerializer(data=request.query_params)
+        if not tuning_serializer.is_valid():
+            return Response(tuning_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        tuning = tuning_serializer.validated_data
+        
+        # Set up keyset pagination, no count query and no OFFSET scan
+        paginator = SearchCursorPagination(get_query_reference(params), cursor)
         
-        # Set up pagination
-        paginator = PageNumberPagination()
-        paginator.page_size = 10
+        # Repeated searches are served from the cache until a bookable vector changes
+        cache_key = get_search_cache_key(paginator.query_ref, cursor, tuning)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            ids, paginator.next_cursor, facets = cached
+            # One query for the cached page, through the filters in case rows changed meanwhile
+            paginated_bookables = hydrate(self.get_listing_queryset(bookables), ids)
+        else:
+            paginated_bookables = self._search_page(params, bookables, paginator, tuning, exact)
+            ids, facets = [bookable.pk for bookable in paginated_bookables], None
         
-        # Search for similar bookables using vector distance
-        # Lower distance means higher similarity
-        bookables = Bookable.objects.annotate(
-            distance=L2Distance('embedding', query_embedding)
-        ).order_by('distance')
+        computed_facets = with_facets and facets is None
+        if computed_facets:
+            facets = get_candidate_facets(self._search_candidates(params, bookables, tuning, exact))
+        if cached is None or computed_facets:
+            cache.set(cache_key, (ids, paginator.next_cursor, facets), settings.SEARCH_RESULT_CACHE['TTL'])
         
-        # Apply pagination
-        paginated_bookables = paginator.paginate_queryset(bookables, request)
         serializer = self.get_serializer(paginated_bookables, many=True)
         
+        response = paginator.get_paginated_response(serializer.data)
+        if with_facets:
+            response.data['facets'] = facets
+        return response
+
+    def _search_page(self, params, bookables, paginator, tuning, exact):
+        """
+        Run the search in the requested mode and return the bookables of the current page
+        
+        With exact set the vector ranking sorts every matching row instead of
+        reading the index, see needs_exact_search.
+        """
+        message = params['message']
+        mode = params['mode']
+        
+        if mode == 'lexical':
+            # Full text only, no embedding needed
+            ranked = lexical_search(self.get_listing_queryset(bookables), message)
+            paginated_bookables = paginator.paginate_queryset(ranked, 'rank', descending=True)
+        
+        elif mode == 'hybrid':
+            # Later pages get the query vector from the embedding cache
+            query_embedding = get_embedding(message)
+            semantic_depth = params.get('semantic_depth', settings.HYBRID_SEARCH['SEMANTIC_DEPTH'])
+            with ann_search(limit=get_search_depth(semantic_depth), **tuning):
+                ranked = hybrid_search(
+                    bookables,
+                    message,
+                    query_embedding,
+                    semantic_depth=semantic_depth,
+                    lexical_depth=params.get('lexical_depth'),
+                    exact=exact,
+                )
+            # Load only the bookables of the current page
+            page = paginator.paginate_ranked(ranked)
+            paginated_bookables = hydrate(self.get_listing_queryset(Bookable.objects.all()), [pk for pk, _ in page])
+        
+        else:
+            # Generate embedding for the search query, later pages hit the embedding cache
+            query_embedding = get_embedding(message)
+            
+            # Search for similar bookables using vector distance
+            # Lower distance means higher similarity
+            # The index has to produce enough candidates to get past the cursor,
+            # deeper pages than ef_search may reach are sorted exactly
+            depth = get_search_depth(paginator.limit)
+            if exact or needs_exact_search(depth=depth):
+                depth = None
+            ranked = semantic_search(self.get_listing_queryset(bookables), query_embedding, depth)
+            
+            # The page must be fetched while the recall settings are active
+            with ann_search(limit=depth, **tuning):
+                paginated_bookables = paginator.paginate_queryset(ranked, 'distance')
+            
+            # A short page may only mean the index ran out of candidates
+            if depth is not None and paginator.next_cursor is None and not index_scans_are_complete():
+                ranked = semantic_search(self.get_listing_queryset(bookables), query_embedding)
+                paginated_bookables = paginator.paginate_queryset(ranked, 'distance')
+        
+        return paginated_bookables
+
+    def _search_candidates(self, params, bookables, tuning, exact):
+        """
+        Ids of the top FACETS['SEARCH_DEPTH'] results of the search, the set its facets count
+        """
+        message = params['message']
+        mode = params['mode']
+        depth = settings.FACETS['SEARCH_DEPTH']
+        
+        if mode == 'lexical':
+            return list(lexical_search(bookables, message).values_list('pk', flat=True)[:depth])
+        
+        query_embedding = get_embedding(message)
+        if mode == 'hybrid':
+            semantic_depth = params.get('semantic_depth', settings.HYBRID_SEARCH['SEMANTIC_DEPTH'])
+            with ann_search(limit=get_search_depth(semantic_depth), **tuning):
+                ranked = hybrid_search(
+                    bookables,
+                    message,
+                    query_embedding,
+                    semantic_depth=semantic_depth,
+                    lexical_depth=params.get('lexical_depth'),
+                    exact=exact,
+                )
+                return [pk for pk, _ in ranked][:depth]
+        
+        index_depth = get_search_depth(depth)
+        if exact or needs_exact_search(depth=index_depth):
+            index_depth = None
+        with ann_search(limit=index_depth, **tuning):
+            ids = list(semantic_search(bookables, query_embedding, index_depth).values_list('pk', flat=True)[:depth])
+        if index_depth is not None and len(ids) < depth and not index_scans_are_complete():
+            ids = list(semantic_search(bookables, query_embedding).values_list('pk', flat=True)[:depth])
+        return ids
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Bookable counts per type, destination, star rating and price bucket
+        
+        Read from a materialized view, so counts lag catalog writes until the
+        next refresh. Each facet is counted under the filters of the other
+        facets, so selecting a value does not hide its alternatives.
+        
+        Args:
+            type, destination, min_stars (query params): Optional filters
+            
+        Returns:
+            total, and per facet a list of values with their counts
+        """
+        filter_serializer = FacetFilterSerializer(data=request.query_params)
+        filter_serializer.is_valid(raise_exception=True)
+        return Response(get_facets(**filter_serializer.validated_data))
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Bookables closest to this one, using its stored embedding
+        
+        No embedding provider call is made. The ordered ids are cached per
+        bookable, keyed by its embedding fingerprint and the catalog and
+        listings versions, so they are recomputed once any bookable vector,
+        option or rating changes.
+        
+        Args:
+            type, destination, options, min_rating (query params): Optional filters
+            limit (int, query param): Number of results, 10 by default
+            
+        Returns:
+            List of bookables, most similar first, without the bookable itself
+        """
+        params_serializer = SimilarSerializer(data=request.query_params)
+        params_serializer.is_valid(raise_exception=True)
+        params = dict(params_serializer.validated_data)
+        limit = params.pop('limit')
+        
+        # The filters apply to the results, not to the bookable they are similar to
+        bookable = get_object_or_404(Bookable.objects.only('pk', 'embedding', 'embedding_fingerprint'), pk=pk)
+        if bookable.embedding is None:
+            return Response([])
+        
+        cache_key = 'similar:{}:{}:{}:{}:{}:{}'.format(
+            bookable.pk, bookable.embedding_fingerprint, get_version(CATALOG_VERSION),
+            get_version(LISTINGS_VERSION), get_query_reference(params), limit
+        )
+        ids = cache.get(cache_key)
+        if ids is None:
+            candidates = Bookable.objects.apply_filters(**params).exclude(pk=bookable.pk)
+            depth = get_search_depth(limit)
+            if needs_exact_search(params, depth=depth):
+                depth = None
+            with ann_search(limit=depth):
+                ids = list(
+                    semantic_search(candidates, bookable.embedding, depth)
+                    .values_list('pk', flat=True)[:limit]
+                )
+            # Short from the index, see _search_page
+            if depth is not None and len(ids) < limit and not index_scans_are_complete():
+                ids = list(semantic_search(candidates, bookable.embedding).values_list('pk', flat=True)[:limit])
+            cache.set(cache_key, ids, settings.SIMILAR_BOOKABLES['CACHE_TTL'])
+        
+        # Loading through the filters drops rows that stopped matching since they were cached
+        bookables = hydrate(self.get_listing_queryset(Bookable.objects.all()).apply_filters(**params), ids)
+        serializer = self.get_serializer(bookables, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def reviews(self, request, pk=None):
+        """
+        All reviews of a bookable, newest first
+        
+        Args:
+            cursor (str, query param): 'next' or 'previous' link of another page
+            page_size (int, query param): Reviews per page, 20 by default, at most 100
+            
+        Returns:
+            Cursor paginated list of reviews
+        """
+        if self._response_cache_key:
+            response = self.handle_cached(request)
+            if response is not None:
+                return response
+        
+        get_object_or_404(Bookable.objects.only('pk'), pk=pk)
+        reviews = Review.objects.filter(bookable_id=pk).select_related('user')
+        
+        paginator = ReviewCursorPagination()
+        page = paginator.paginate_queryset(reviews, request, view=self)
+        serializer = ReviewSerializer(page, many=True, context=self.get_serializer_context())
         return paginator.get_paginated_response(serializer.data)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+
+class ReviewViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cached_actions = ('list',)
+    cache_version = LISTINGS_VERSION
     
     def get_queryset(self):
-        queryset = Review.objects.all()
+        # The serializer reads the username of every review
+        queryset = Review.objects.select_related('user')
         
         # Filter by bookable if provided
         bookable_id = self.request.query_params.get('bookable', None)
@@ -98,8 +362,27 @@ class ReviewViewSet(viewsets.ModelViewSet):
         return queryset
     
     def perform_create(self, serializer):
-        # Link the review to the current user
-        serializer.save(user=self.request.user)
+        # Link the review to the current user and count it in the bookable's rating summary
+        with transaction.atomic():
+            review = serializer.save(user=self.request.user)
+            RatingSummary.apply(review.bookable_id, added=review.rating)
+    
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # Lock the review so concurrent updates see each other's rating
+            previous = Review.objects.select_for_update().values('bookable_id', 'rating').get(pk=serializer.instance.pk)
+            review = serializer.save()
+            if review.bookable_id == previous['bookable_id']:
+                RatingSummary.apply(review.bookable_id, added=review.rating, removed=previous['rating'])
+            else:
+                RatingSummary.apply(previous['bookable_id'], removed=previous['rating'])
+                RatingSummary.apply(review.bookable_id, added=review.rating)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            previous = Review.objects.select_for_update().values('bookable_id', 'rating').get(pk=instance.pk)
+            instance.delete()
+            RatingSummary.apply(previous['bookable_id'], removed=previous['rating'])
     
     @action(detail=False, methods=['get'])
     def my_reviews(self, request):
@@ -0,0 +1,32 @@
+from django.contrib import admin
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import Checkpoint, Job
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'content_type', 'object_id', 'status', 'attempts', 'run_after', 'updated_at']
+    list_filter = ['kind', 'status', 'content_type']
+    readonly_fields = ['created_at', 'updated_at', 'locked_at', 'last_error']
+    actions = ['retry_jobs']
+
+    @admin.action(description='Retry selected dead jobs')
+    def retry_jobs(self, request, queryset):
+        retried = 0
+        for job in queryset.filter(status=Job.Status.DEAD):
+            try:
+                with transaction.atomic():
+                    Job.objects.filter(pk=job.pk).update(
+                        status=Job.Status.PENDING, attempts=0, run_after=timezone.now(), locked_at=None
+                    )
+                retried += 1
+            except IntegrityError:
+                # The row already has a pending job of this kind
+                job.delete()
+        self.message_user(request, f'{retried} jobs queued again')
+
+
+@admin.register(Checkpoint)
+class CheckpointAdmin(admin.ModelAdmin):
+    list_display = ['name', 'updated_at']
+    readonly_fields = ['updated_at']
@@ -0,0 +1,46 @@
+import time
+
+from django.core.cache import cache
+
+
+def _key(name):
+    return f"version:{name}"
+
+
+def _initialize(name):
+    # Start from the clock so a version that was evicted and set again
+    # never matches a value some process still holds
+    cache.add(_key(name), int(time.time() * 1000), timeout=None)
+
+
+def get_version(name):
+    """
+    Args:
+        name (str): Name of the versioned data, e.g. 'agents'
+
+    Returns:
+        int: Current version, shared by all processes through the default cache
+    """
+    version = cache.get(_key(name))
+    if version is None:
+        _initialize(name)
+        version = cache.get(_key(name), 0)
+    return version
+
+
+def bump_version(name):
+    """
+    Invalidate everything derived from the named data in every process
+
+    Args:
+        name (str): Name of the versioned data
+
+    Returns:
+        int: The new version
+    """
+    try:
+        return cache.incr(_key(name))
+    except ValueError:
+        # incr only works on existing keys
+        _initialize(name)
+        return cache.incr(_key(name))
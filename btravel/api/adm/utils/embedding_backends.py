@@ -0,0 +1,247 @@
+import hashlib
+import os
+import re
+import threading
+from functools import cached_property
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+# Width of the embedding columns; vectors from smaller models are zero padded,
+# which leaves their distances to each other unchanged
+STORED_DIMENSION = 1536
+# Width of the compact columns holding the leading (Matryoshka) dimensions
+COMPACT_DIMENSION = 256
+
+
+class EmbeddingBackend:
+    """
+    Turns texts into vectors
+
+    Subclasses set ``name`` and implement ``embed``. ``model`` is recorded on
+    every stored vector and is part of its fingerprint, so switching models
+    marks existing rows as stale. ``version`` labels the generation of the
+    stored vectors, the model name unless the config sets a VERSION, e.g.
+    after changing how the embedded text is built.
+    """
+    name = None
+    default_model = None
+    dimension = None
+    # Limits of a single embed() call
+    max_batch_size = 2048
+    max_batch_tokens = None
+    max_input_tokens = None
+    # Whether results are worth keeping in the embedding cache
+    cacheable = True
+
+    def __init__(self, model=None, **options):
+        self.model = model or self.default_model
+        self.version = self.model
+        self.options = options
+
+    def embed(self, texts):
+        """
+        Args:
+            texts (list): Normalized, non-empty texts
+
+        Returns:
+            list: numpy.ndarray vectors of length ``dimension``, in input order
+        """
+        raise NotImplementedError
+
+    def count_tokens(self, text):
+        # Every BPE token covers at least one byte, so this never underestimates
+        return len(text.encode("utf-8"))
+
+    def truncate(self, text):
+        return text
+
+
+class OpenAIBackend(EmbeddingBackend):
+    """OpenAI embeddings API"""
+    name = "openai"
+    default_model = "text-embedding-3-small"
+    dimension = 1536
+    # OpenAI embeddings endpoint limits
+    max_batch_size = 2048
+    max_batch_tokens = 300000
+    max_input_tokens = 8191
+
+    @cached_property
+    def client(self):
+        from openai import OpenAI
+        return OpenAI(api_key=self.options.get("api_key") or os.environ.get("OPENAI_API_KEY"))
+
+    @cached_property
+    def encoding(self):
+        try:
+            import tiktoken
+            return tiktoken.encoding_for_model(self.model)
+        except Exception:
+            # Unknown model or the encoding file cannot be downloaded
+            return None
+
+    def embed(self, texts):
+        response = self.client.embeddings.create(
+            input=[self.truncate(text) for text in texts],
+            model=self.model
+        )
+        # Responses carry the input index, do not rely on their order
+        vectors = [None] * len(texts)
+        for item in response.data:
+            vectors[item.index] = np.array(item.embedding)
+        return vectors
+
+    def count_tokens(self, text):
+        if self.encoding is None:
+            return super().count_tokens(text)
+        return len(self.encoding.encode(text))
+
+    def truncate(self, text):
+        if self.encoding is None:
+            return text[:self.max_input_tokens]
+        tokens = self.encoding.encode(text)
+        if len(tokens) <= self.max_input_tokens:
+            return text
+        return self.encoding.decode(tokens[:self.max_input_tokens])
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """
+    Local model run on CPU with sentence-transformers
+
+    Needs ``pip install sentence-transformers`` (and ``optimum[onnxruntime]``
+    for ``OPTIONS={'onnx': True}``). The model is loaded on first use, once
+    per process. Vectors are normalized, so L2 distance ranks like cosine.
+    """
+    name = "sentence-transformers"
+    default_model = "sentence-transformers/all-MiniLM-L6-v2"
+    max_batch_size = 256
+
+    _lock = threading.Lock()
+
+    @cached_property
+    def encoder(self):
+        try:
+            from sentence_transformers import SentenceTransformer  # optional dependency
+        except ImportError:
+            raise ImproperlyConfigured(
+                "The sentence-transformers embedding backend requires the sentence-transformers package"
+            )
+        kwargs = {"device": self.options.get("device", "cpu")}
+        if self.options.get("onnx"):
+            kwargs["backend"] = "onnx"
+        with self._lock:
+            return SentenceTransformer(self.model, **kwargs)
+
+    @property
+    def dimension(self):
+        # Setting it in OPTIONS avoids loading the model just to record it
+        return self.options.get("dimension") or self.encoder.get_sentence_embedding_dimension()
+
+    def embed(self, texts):
+        vectors = self.encoder.encode(
+            texts,
+            batch_size=self.options.get("batch_size", 32),
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        return list(vectors)
+
+
+class HashingBackend(EmbeddingBackend):
+    """
+    Deterministic feature hashing of word and character trigram counts
+
+    No model and no network: the same text always gives the same vector and
+    texts sharing words end up close together. Meant for tests, benchmarks
+    and offline development, not for real relevance.
+    """
+    name = "hashing"
+    max_batch_size = 10000
+    cacheable = False
+
+    _token_re = re.compile(r"\w+")
+
+    def __init__(self, model=None, **options):
+        self.dimension = int(options.pop("dimension", STORED_DIMENSION))
+        super().__init__(model or f"hashing-{self.dimension}", **options)
+
+    def embed(self, texts):
+        return [self._embed_one(text) for text in texts]
+
+    def _embed_one(self, text):
+        vector = np.zeros(self.dimension)
+        for word in self._token_re.findall(text.lower()):
+            features = [word] + [f"#{word[i:i + 3]}" for i in range(max(len(word) - 2, 1))]
+            for feature in features:
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                # Low bits pick the slot, one high bit the sign, so collisions cancel out on average
+                vector[value % self.dimension] += 1.0 if value >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (OpenAIBackend, SentenceTransformerBackend, HashingBackend)
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Returns:
+        EmbeddingBackend: The backend configured in settings.EMBEDDINGS, shared per process
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = load_backend(settings.EMBEDDINGS)
+    return _backend
+
+
+def load_backend(config):
+    """
+    Args:
+        config (dict): BACKEND (registry name or dotted path), MODEL, OPTIONS and VERSION
+
+    Returns:
+        EmbeddingBackend: A new backend instance
+    """
+    name = config.get("BACKEND", OpenAIBackend.name)
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        try:
+            backend_class = import_string(name)
+        except ImportError:
+            raise ImproperlyConfigured(f"Unknown embedding backend '{name}'")
+
+    backend = backend_class(config.get("MODEL"), **config.get("OPTIONS", {}))
+    backend.version = config.get("VERSION") or backend.model
+    return backend
+
+
+def get_next_backend():
+    """
+    Returns:
+        EmbeddingBackend: A new backend for settings.EMBEDDINGS_NEXT, None when no
+        re-embedding is under way
+    """
+    config = getattr(settings, "EMBEDDINGS_NEXT", None)
+    return load_backend(config) if config else None
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    global _backend
+    if setting == "EMBEDDINGS":
+        _backend = None
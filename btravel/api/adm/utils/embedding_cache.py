@@ -0,0 +1,239 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """
+    Normalize text before it is embedded or used as a cache key
+
+    Args:
+        text (str): Raw text
+
+    Returns:
+        str: NFC normalized text with whitespace runs collapsed to single spaces
+    """
+    text = unicodedata.normalize("NFC", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def text_fingerprint(text, model):
+    """
+    Hash the model name and normalized text
+
+    Args:
+        text (str): Text that is embedded
+        model (str): Embedding model name
+
+    Returns:
+        str: Hex sha256 digest identifying this (model, text) pair
+    """
+    payload = f"{model}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class LRUCache:
+    """Thread safe in-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache
+
+    Lookups hit an in-process LRU first and then the shared Django cache
+    (Redis in production). Vectors are stored in the shared tier as float32
+    bytes. Failures of the shared tier are logged and treated as misses so a
+    Redis outage never breaks embedding generation.
+    """
+
+    def __init__(self):
+        config = settings.EMBEDDING_CACHE
+        self.local = LRUCache(config['LOCAL_MAX_ENTRIES'], config['LOCAL_TTL'])
+        self.shared_alias = config['CACHE_ALIAS']
+        self.shared_ttl = config['SHARED_TTL']
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def get(self, key):
+        """
+        Args:
+            key (str): Fingerprint from text_fingerprint
+
+        Returns:
+            numpy.ndarray or None: The cached vector
+        """
+        vector = self.local.get(key)
+        if vector is not None:
+            self._count('local_hits')
+            return vector
+
+        try:
+            raw = self.shared.get(key)
+        except Exception:
+            logger.warning("Shared embedding cache read failed", exc_info=True)
+            raw = None
+
+        if raw is not None:
+            vector = self._decode(raw)
+            self.local.set(key, vector)
+            self._count('shared_hits')
+            return vector
+
+        self._count('misses')
+        return None
+
+    def get_many(self, keys):
+        """
+        Args:
+            keys (list): Fingerprints from text_fingerprint
+
+        Returns:
+            dict: Mapping of key to cached vector for every key found
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            vector = self.local.get(key)
+            if vector is not None:
+                found[key] = vector
+            else:
+                missing.append(key)
+        self._count('local_hits', len(found))
+
+        if missing:
+            try:
+                raw_values = self.shared.get_many(missing)
+            except Exception:
+                logger.warning("Shared embedding cache read failed", exc_info=True)
+                raw_values = {}
+            for key, raw in raw_values.items():
+                vector = self._decode(raw)
+                self.local.set(key, vector)
+                found[key] = vector
+            self._count('shared_hits', len(raw_values))
+            self._count('misses', len(missing) - len(raw_values))
+
+        return found
+
+    def set(self, key, vector):
+        self.set_many({key: vector})
+
+    def set_many(self, vectors):
+        """
+        Args:
+            vectors (dict): Mapping of fingerprint to vector
+        """
+        encoded = {}
+        for key, vector in vectors.items():
+            vector = self._freeze(vector)
+            self.local.set(key, vector)
+            encoded[key] = vector.astype(np.float32).tobytes()
+
+        try:
+            self.shared.set_many(encoded, timeout=self.shared_ttl)
+        except Exception:
+            logger.warning("Shared embedding cache write failed", exc_info=True)
+
+    def clear(self):
+        self.local.clear()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss counters for this process plus the LRU size
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['lookups'] = lookups
+        stats['hit_rate'] = round((lookups - stats['misses']) / lookups, 4) if lookups else 0.0
+        stats['local_entries'] = len(self.local)
+        stats['local_max_entries'] = self.local.max_entries
+        return stats
+
+    @staticmethod
+    def _decode(raw):
+        return EmbeddingCache._freeze(np.frombuffer(raw, dtype=np.float32))
+
+    @staticmethod
+    def _freeze(vector):
+        # Cached arrays are shared between callers, keep them immutable
+        vector = np.array(vector, dtype=np.float32)
+        vector.flags.writeable = False
+        return vector
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """
+    Returns:
+        EmbeddingCache: The process wide embedding cache
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
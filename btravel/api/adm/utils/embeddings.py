@@ -1,35 +1,161 @@
-import os
+import time
+from collections import deque
+
 import numpy as np
-from openai import OpenAI
 
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+from .embedding_backends import COMPACT_DIMENSION, STORED_DIMENSION, get_backend
+from .embedding_cache import get_embedding_cache, normalize_text, text_fingerprint
+
 
-def get_embedding(text, model="text-embedding-3-small"):
+def get_embedding(text, backend=None):
     """
-    Get OpenAI embedding for the provided text
-    
+    Get the embedding of the provided text from the configured backend
+
+    Results are cached in-process and in the shared cache, keyed by a hash of
+    the model name and normalized text, so repeated texts skip the backend.
+
     Args:
         text (str): The text to embed
-        model (str): The embedding model to use
-        
+        backend (EmbeddingBackend): Backend to use instead of settings.EMBEDDINGS
+
     Returns:
-        numpy.ndarray: The embedding vector
+        numpy.ndarray: The float32 embedding vector, zero padded to STORED_DIMENSION
     """
     if not text:
         # Return zero vector if text is empty
-        return np.zeros(1536)
-        
-    # Clean and prepare text
-    text = text.replace("\n", " ")
-    
-    # Get embeddings from OpenAI
-    response = client.embeddings.create(
-        input=text,
-        model=model
-    )
-    
-    # Extract embedding and convert to numpy array
-    embedding_vector = response.data[0].embedding
-    
-    return np.array(embedding_vector)
+        return np.zeros(STORED_DIMENSION, dtype=np.float32)
 
+    return get_embeddings([text], backend=backend)[0]
+
+def get_embeddings(texts, backend=None, batch_size=None, limiter=None):
+    """
+    Get embeddings for many texts with as few backend calls as possible
+
+    Cached texts and duplicates are only fetched once. The remaining texts
+    are sent in calls of at most batch_size inputs and the backend's token
+    budget; single inputs longer than the backend accepts are truncated.
+
+    Args:
+        texts (list): The texts to embed
+        backend (EmbeddingBackend): Backend to use instead of settings.EMBEDDINGS
+        batch_size (int): Maximum number of inputs per backend call
+        limiter (RateLimiter): Paces the backend calls, cached texts cost nothing
+
+    Returns:
+        list: numpy.ndarray embedding vectors, in the same order as texts
+    """
+    backend = backend or get_backend()
+    batch_size = max(1, min(batch_size or backend.max_batch_size, backend.max_batch_size))
+    cache = get_embedding_cache()
+
+    normalized = [normalize_text(text) if text else "" for text in texts]
+    keys = [text_fingerprint(text, backend.model) if text else None for text in normalized]
+
+    vectors = cache.get_many([key for key in set(keys) if key]) if backend.cacheable else {}
+    pending = {}
+    for key, text in zip(keys, normalized):
+        if key and key not in vectors:
+            pending[key] = text
+
+    for batch in _token_batches(list(pending.items()), backend, batch_size):
+        if limiter is not None:
+            limiter.wait(sum(backend.count_tokens(text) for _, text in batch))
+        embedded = backend.embed([text for _, text in batch])
+        fetched = {
+            key: _pad(vector)
+            for (key, _), vector in zip(batch, embedded)
+        }
+        if backend.cacheable:
+            cache.set_many(fetched)
+        vectors.update(fetched)
+
+    return [vectors[key] if key else np.zeros(STORED_DIMENSION, dtype=np.float32) for key in keys]
+
+class RateLimiter:
+    """
+    Spaces out backend calls to stay within per minute request and token limits
+
+    Keeps the calls of the last minute; a call waits until it fits next to
+    them. A single call over the token limit goes through on an idle minute.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, clock=time.monotonic, sleep=time.sleep):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.clock = clock
+        self.sleep = sleep
+        self._calls = deque()
+        self._tokens = 0
+
+    def wait(self, tokens=0):
+        """
+        Block until a call of this many tokens is within the limits, then count it
+        """
+        while True:
+            now = self.clock()
+            while self._calls and self._calls[0][0] <= now - 60:
+                self._tokens -= self._calls.popleft()[1]
+            if not self._calls or (
+                (self.requests_per_minute is None or len(self._calls) < self.requests_per_minute)
+                and (self.tokens_per_minute is None or self._tokens + tokens <= self.tokens_per_minute)
+            ):
+                self._calls.append((now, tokens))
+                self._tokens += tokens
+                return
+            self.sleep(self._calls[0][0] + 60 - now)
+
+def compact_embedding(vector, dimension=COMPACT_DIMENSION):
+    """
+    Shorten an embedding to its leading dimensions
+
+    Matryoshka trained models such as text-embedding-3 put most of the
+    information in the first dimensions, so the renormalized prefix ranks
+    nearly like the full vector. For other models the loss is larger, see the
+    vector_recall_report command.
+
+    Args:
+        vector: Full embedding
+        dimension (int): Number of leading dimensions to keep
+
+    Returns:
+        numpy.ndarray: float32 vector of length dimension with unit norm
+    """
+    compact = np.array(vector[:dimension], dtype=np.float32)
+    norm = np.linalg.norm(compact)
+    return compact / norm if norm else compact
+
+def _pad(vector):
+    """
+    Zero pad a vector to the width of the embedding columns
+    """
+    # float32 is what pgvector stores, converting once here avoids a copy per save
+    vector = np.asarray(vector, dtype=np.float32)
+    if len(vector) > STORED_DIMENSION:
+        raise ValueError(f"Embedding has {len(vector)} dimensions, embedding columns hold {STORED_DIMENSION}")
+    if len(vector) < STORED_DIMENSION:
+        vector = np.pad(vector, (0, STORED_DIMENSION - len(vector)))
+    return vector
+
+def _token_batches(items, backend, batch_size):
+    """
+    Split (key, text) pairs into call sized batches
+    """
+    batch = []
+    batch_tokens = 0
+    for key, text in items:
+        tokens = 0
+        if backend.max_batch_tokens:
+            tokens = backend.count_tokens(text)
+            if backend.max_input_tokens:
+                tokens = min(tokens, backend.max_input_tokens)
+        if batch and (
+            len(batch) >= batch_size
+            or (backend.max_batch_tokens and batch_tokens + tokens > backend.max_batch_tokens)
+        ):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append((key, text))
+        batch_tokens += tokens
+    if batch:
+        yield batch
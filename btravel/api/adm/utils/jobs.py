@@ -0,0 +1,160 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+from .signals import embedding_updated
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def register(kind):
+    """
+    Register the function that processes jobs of a kind
+
+    The handler receives the Job and must be idempotent, a job can run more
+    than once if its worker dies after doing the work.
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def claim_jobs(batch_size):
+    """
+    Lock and mark a batch of due jobs as running
+
+    Jobs locked by another worker are skipped, running jobs whose lease has
+    expired are picked up again.
+
+    Args:
+        batch_size (int): Maximum number of jobs to claim
+
+    Returns:
+        list: Claimed Job instances
+    """
+    config = settings.JOB_QUEUE
+    now = timezone.now()
+    lease_expired = now - timedelta(seconds=config['LEASE_TIMEOUT'])
+
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=Job.Status.PENDING, run_after__lte=now)
+                | Q(status=Job.Status.RUNNING, locked_at__lt=lease_expired)
+            )
+            .order_by('run_after')[:batch_size]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.Status.RUNNING,
+                locked_at=now,
+                attempts=F('attempts') + 1,
+                updated_at=now,
+            )
+            for job in jobs:
+                job.status = Job.Status.RUNNING
+                job.locked_at = now
+                job.attempts += 1
+
+    return jobs
+
+
+def get_backoff(attempts):
+    """
+    Args:
+        attempts (int): Number of attempts made so far
+
+    Returns:
+        float: Seconds to wait before the next attempt, with jitter
+    """
+    config = settings.JOB_QUEUE
+    delay = min(config['BACKOFF_BASE'] * 2 ** (attempts - 1), config['BACKOFF_MAX'])
+    return delay * random.uniform(0.8, 1.2)
+
+
+def complete_job(job):
+    Job.objects.filter(pk=job.pk).delete()
+
+
+def fail_job(job, error):
+    """
+    Schedule a retry with exponential backoff, or dead-letter the job
+
+    Args:
+        job: The failed Job
+        error (str): Error description kept on the row
+    """
+    now = timezone.now()
+
+    if job.attempts >= settings.JOB_QUEUE['MAX_ATTEMPTS']:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.DEAD, locked_at=None, last_error=error, updated_at=now
+        )
+        logger.error("Job %s is dead after %s attempts", job.pk, job.attempts)
+        return
+
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.Status.PENDING,
+                locked_at=None,
+                last_error=error,
+                run_after=now + timedelta(seconds=get_backoff(job.attempts)),
+                updated_at=now,
+            )
+    except IntegrityError:
+        # A newer job for the same row was queued meanwhile and supersedes this one
+        complete_job(job)
+
+
+def run_job(job):
+    """
+    Process a claimed job and record the outcome
+
+    Args:
+        job: A Job returned by claim_jobs
+
+    Returns:
+        bool: True if the job succeeded
+    """
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{job.kind}'")
+        handler(job)
+    except Exception:
+        logger.warning("Job %s failed (attempt %s)", job.pk, job.attempts, exc_info=True)
+        fail_job(job, traceback.format_exc())
+        return False
+
+    complete_job(job)
+    return True
+
+
+@register(Job.Kind.EMBEDDING)
+def process_embedding_job(job):
+    obj = job.get_object()
+    if obj is None or not obj.refresh_embedding():
+        return
+
+    manager = type(obj)._default_manager
+    with transaction.atomic():
+        # The provider call ran without a lock. If the content changed since, that save
+        # queued another job, which may already have written the newer vector.
+        current = manager.select_for_update().filter(pk=obj.pk).first()
+        if current is None or current.get_embedding_fingerprint() != obj.embedding_fingerprint:
+            return
+        # Only write the embedding columns so concurrent edits to other fields are kept
+        manager.filter(pk=obj.pk).update(**{field: getattr(obj, field) for field in obj.EMBEDDING_FIELDS})
+    embedding_updated.send(sender=type(obj), instance=obj)
@@ -0,0 +1,113 @@
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from utils.embedding_backends import get_backend, get_next_backend
+from utils.embeddings import RateLimiter
+from utils.models import Checkpoint, EmbeddedModel
+from utils.reembedding import get_checkpoint_name, get_embedded_models, reembed
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the next embedding version (settings.EMBEDDINGS_NEXT) in the shadow columns of every '
+        'embedded model while search keeps using the current one. Only missing or stale rows reach the '
+        'provider and an interrupted run resumes where it stopped. --activate finishes the pass and swaps '
+        'the new vectors in; run it from a release whose EMBEDDINGS already is the next version.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', help='Comma separated model labels, e.g. travel.Bookable (default all)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows read, embedded and written per round')
+        parser.add_argument('--requests-per-minute', type=int, default=None,
+                            help='Most provider calls per minute (default unlimited)')
+        parser.add_argument('--tokens-per-minute', type=int, default=None,
+                            help='Most input tokens sent per minute (default unlimited)')
+        parser.add_argument('--restart', action='store_true', help='Ignore saved checkpoints')
+        parser.add_argument('--activate', action='store_true',
+                            help='After the pass, replace the searched vectors with the new ones in one transaction')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Re-embed stale rows directly with settings.EMBEDDINGS; search sees both '
+                                 'versions until the run ends')
+
+    def handle(self, *args, **options):
+        models = self.get_models(options['models'])
+
+        if options['in_place']:
+            if options['activate']:
+                raise CommandError('--activate only applies to a next version built in the shadow columns')
+            backend, shadow = get_backend(), False
+        else:
+            backend, shadow = get_next_backend(), True
+            if backend is None:
+                raise CommandError('Configure settings.EMBEDDINGS_NEXT (EMBEDDING_NEXT_BACKEND) or use --in-place')
+            # Queries and saves embed with EMBEDDINGS, after the swap it has to be the next version
+            if options['activate'] and get_backend().version != backend.version:
+                raise CommandError(
+                    f'EMBEDDINGS is version {get_backend().version}, not {backend.version}. Deploy the '
+                    'EMBEDDINGS_NEXT config as EMBEDDINGS, keep EMBEDDINGS_NEXT set and run --activate again'
+                )
+
+        limiter = None
+        if options['requests_per_minute'] or options['tokens_per_minute']:
+            limiter = RateLimiter(options['requests_per_minute'], options['tokens_per_minute'])
+
+        for model in models:
+            name = get_checkpoint_name(model, backend, shadow)
+            if options['restart']:
+                Checkpoint.clear(name)
+            state = Checkpoint.load(name)
+            if state:
+                self.stdout.write(f"{model._meta.label}: resuming after id {state['last_pk']}")
+            resumed = state['totals']['checked'] if state else 0
+            self.run_pass(model, backend, shadow, options['batch_size'], limiter, resumed)
+
+        if options['activate']:
+            self.activate(models, backend)
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedding version {backend.version} is complete"
+            + ('' if not shadow else ', run with --activate to switch search over')
+        ))
+
+    def get_models(self, labels):
+        if not labels:
+            return get_embedded_models()
+        models = []
+        for label in labels.split(','):
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError):
+                raise CommandError(f'Unknown model {label}')
+            if not issubclass(model, EmbeddedModel):
+                raise CommandError(f'{label} stores no embedding')
+            models.append(model)
+        return models
+
+    def run_pass(self, model, backend, shadow, batch_size, limiter, resumed):
+        started = time.monotonic()
+        for totals in reembed(model, backend, shadow=shadow, batch_size=batch_size, limiter=limiter):
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{model._meta.label}: {totals['checked']} rows checked, {totals['embedded']} embedded, "
+                f"{(totals['checked'] - resumed) / elapsed if elapsed else 0:.0f} rows/s"
+            )
+
+    def activate(self, models, backend):
+        # One transaction for all models, search and routing switch at the same moment
+        swapped = 0
+        with transaction.atomic():
+            for model in models:
+                missing = model._default_manager.filter(embedding_next__isnull=True).count()
+                if missing:
+                    raise CommandError(
+                        f'{missing} {model._meta.label} rows were added during the pass, run --activate again'
+                    )
+                swapped += model._default_manager.activate_next(backend)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Activated embedding version {backend.version} for {swapped} rows, EMBEDDINGS_NEXT can be unset'
+        ))
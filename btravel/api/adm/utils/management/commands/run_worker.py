@@ -0,0 +1,49 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from utils.jobs import claim_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process background jobs (embedding generation) from the job table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.JOB_QUEUE['BATCH_SIZE'],
+                            help='Number of jobs claimed per round')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when no due jobs are left instead of polling')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        poll_interval = settings.JOB_QUEUE['POLL_INTERVAL']
+        processed = failed = 0
+
+        self.stdout.write('Worker started')
+        while not self.stopping:
+            close_old_connections()
+            jobs = claim_jobs(options['batch_size'])
+
+            if not jobs:
+                if options['once']:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            for job in jobs:
+                if run_job(job):
+                    processed += 1
+                else:
+                    failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Worker stopped, {processed} jobs done, {failed} failed'))
+
+    def stop(self, signum, frame):
+        # Finish the current batch, claimed jobs would otherwise wait for their lease to expire
+        self.stopping = True
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('embedding', 'Embedding'), ('image_renditions', 'Image Renditions')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,354 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from pgvector.django import VectorField
+
+from .embedding_backends import STORED_DIMENSION, get_backend
+from .embedding_cache import text_fingerprint
+from .embeddings import compact_embedding, get_embedding, get_embeddings
+from .signals import embedding_updated
+
+
+class EmbeddedManager(models.Manager):
+    """
+    Bulk write paths that embed many rows with batched provider calls
+    """
+
+    def embed_many(self, objs, force=False, backend=None, limiter=None):
+        """
+        Set embedding and fingerprint on every stale instance
+
+        Args:
+            objs (list): Model instances
+            force (bool): Regenerate even where the fingerprint matches
+            backend (EmbeddingBackend): Backend to use instead of settings.EMBEDDINGS
+            limiter (RateLimiter): Paces the provider calls
+
+        Returns:
+            list: The instances that received a new embedding
+        """
+        backend = backend or get_backend()
+        stale = []
+        for obj in objs:
+            text = obj.get_embedding_text()
+            fingerprint = text_fingerprint(text, backend.model)
+            if force or obj.embedding is None or fingerprint != obj.embedding_fingerprint:
+                stale.append((obj, text, fingerprint))
+
+        vectors = get_embeddings([text for _, text, _ in stale], backend=backend, limiter=limiter)
+        for (obj, _, fingerprint), vector in zip(stale, vectors):
+            obj.set_embedding(vector, fingerprint, backend)
+        return [obj for obj, _, _ in stale]
+
+    def embed_next(self, objs, backend, limiter=None):
+        """
+        Set the shadow embedding of every instance whose shadow is missing or stale
+
+        Args:
+            objs (list): Model instances
+            backend (EmbeddingBackend): Backend of the next version
+            limiter (RateLimiter): Paces the provider calls
+
+        Returns:
+            list: The instances that received a new shadow embedding
+        """
+        stale = []
+        for obj in objs:
+            text = obj.get_embedding_text()
+            fingerprint = text_fingerprint(text, backend.model)
+            if obj.embedding_next is None or fingerprint != obj.embedding_next_fingerprint:
+                stale.append((obj, text, fingerprint))
+
+        vectors = get_embeddings([text for _, text, _ in stale], backend=backend, limiter=limiter)
+        for (obj, _, fingerprint), vector in zip(stale, vectors):
+            obj.set_next_embedding(vector, fingerprint)
+        return [obj for obj, _, _ in stale]
+
+    def activate_next(self, backend):
+        """
+        Replace the live embeddings with the shadow ones in a single UPDATE
+
+        Readers keep seeing the previous vectors until the transaction commits.
+        Rows without a shadow embedding are left alone.
+
+        Args:
+            backend (EmbeddingBackend): Backend the shadow embeddings came from
+
+        Returns:
+            int: Number of rows swapped
+        """
+        shadow_fields = self.model.SHADOW_FIELDS
+        updated = self.filter(embedding_next__isnull=False).update(
+            **{field: models.F(shadow) for field, shadow in shadow_fields.items()},
+            embedding_model=backend.model,
+            embedding_dimension=backend.dimension,
+            embedding_version=backend.version,
+            **{
+                shadow: None if self.model._meta.get_field(shadow).null else ''
+                for shadow in shadow_fields.values()
+            },
+        )
+        if updated:
+            embedding_updated.send(sender=self.model, instance=None)
+        return updated
+
+    def bulk_create_with_embeddings(self, objs, batch_size=500, **kwargs):
+        """
+        bulk_create that embeds each chunk of rows in one provider call
+
+        Args:
+            objs (list): Unsaved model instances
+            batch_size (int): Rows embedded and inserted per round
+
+        Returns:
+            list: The created instances
+        """
+        objs = list(objs)
+        created = []
+        for start in range(0, len(objs), batch_size):
+            chunk = objs[start:start + batch_size]
+            self.embed_many(chunk)
+            created.extend(self.bulk_create(chunk, batch_size=batch_size, **kwargs))
+        if created:
+            embedding_updated.send(sender=self.model, instance=None)
+        return created
+
+    def bulk_update_with_embeddings(self, objs, fields, batch_size=500):
+        """
+        bulk_update that re-embeds only the rows whose embedded content changed
+
+        Args:
+            objs (list): Saved model instances
+            fields (list): Fields to update besides the embedding columns
+            batch_size (int): Rows embedded and updated per round
+
+        Returns:
+            int: Number of rows updated
+        """
+        objs = list(objs)
+        fields = list(fields) + self.model.EMBEDDING_FIELDS
+        updated = 0
+        for start in range(0, len(objs), batch_size):
+            chunk = objs[start:start + batch_size]
+            self.embed_many(chunk)
+            updated += self.bulk_update(chunk, fields, batch_size=batch_size)
+        if updated:
+            embedding_updated.send(sender=self.model, instance=None)
+        return updated
+
+
+class EmbeddedModel(models.Model):
+    """
+    Base for models that store an embedding of some of their own content
+
+    Subclasses define an ``embedding`` VectorField and implement
+    ``get_embedding_text``. The embedding is regenerated on save only when
+    the fingerprint of that text and the model name has changed, so saves
+    that do not touch the embedded content make no provider call.
+
+    With ``EMBEDDING_ASYNC`` enabled, save only enqueues a Job and the
+    ``run_worker`` command fills in the embedding later. Until then the row
+    keeps, and is searchable by, its previous embedding.
+
+    The model, native dimension and version of the backend that produced the
+    vector are stored next to it; vectors are zero padded to the column width.
+    Subclasses that add 'embedding_compact' to EMBEDDING_FIELDS also get
+    the compact_embedding() of every vector stored in that column.
+
+    The shadow columns in SHADOW_FIELDS hold the next embedding version while
+    the ``reembed`` command builds it. Nothing searches them; activation
+    copies them over the live columns.
+    """
+    EMBEDDING_FIELDS = [
+        'embedding', 'embedding_fingerprint', 'embedding_model', 'embedding_dimension', 'embedding_version',
+    ]
+    # Live column to the shadow column holding its next version
+    SHADOW_FIELDS = {'embedding': 'embedding_next', 'embedding_fingerprint': 'embedding_next_fingerprint'}
+
+    embedding_fingerprint = models.CharField(max_length=64, blank=True, default='', editable=False)
+    embedding_model = models.CharField(max_length=100, blank=True, default='', editable=False)
+    embedding_dimension = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
+    # Database defaults too, for rows inserted with SQL (see travel.importer)
+    embedding_version = models.CharField(max_length=100, blank=True, default='', db_default='', editable=False)
+    embedding_next = VectorField(dimensions=STORED_DIMENSION, blank=True, null=True, editable=False)
+    embedding_next_fingerprint = models.CharField(
+        max_length=64, blank=True, default='', db_default='', editable=False
+    )
+
+    objects = EmbeddedManager()
+
+    class Meta:
+        abstract = True
+
+    def get_embedding_text(self):
+        """
+        Returns:
+            str: The exact text that is embedded for this row
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def get_embedding_queryset(cls):
+        """
+        Returns:
+            QuerySet: All rows, loading what get_embedding_text reads
+        """
+        return cls._default_manager.all()
+
+    def get_embedding_fingerprint(self):
+        return text_fingerprint(self.get_embedding_text(), get_backend().model)
+
+    def set_embedding(self, vector, fingerprint, backend):
+        self.embedding = vector
+        self.embedding_fingerprint = fingerprint
+        self.embedding_model = backend.model
+        self.embedding_dimension = backend.dimension
+        self.embedding_version = backend.version
+        if 'embedding_compact' in self.EMBEDDING_FIELDS:
+            self.embedding_compact = compact_embedding(vector)
+
+    def set_next_embedding(self, vector, fingerprint):
+        self.embedding_next = vector
+        self.embedding_next_fingerprint = fingerprint
+        if 'embedding_compact' in self.SHADOW_FIELDS:
+            setattr(self, self.SHADOW_FIELDS['embedding_compact'], compact_embedding(vector))
+
+    def embedding_is_stale(self):
+        return self.embedding is None or self.embedding_fingerprint != self.get_embedding_fingerprint()
+
+    def refresh_embedding(self, force=False):
+        """
+        Regenerate the embedding if the embedded content changed
+
+        Args:
+            force (bool): Regenerate even if the fingerprint matches
+
+        Returns:
+            bool: True if a new embedding was generated
+        """
+        fingerprint = self.get_embedding_fingerprint()
+        if not force and self.embedding is not None and fingerprint == self.embedding_fingerprint:
+            return False
+
+        backend = get_backend()
+        self.set_embedding(get_embedding(self.get_embedding_text(), backend=backend), fingerprint, backend)
+        return True
+
+    def save(self, *args, **kwargs):
+        if settings.EMBEDDING_ASYNC:
+            stale = self.embedding_is_stale()
+            super().save(*args, **kwargs)
+            if stale:
+                Job.enqueue(Job.Kind.EMBEDDING, self)
+            return
+
+        refreshed = self.refresh_embedding()
+        if refreshed:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.EMBEDDING_FIELDS)
+        super().save(*args, **kwargs)
+        if refreshed:
+            embedding_updated.send(sender=type(self), instance=self)
+
+
+class Job(models.Model):
+    """
+    Background job stored in Postgres
+
+    Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any number
+    of ``run_worker`` processes can share the table. Finished jobs are
+    deleted; jobs that keep failing end up in the DEAD state for inspection.
+    """
+    class Kind(models.TextChoices):
+        EMBEDDING = 'embedding'
+        IMAGE_RENDITIONS = 'image_renditions'
+        FACETS_REFRESH = 'facets_refresh'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        RUNNING = 'running'
+        DEAD = 'dead'
+
+    kind = models.CharField(max_length=50, choices=Kind.choices)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_after'], condition=Q(status='pending'), name='job_pending_run_after_idx'),
+        ]
+        constraints = [
+            # A row only ever needs one queued job of a kind, the worker reads its latest state
+            models.UniqueConstraint(
+                fields=['kind', 'content_type', 'object_id'],
+                condition=Q(status='pending'),
+                name='job_unique_pending',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job for {self.content_type.model} {self.object_id} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, kind, obj):
+        """
+        Queue a job for obj unless one is already pending
+
+        Args:
+            kind (str): Job.Kind value
+            obj: Model instance the job operates on
+        """
+        cls.objects.bulk_create(
+            [cls(kind=kind, content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk)],
+            ignore_conflicts=True,
+        )
+
+    def get_object(self):
+        """
+        Returns:
+            Model instance the job operates on, or None if it was deleted
+        """
+        model = self.content_type.model_class()
+        return model._default_manager.filter(pk=self.object_id).first()
+
+
+class Checkpoint(models.Model):
+    """
+    Progress of a long running batch command, saved so it can resume after an interruption
+
+    Commands write their position in the same transaction as the batch it
+    covers, so a resumed run neither skips nor repeats work.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    state = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def load(cls, name):
+        """
+        Returns:
+            dict: The saved state, empty if the command has not saved one
+        """
+        checkpoint = cls.objects.filter(name=name).first()
+        return checkpoint.state if checkpoint else {}
+
+    @classmethod
+    def save_state(cls, name, state):
+        cls.objects.update_or_create(name=name, defaults={'state': state})
+
+    @classmethod
+    def clear(cls, name):
+        cls.objects.filter(name=name).delete()
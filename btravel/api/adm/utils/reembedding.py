@@ -0,0 +1,75 @@
+from django.apps import apps
+from django.db import transaction
+
+from .models import Checkpoint, EmbeddedModel
+from .signals import embedding_updated
+
+
+def get_embedded_models():
+    """
+    Returns:
+        list: Every installed model storing an embedding, by label
+    """
+    return sorted(
+        (model for model in apps.get_models() if issubclass(model, EmbeddedModel)),
+        key=lambda model: model._meta.label,
+    )
+
+
+def get_checkpoint_name(model, backend, shadow):
+    target = 'next' if shadow else 'live'
+    return f'reembed:{model._meta.label}:{target}:{backend.version}'
+
+
+def reembed(model, backend, shadow=True, batch_size=500, limiter=None):
+    """
+    Embed every row of model whose embedding is missing or stale, in primary key order
+
+    Rows are read in keyset batches and only stale ones reach the provider.
+    Each batch is written together with a checkpoint, so an interrupted
+    pass resumes after its last committed batch. A finished pass removes
+    its checkpoint.
+
+    Args:
+        model: EmbeddedModel subclass
+        backend (EmbeddingBackend): Backend whose vectors are wanted
+        shadow (bool): Fill the shadow columns, leaving the searched ones
+            alone; otherwise rows are re-embedded in place
+        batch_size (int): Rows read, embedded and written per round
+        limiter (RateLimiter): Paces the provider calls
+
+    Yields:
+        dict: Running totals, rows 'checked' and rows 'embedded'
+    """
+    name = get_checkpoint_name(model, backend, shadow)
+    state = Checkpoint.load(name)
+    last_pk = state.get('last_pk', 0)
+    totals = state.get('totals') or {'checked': 0, 'embedded': 0}
+    queryset = model.get_embedding_queryset().order_by('pk')
+    manager = model._default_manager
+
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+
+        # Provider calls happen before the transaction, it only holds the writes
+        if shadow:
+            embedded = manager.embed_next(batch, backend, limiter=limiter)
+            fields = list(model.SHADOW_FIELDS.values())
+        else:
+            embedded = manager.embed_many(batch, backend=backend, limiter=limiter)
+            fields = model.EMBEDDING_FIELDS
+        last_pk = batch[-1].pk
+        totals['checked'] += len(batch)
+        totals['embedded'] += len(embedded)
+
+        with transaction.atomic():
+            if embedded:
+                manager.bulk_update(embedded, fields)
+                if not shadow:
+                    embedding_updated.send(sender=model, instance=None)
+            Checkpoint.save_state(name, {'last_pk': last_pk, 'totals': totals})
+        yield totals
+
+    Checkpoint.clear(name)
@@ -0,0 +1,52 @@
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack  # optional dependency
+except ImportError:
+    msgpack = None
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # Types orjson does not handle natively (Decimal, lazy strings, querysets...)
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    JSON renderer backed by orjson
+
+    Produces compact UTF-8 JSON like DRF's JSONRenderer with compact output,
+    several times faster on large pages. numpy arrays are serialized natively.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_default, option=self.options)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack renderer, selected with ``Accept: application/msgpack``
+
+    Only listed in the renderer classes when the msgpack package is installed.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
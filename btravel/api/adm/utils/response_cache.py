@@ -0,0 +1,105 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers, quote_etag
+from django.utils.http import parse_etags
+from rest_framework.renderers import BrowsableAPIRenderer
+
+from .cache_versions import get_version
+
+
+class CachedResponseMixin:
+    """
+    Cache rendered responses of read actions and answer conditional requests
+
+    Rendered bodies of ``cached_actions`` are stored in the default cache,
+    keyed by the version named in ``cache_version``, the path, the sorted
+    query parameters and the media type, so responses vary on Accept.
+    Bumping that version (see utils.cache_versions) drops every cached page
+    at once. RESPONSE_CACHE['TTL'] is 0 unless the default cache is shared
+    by all processes, the versions would diverge otherwise.
+
+    Every 200 response of those actions carries a strong ETag, the hash of
+    its body, and a matching If-None-Match gets a bodiless 304.
+
+    list and retrieve are answered from the cache here; extra actions named
+    in ``cached_actions`` have to return handle_cached() themselves on a hit.
+    """
+    cached_actions = ('list', 'retrieve')
+    cache_version = None
+
+    def get_response_cache_key(self, request):
+        query = urlencode(sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        ))
+        payload = f"{request.path}?{query}|{request.accepted_media_type}"
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+        return f"response:{self.cache_version}:{get_version(self.cache_version)}:{digest}"
+
+    def is_response_cacheable(self, request):
+        # The browsable API embeds the user and a CSRF token in its pages
+        return (
+            request.method == 'GET'
+            and self.action in self.cached_actions
+            and not isinstance(request.accepted_renderer, BrowsableAPIRenderer)
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._response_cache_key = None
+        if self.is_response_cacheable(request):
+            self._response_cache_key = self.get_response_cache_key(request)
+
+    def handle_cached(self, request):
+        """
+        Returns:
+            HttpResponse: The cached response, a 304 for a matching ETag, or None on a miss
+        """
+        entry = cache.get(self._response_cache_key)
+        if entry is None:
+            return None
+        content, content_type, etag = entry
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if self._response_cache_key:
+            response = self.handle_cached(request)
+            if response is not None:
+                return response
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if self._response_cache_key:
+            response = self.handle_cached(request)
+            if response is not None:
+                return response
+        return super().retrieve(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, '_response_cache_key', None)
+        if key:
+            patch_vary_headers(response, ['Accept'])
+        if not key or response.status_code != 200 or response.has_header('ETag'):
+            return response
+
+        # Render now to hash the body; rendering again later is a no-op
+        response.render()
+        etag = quote_etag(hashlib.sha256(response.content).hexdigest())
+        cache.set(key, (response.content, response['Content-Type'], etag), settings.RESPONSE_CACHE['TTL'])
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+            patch_vary_headers(response, ['Accept'])
+        response['ETag'] = etag
+        return response
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent after new embeddings were written, by save, the bulk manager methods
+# and the background worker (whose queryset update skips post_save).
+# Arguments: sender (model class), instance (None for bulk writes)
+embedding_updated = Signal()
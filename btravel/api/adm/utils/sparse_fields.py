@@ -0,0 +1,56 @@
+from rest_framework.exceptions import ValidationError
+
+
+def parse_field_list(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for ``?fields=`` and ``?omit=``
+
+    ``?fields=id,title`` keeps only the listed fields, ``?omit=options``
+    drops fields; both take comma separated names. Only applies to the
+    serializer the view builds with the request in its context, nested
+    serializers and those created with ``nested`` in the context keep
+    all their fields.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        # Input serializers need all their fields to validate
+        if request is None or self.context.get('nested') or kwargs.get('data') is not None:
+            return
+
+        available = set(self.fields)
+        keep = available
+        for param in ('fields', 'omit'):
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            names = parse_field_list(value)
+            unknown = names - available
+            if unknown:
+                raise ValidationError({param: [f"Unknown field: {name}" for name in sorted(unknown)]})
+            keep = keep & names if param == 'fields' else keep - names
+
+        for name in available - keep:
+            self.fields.pop(name)
+
+    @classmethod
+    def get_model_columns(cls, serializer):
+        """
+        Args:
+            serializer: Instance of this serializer with its fields already trimmed
+
+        Returns:
+            list: Concrete model fields the remaining serializer fields read, for QuerySet.only()
+        """
+        model = serializer.Meta.model
+        concrete = {field.name for field in model._meta.concrete_fields}
+        columns = {model._meta.pk.name}
+        for field in serializer.fields.values():
+            if field.source in concrete:
+                columns.add(field.source)
+        return sorted(columns)
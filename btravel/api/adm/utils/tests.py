@@ -0,0 +1,395 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from unittest.mock import patch, MagicMock
+import numpy as np
+
+from travel.models import Destination, Bookable
+from .models import Checkpoint, Job
+from .jobs import claim_jobs, run_job
+from .embedding_cache import EmbeddingCache, LRUCache
+from .embeddings import RateLimiter, get_embedding, get_embeddings
+from .embedding_backends import OpenAIBackend, get_backend, get_next_backend
+from .reembedding import reembed
+from .vector_search import ann_search, get_ann_params
+import io
+
+
+@override_settings(EMBEDDING_ASYNC=True)
+class EmbeddingJobTests(TestCase):
+
+    def setUp(self):
+        self.destination = Destination.objects.create(name="Rome, Italy")
+
+    def create_bookable(self):
+        return Bookable.objects.create(
+            title="Historic Tour 1",
+            destination=self.destination,
+            type=Bookable.BookableType.TOUR,
+            options={"duration": "3 hours"}
+        )
+
+    @patch('utils.models.get_embedding')
+    def test_save_enqueues_job_without_provider_call(self, mock_get_embedding):
+        bookable = self.create_bookable()
+        bookable.title = "Historic Tour 2"
+        bookable.save()
+
+        mock_get_embedding.assert_not_called()
+        self.assertIsNone(Bookable.objects.get(pk=bookable.pk).embedding)
+        # Both saves share a single pending job
+        self.assertEqual(Job.objects.filter(status=Job.Status.PENDING).count(), 1)
+
+    @patch('utils.models.get_embedding', return_value=np.ones(1536))
+    def test_worker_fills_embedding(self, mock_get_embedding):
+        bookable = self.create_bookable()
+
+        jobs = claim_jobs(10)
+        self.assertEqual(len(jobs), 1)
+        self.assertTrue(run_job(jobs[0]))
+
+        bookable.refresh_from_db()
+        self.assertIsNotNone(bookable.embedding)
+        self.assertEqual(bookable.embedding_fingerprint, bookable.get_embedding_fingerprint())
+        self.assertFalse(Job.objects.exists())
+
+    def test_older_job_does_not_overwrite_a_newer_vector(self):
+        bookable = self.create_bookable()
+        job = claim_jobs(10)[0]
+
+        def edit_meanwhile(text, backend=None):
+            # The row is edited and its newer job finishes while this job waits on the provider
+            if text.startswith("Title: Historic Tour 1."):
+                Bookable.objects.filter(pk=bookable.pk).update(title="Historic Tour 2")
+                newer = Bookable.objects.get(pk=bookable.pk)
+                newer.refresh_embedding()
+                Bookable.objects.filter(pk=bookable.pk).update(
+                    **{field: getattr(newer, field) for field in newer.EMBEDDING_FIELDS}
+                )
+                return np.zeros(1536)
+            return np.ones(1536)
+
+        with patch('utils.models.get_embedding', side_effect=edit_meanwhile):
+            self.assertTrue(run_job(job))
+
+        bookable.refresh_from_db()
+        np.testing.assert_array_equal(bookable.embedding, np.ones(1536))
+        self.assertFalse(bookable.embedding_is_stale())
+
+    @override_settings(JOB_QUEUE={
+        'MAX_ATTEMPTS': 2, 'BACKOFF_BASE': 5, 'BACKOFF_MAX': 60,
+        'LEASE_TIMEOUT': 300, 'POLL_INTERVAL': 0, 'BATCH_SIZE': 10,
+    })
+    @patch('utils.models.get_embedding', side_effect=RuntimeError("provider down"))
+    def test_failed_job_backs_off_then_dies(self, mock_get_embedding):
+        self.create_bookable()
+
+        job = claim_jobs(10)[0]
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.PENDING)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("provider down", job.last_error)
+
+        # Not due yet
+        self.assertEqual(claim_jobs(10), [])
+
+        Job.objects.update(run_after=timezone.now())
+        job = claim_jobs(10)[0]
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.DEAD)
+
+
+class BatchEmbeddingTests(TestCase):
+
+    def setUp(self):
+        from .embedding_cache import get_embedding_cache
+        get_embedding_cache().clear()
+
+    def fake_create(self, input, model):
+        # Reversed order, the client has to sort by index
+        data = [
+            MagicMock(index=i, embedding=[float(len(text))] * 1536)
+            for i, text in enumerate(input)
+        ]
+        return MagicMock(data=list(reversed(data)))
+
+    def test_order_preserved_and_inputs_batched(self):
+        texts = ["a", "bb", "", "ccc", "bb", "dddd"]
+        backend = OpenAIBackend()
+        backend.client = MagicMock()
+        backend.client.embeddings.create.side_effect = self.fake_create
+        vectors = get_embeddings(texts, backend=backend, batch_size=2)
+
+        self.assertEqual([v[0] for v in vectors], [1.0, 2.0, 0.0, 3.0, 2.0, 4.0])
+        # Four distinct non-empty texts in batches of two
+        self.assertEqual(backend.client.embeddings.create.call_count, 2)
+
+        backend.client.embeddings.create.reset_mock()
+        get_embeddings(texts, backend=backend)
+        backend.client.embeddings.create.assert_not_called()
+
+
+@override_settings(EMBEDDINGS={'BACKEND': 'hashing', 'OPTIONS': {'dimension': 384}}, EMBEDDING_ASYNC=False)
+class EmbeddingBackendTests(TestCase):
+
+    def test_hashing_backend_is_deterministic_and_padded(self):
+        vector = get_embedding("Beach resort in Nice")
+        self.assertEqual(vector.shape, (1536,))
+        self.assertFalse(vector[384:].any())
+        np.testing.assert_array_equal(vector, get_embeddings(["Beach  resort in Nice"])[0])
+
+        close = np.linalg.norm(vector - get_embedding("Beach hotel in Nice"))
+        far = np.linalg.norm(vector - get_embedding("Ski chalet Zermatt"))
+        self.assertLess(close, far)
+
+    def test_model_is_recorded_per_row(self):
+        bookable = Bookable.objects.create(
+            title="Beach Resort",
+            destination=Destination.objects.create(name="Nice, France"),
+            type=Bookable.BookableType.HOTEL,
+            options={},
+        )
+        bookable.refresh_from_db()
+        self.assertEqual((bookable.embedding_model, bookable.embedding_dimension), ("hashing-384", 384))
+
+        # Switching models makes the stored vector stale
+        with self.settings(EMBEDDINGS={'BACKEND': 'hashing'}):
+            self.assertEqual(get_backend().model, "hashing-1536")
+            self.assertTrue(bookable.embedding_is_stale())
+
+
+@override_settings(
+    EMBEDDINGS={'BACKEND': 'hashing', 'OPTIONS': {'dimension': 384}},
+    EMBEDDINGS_NEXT={'BACKEND': 'hashing', 'OPTIONS': {'dimension': 512}, 'VERSION': 'hashing-512-v2'},
+    EMBEDDING_ASYNC=False,
+)
+class ReembedTests(TestCase):
+
+    def setUp(self):
+        destination = Destination.objects.create(name="Lisbon, Portugal")
+        self.bookables = [
+            Bookable.objects.create(title=f"Harbour Hotel {i}", destination=destination,
+                                    type=Bookable.BookableType.HOTEL, options={"stars": i + 1})
+            for i in range(3)
+        ]
+
+    def run_command(self, *args):
+        output = io.StringIO()
+        call_command('reembed', '--models', 'travel.Bookable', *args, stdout=output)
+        return output.getvalue()
+
+    def test_shadow_pass_leaves_searched_vectors(self):
+        output = self.run_command()
+        self.assertIn("3 rows checked, 3 embedded", output)
+
+        next_backend = get_next_backend()
+        for bookable in self.bookables:
+            stored = Bookable.objects.get(pk=bookable.pk)
+            np.testing.assert_array_equal(stored.embedding, bookable.embedding)
+            self.assertEqual(stored.embedding_version, 'hashing-384')
+            np.testing.assert_allclose(stored.embedding_next, get_embedding(stored.get_embedding_text(), next_backend))
+            self.assertIsNotNone(stored.embedding_compact_next)
+
+        # Current shadows are not embedded again
+        self.assertIn("3 rows checked, 0 embedded", self.run_command())
+
+    def test_interrupted_pass_resumes(self):
+        backend = get_next_backend()
+        passes = reembed(Bookable, backend, batch_size=1)
+        next(passes)
+        passes.close()
+
+        totals = list(reembed(Bookable, backend, batch_size=1))
+        # Two batches left, the first row is not read again
+        self.assertEqual(len(totals), 2)
+        self.assertEqual(totals[-1], {'checked': 3, 'embedded': 3})
+        self.assertFalse(Checkpoint.objects.exists())
+
+    def test_activate_swaps_vectors_in(self):
+        self.run_command()
+        shadows = dict(Bookable.objects.values_list('pk', 'embedding_next'))
+
+        # Queries and saves would still embed with the previous version
+        with self.assertRaises(CommandError):
+            self.run_command('--activate')
+        self.assertEqual(set(Bookable.objects.values_list('embedding_version', flat=True)), {'hashing-384'})
+
+        next_config = {'BACKEND': 'hashing', 'OPTIONS': {'dimension': 512}, 'VERSION': 'hashing-512-v2'}
+        with self.settings(EMBEDDINGS=next_config):
+            self.assertIn("Activated embedding version hashing-512-v2 for 3 rows", self.run_command('--activate'))
+        for bookable in Bookable.objects.all():
+            np.testing.assert_array_equal(bookable.embedding, shadows[bookable.pk])
+            self.assertEqual(bookable.embedding_version, 'hashing-512-v2')
+            self.assertEqual(bookable.embedding_model, 'hashing-512')
+            self.assertEqual(bookable.embedding_dimension, 512)
+            self.assertIsNone(bookable.embedding_next)
+            self.assertEqual(bookable.embedding_next_fingerprint, '')
+
+        with self.settings(EMBEDDINGS=next_config):
+            self.assertFalse(Bookable.objects.get(pk=self.bookables[0].pk).embedding_is_stale())
+
+    def test_in_place_and_configuration_errors(self):
+        with self.settings(EMBEDDINGS={'BACKEND': 'hashing', 'OPTIONS': {'dimension': 256}}):
+            self.assertIn("3 rows checked, 3 embedded", self.run_command('--in-place'))
+            self.assertEqual(set(Bookable.objects.values_list('embedding_version', flat=True)), {'hashing-256'})
+
+        with self.settings(EMBEDDINGS_NEXT=None):
+            with self.assertRaises(CommandError):
+                self.run_command()
+        with self.assertRaises(CommandError):
+            call_command('reembed', '--models', 'travel.Review', stdout=io.StringIO())
+
+    def test_rate_limiter_waits_for_the_window(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=100, clock=lambda: now[0], sleep=sleep)
+        limiter.wait(10)
+        limiter.wait(10)
+        # Third request in the same minute
+        limiter.wait(10)
+        self.assertEqual(sleeps, [60])
+
+        now[0] += 1
+        # Over the token budget left in this minute
+        limiter.wait(91)
+        self.assertEqual(sleeps, [60, 59])
+
+
+@override_settings(VECTOR_SEARCH={
+    **settings.VECTOR_SEARCH, 'HNSW_EF_SEARCH': 64, 'MAX_HNSW_EF_SEARCH': 500, 'IVFFLAT_PROBES': 3, 'MAX_IVFFLAT_PROBES': 20,
+})
+class AnnParamsTests(TestCase):
+
+    def test_defaults_come_from_settings(self):
+        self.assertEqual(get_ann_params(), (64, 3))
+        self.assertEqual(get_ann_params(ef_search=100, probes=5), (100, 5))
+        # A scan returns at most ef_search rows
+        self.assertEqual(get_ann_params(limit=200), (200, 3))
+        self.assertEqual(get_ann_params(limit=10), (64, 3))
+
+    def test_requests_are_clamped(self):
+        self.assertEqual(get_ann_params(ef_search=5000, probes=5000), (500, 20))
+        self.assertEqual(get_ann_params(limit=5000), (500, 3))
+
+
+# SET LOCAL only ends with the transaction, which TestCase never commits
+class AnnSearchTests(TransactionTestCase):
+
+    def current_settings(self):
+        with connection.cursor() as cursor:
+            # pgvector registers its settings once the extension library is loaded
+            cursor.execute("SELECT '[1]'::vector")
+            cursor.execute("SELECT current_setting('hnsw.ef_search'), current_setting('ivfflat.probes')")
+            return cursor.fetchone()
+
+    def test_settings_are_transaction_local(self):
+        before = self.current_settings()
+        with ann_search(ef_search=123, probes=7):
+            self.assertEqual(self.current_settings(), ('123', '7'))
+        self.assertEqual(self.current_settings(), before)
+
+
+class LRUCacheTests(TestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        lru = LRUCache(max_entries=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        self.assertEqual(lru.get('a'), 1)
+        # 'b' is now the least recently used
+        lru.set('c', 3)
+        self.assertEqual(len(lru), 2)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual((lru.get('a'), lru.get('c')), (1, 3))
+
+    def test_entries_expire(self):
+        lru = LRUCache(max_entries=2, ttl=60)
+        with patch('utils.embedding_cache.time.monotonic', return_value=1000.0):
+            lru.set('a', 1)
+        with patch('utils.embedding_cache.time.monotonic', return_value=1061.0):
+            self.assertIsNone(lru.get('a'))
+        self.assertEqual(len(lru), 0)
+
+
+@override_settings(
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'embeddings': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'embedding-cache-tests'},
+    },
+    EMBEDDING_CACHE={'CACHE_ALIAS': 'embeddings', 'LOCAL_MAX_ENTRIES': 8, 'LOCAL_TTL': 60, 'SHARED_TTL': 3600},
+)
+class EmbeddingCacheTests(TestCase):
+
+    def setUp(self):
+        caches['embeddings'].clear()
+        self.vector = np.linspace(0, 1, 1536)
+
+    def test_shared_tier_round_trip(self):
+        EmbeddingCache().set('key', self.vector)
+        self.assertEqual(caches['embeddings'].get('key'), self.vector.astype(np.float32).tobytes())
+
+        # A fresh process only has the shared tier
+        cache = EmbeddingCache()
+        vector = cache.get('key')
+        self.assertEqual(vector.dtype, np.float32)
+        np.testing.assert_array_equal(vector, self.vector.astype(np.float32))
+        self.assertFalse(vector.flags.writeable)
+        cache.get('key')
+        self.assertIsNone(cache.get('other'))
+        self.assertEqual(cache.get_many(['key', 'other']).keys(), {'key'})
+
+        stats = cache.stats()
+        self.assertEqual(
+            {name: stats[name] for name in ('local_hits', 'shared_hits', 'misses', 'lookups', 'local_entries')},
+            {'local_hits': 2, 'shared_hits': 1, 'misses': 2, 'lookups': 5, 'local_entries': 1},
+        )
+        self.assertEqual(stats['hit_rate'], 0.6)
+
+    def test_shared_entries_use_the_shared_ttl(self):
+        cache = EmbeddingCache()
+        with patch.object(caches['embeddings'], 'set_many') as mock_set_many:
+            cache.set('key', self.vector)
+        self.assertEqual(mock_set_many.call_args.kwargs['timeout'], 3600)
+
+    def test_shared_tier_errors_are_misses(self):
+        cache = EmbeddingCache()
+        shared = caches['embeddings']
+        with patch.object(shared, 'get', side_effect=ConnectionError), \
+                patch.object(shared, 'get_many', side_effect=ConnectionError), \
+                patch.object(shared, 'set_many', side_effect=ConnectionError), \
+                self.assertLogs('utils.embedding_cache', 'WARNING') as logs:
+            self.assertIsNone(cache.get('key'))
+            self.assertEqual(cache.get_many(['key']), {})
+            # Writes still fill the local tier
+            cache.set('key', self.vector)
+            self.assertIsNotNone(cache.get('key'))
+        self.assertEqual(len(logs.records), 3)
+        self.assertEqual((cache.stats()['misses'], cache.stats()['local_hits']), (2, 1))
+
+
+class EmbeddingCacheStatsViewTests(APITestCase):
+
+    def test_admin_only(self):
+        url = reverse('embedding-cache-stats')
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+
+        self.client.force_authenticate(User.objects.create(username="traveller"))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_authenticate(User.objects.create(username="admin", is_staff=True))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_rate', response.data)
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import EmbeddingCacheStatsView
+
+urlpatterns = [
+    path('cache-stats/', EmbeddingCacheStatsView.as_view(), name='embedding-cache-stats'),
+]
@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+
+_extension_versions = {}
+
+
+def get_vector_extension_version():
+    """
+    Returns:
+        tuple: Installed pgvector version, e.g. (0, 8, 0), cached per database
+    """
+    alias = connection.alias
+    if alias not in _extension_versions:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            row = cursor.fetchone()
+        _extension_versions[alias] = tuple(int(part) for part in row[0].split('.')) if row else ()
+    return _extension_versions[alias]
+
+
+def supports_iterative_scan():
+    # hnsw.iterative_scan / ivfflat.iterative_scan were added in pgvector 0.8.0
+    return get_vector_extension_version() >= (0, 8, 0)
+
+
+def get_ann_params(ef_search=None, probes=None, limit=None):
+    """
+    Resolve the ANN recall parameters for a query
+
+    Args:
+        ef_search (int): Requested HNSW candidate list size, or None for the default
+        probes (int): Requested number of IVFFlat lists to probe, or None for the default
+        limit (int): Number of rows the query needs; an HNSW scan returns at most
+            ef_search rows, so ef_search is raised to at least this
+
+    Returns:
+        tuple: (ef_search, probes) clamped to the configured limits
+    """
+    config = settings.VECTOR_SEARCH
+
+    if ef_search is None:
+        ef_search = config['HNSW_EF_SEARCH']
+    if probes is None:
+        probes = config['IVFFLAT_PROBES']
+    if limit is not None:
+        ef_search = max(ef_search, limit)
+
+    ef_search = max(1, min(ef_search, config['MAX_HNSW_EF_SEARCH']))
+    probes = max(1, min(probes, config['MAX_IVFFLAT_PROBES']))
+
+    return ef_search, probes
+
+
+@contextmanager
+def ann_search(ef_search=None, probes=None, limit=None):
+    """
+    Run the enclosed queries in a transaction with ANN recall settings applied
+
+    The settings are applied with SET LOCAL semantics, so they only last for
+    this transaction and never leak into other requests sharing the connection.
+    Querysets must be evaluated inside the block for the settings to apply.
+
+    On pgvector 0.8+ iterative index scans are enabled as configured, so a
+    filtered query keeps scanning the index until it has enough matching rows
+    instead of returning a short page.
+
+    Args:
+        ef_search (int): HNSW candidate list size (hnsw.ef_search)
+        probes (int): Number of IVFFlat lists to probe (ivfflat.probes)
+        limit (int): Number of rows the enclosed query fetches
+    """
+    ef_search, probes = get_ann_params(ef_search, probes, limit)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true)",
+                [str(ef_search), str(probes)]
+            )
+            iterative_scan = settings.VECTOR_SEARCH['ITERATIVE_SCAN']
+            if iterative_scan != 'off' and supports_iterative_scan():
+                cursor.execute(
+                    "SELECT set_config('hnsw.iterative_scan', %s, true), set_config('ivfflat.iterative_scan', %s, true)",
+                    [iterative_scan, 'relaxed_order']
+                )
+        yield
@@ -0,0 +1,14 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import permissions
+
+from .embedding_cache import get_embedding_cache
+
+class EmbeddingCacheStatsView(APIView):
+    """
+    Hit/miss counters of the embedding cache for the serving process.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, format=None):
+        return Response(get_embedding_cache().stats())